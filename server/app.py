@@ -2,8 +2,8 @@
 
 import os
 import pickle
+import threading
 from flask import Flask, request, jsonify, abort
-from sqlalchemy import or_ # <--- ДОБАВЛЕН ИМПОРТ
 from flask_migrate import Migrate
 from extensions import db, jwt, Migrate # Удален дублирующийся Migrate
 from flask_jwt_extended import (
@@ -14,11 +14,17 @@ from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from surprise import dump # dump не используется, можно удалить?
-from models.models import User, Movie, Rating, MovieList, ListMovie, Genre # та інші потрібні моделі
+from models.models import User, Movie, Rating, MovieList, ListMovie, Genre, recompute_movie_rating_stats # та інші потрібні моделі
 from decorators import role_required
-import joblib
-# import scipy # scipy не используется напрямую, можно удалить?
-import scipy.sparse as sp
+from models.ann_index import DEFAULT_NPROBE
+from models.registry import ModelRegistry
+from models.artifacts import current_bundle, list_bundles, set_current_bundle
+from models.catalog import MovieCatalog
+from models.search_index import TitleSearchIndex
+from models.rec_cache import RecommendationCache
+from models.fold_in import FoldInWorker, UserFactorStore, STORE_FILE, STATE_DIR
+from models.rating_log import RatingLog, LOG_FILE
+from models.catalog_log import CatalogLog, LogTail, CATALOG_LOG_FILE
 # ── Init Flask ─────────────────────────────────────────────────────
 app = Flask(__name__)
 from config import Config
@@ -30,171 +36,180 @@ migrate = Migrate(app, db)
 CORS(app)
 
 # ── Load ML models ─────────────────────────────────────────────────
+# Модели грузятся в фоне (models/registry.py): приложение поднимается сразу,
+# пока загрузка не закончилась — отвечаем из precomputed-таблицы или популярными.
 MODELS_DIR = os.path.join(os.path.dirname(__file__), 'models')
-id_to_idx = joblib.load(os.path.join(MODELS_DIR, 'movie_id_to_index.pkl'))
-idx_to_id = joblib.load(os.path.join(MODELS_DIR, 'index_to_movie_id.pkl'))
-knn_model = joblib.load(os.path.join(MODELS_DIR, 'knn_model.pkl'))
-svd_model = joblib.load(os.path.join(MODELS_DIR, 'svd_model.pkl'))
-content_nn = joblib.load(os.path.join(MODELS_DIR, 'content_nn.pkl'))
-content_features = sp.load_npz(os.path.join(MODELS_DIR, 'content_features.npz'))
-
-trainset = knn_model.trainset
-# _raw2inner = getattr(trainset, '_raw2inner_id_items', None) or trainset._raw2inner_id_items # _raw2inner не используется, можно удалить?
-VALID_IDS = set(int(rid) for rid in trainset._raw2inner_id_items.keys())
-# ── Recommendation helpers ─────────────────────────────────────────
-def knn_recommend(movie_id: int, n: int):
-    """
-    Surprise.KNNBasic: берём соседей через get_neighbors и sim.
-    """
-    trainset = knn_model.trainset
-    raw_iid = movie_id
+registry = ModelRegistry(MODELS_DIR)
+if app.config['MODELS_LOAD'] != 'lazy':
+    registry.start()
+# Новые бандлы (build_indexes.py --bundle) подхватываются без рестарта: по опросу
+# models/bundles/CURRENT или через POST /api/admin/models/reload
+if app.config['MODELS_WATCH_INTERVAL'] > 0:
+    registry.watch(app.config['MODELS_WATCH_INTERVAL'])
+
+def get_models():
+    """Активный набор моделей (ModelSet) — один снимок на запрос; в lazy-режиме запускает загрузку."""
+    registry.start()
+    return registry.active
+
+def get_recommender():
+    """Recommender или None, пока модели грузятся."""
+    return get_models().recommender
+
+# ── Онлайн fold-in пользователей (models/fold_in.py) ──────────────
+# После записи оценки вектор пользователя пересчитывается в фоне против текущих q_i;
+# персональные рекомендации видят новые оценки без переобучения SVD
+def _current_mf():
+    models = registry.active
+    if models.recommender is None or models.recommender.mf is None:
+        return None, None
+    return models.recommender.mf, models.version
+
+def _user_rating_rows(user_id: int):
+    with app.app_context():
+        return db.session.query(Rating.movie_id, Rating.rating, Rating.created_at) \
+            .filter(Rating.user_id == user_id).all()
+
+user_factors = UserFactorStore(os.path.join(MODELS_DIR, STATE_DIR, STORE_FILE)).load()
+fold_in_worker = FoldInWorker(
+    user_factors, _current_mf, _user_rating_rows,
+    delay=app.config['FOLD_IN_DELAY'],
+    persist_interval=app.config['FOLD_IN_PERSIST_INTERVAL'],
+)
+
+# ── Журнал оценок для инкрементального обучения (models/rating_log.py) ──
+# Каждое изменение оценки дописывается в models/rating_events.bin; python -m models.incremental
+# учитывает хвост журнала и публикует новый бандл
+rating_log = RatingLog(os.path.join(MODELS_DIR, LOG_FILE))
+
+def record_rating_event(user_id: int, movie_id: int, score=None):
+    """score=None — оценка удалена. Ошибка записи журнала не должна ронять запрос."""
     try:
-        inner_id = trainset.to_inner_iid(raw_iid)
-    except ValueError:
-        return []
-    # получаем соседей
-    nbrs = knn_model.get_neighbors(inner_id, k=n)
-    recs = []
-    for nbr_inner_id in nbrs:
-        raw_id = trainset.to_raw_iid(nbr_inner_id)
-           # sim — это ndarray, поэтому берём напрямую элемент [inner_id][nbr_inner_id]
-        score = float(knn_model.sim[inner_id][nbr_inner_id])
-        # отбрасываем соседей с нулевой или отрицательной похожестью
-        if score <= 0:
-            continue
-        recs.append({"movieId": int(raw_id), "score": score})
-    return recs
+        rating_log.append(user_id, movie_id, score)
+    except OSError as e:
+        app.logger.error(f"Cannot append to rating log: {e}")
 
-def svd_recommend(movie_id: int, n: int):
+# ── Журнал изменений каталога (models/catalog_log.py) ─────────────
+# Create / update / delete фильма дописываются в models/catalog_events.bin; размер
+# журнала — поколение каталога, общее для всех воркеров (и без Redis)
+catalog_log = CatalogLog(os.path.join(MODELS_DIR, CATALOG_LOG_FILE))
+
+def record_catalog_event(movie_id: int):
+    try:
+        catalog_log.append(movie_id)
+    except OSError as e:
+        app.logger.error(f"Cannot append to catalog log: {e}")
+
+# ── Кэш ответов ────────────────────────────────────────────────────
+# Версия моделей — из manifest бандла (или хэш артефактов в MODELS_DIR), см. registry.version;
+# поколение каталога — чтобы после CRUD фильма старые ответы не находились ни в одном воркере
+rec_cache = RecommendationCache(
+    maxsize=app.config['REC_CACHE_SIZE'],
+    ttl=app.config['REC_CACHE_TTL'],
+    redis_url=app.config['REDIS_URL'],
+    generation=catalog_log.size,
+)
+
+# ── Каталог фильмов в памяти ───────────────────────────────────────
+# Строится при первом обращении (нужен контекст приложения для запросов к БД).
+# Каждый воркер держит свою копию: изменения из других воркеров догоняем перед чтением
+# по хвостам журналов — CRUD фильмов (catalog_log) и оценок (rating_log → rating_count /
+# rating_mean); затронутые фильмы перечитываются из БД
+RELOAD_AFTER = 5000   # изменённых фильмов, после которых дешевле перечитать каталог целиком
+_catalog = None
+_catalog_tail = None
+_catalog_lock = threading.Lock()
+
+def _catch_up(view, tail, load):
+    """Хвосты журналов tail → точечный refresh view; журнал пересоздан или изменений много — load заново."""
+    changed = tail.advance()
+    if changed is None or len(changed) > RELOAD_AFTER:
+        return load(db.session)
+    if len(changed):
+        view.refresh(db.session, changed)
+    return view
+
+def get_catalog() -> MovieCatalog:
+    global _catalog, _catalog_tail
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog_tail = LogTail(catalog_log, rating_log)  # позиции — до чтения БД
+                _catalog = MovieCatalog.load(db.session)
+    if _catalog_tail.pending():
+        with _catalog_lock:
+            _catalog = _catch_up(_catalog, _catalog_tail, MovieCatalog.load)
+    return _catalog
+
+# ── Поисковый индекс по названиям (models/search_index.py) ─────────
+# Как каталог: своя копия в каждом воркере, CRUD из других воркеров — по catalog_log
+_search_index = None
+_search_index_tail = None
+_search_index_lock = threading.Lock()
+
+def get_search_index() -> TitleSearchIndex:
+    global _search_index, _search_index_tail
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index_tail = LogTail(catalog_log)  # позиция — до чтения БД
+                _search_index = TitleSearchIndex.load(db.session)
+    if _search_index_tail.pending():
+        with _search_index_lock:
+            _search_index = _catch_up(_search_index, _search_index_tail, TitleSearchIndex.load)
+    return _search_index
+
+def refresh_rating_stats(movie_id: int):
     """
-    Surprise.SVD: косинусная близость между qi-факторами.
+    После записи оценки слушатель в models.py уже обновил Movie.rating_count /
+    rating_mean в БД — подтягиваем их в зеркало каталога одним запросом по PK.
     """
-    import numpy as np
-    trainset = svd_model.trainset
-    raw_iid  = movie_id
-    try:
-        inner_id = trainset.to_inner_iid(raw_iid)
-    except ValueError:
-        return []
-    # получаем матрицу item-факторов
-    all_q = getattr(svd_model, 'qi', getattr(svd_model, 'qi_', None))
-    if all_q is None:
-        return []
-    v = all_q[inner_id]
-    norms = np.linalg.norm(all_q, axis=1) * np.linalg.norm(v)
-    # Добавим проверку на ноль в знаменателе
-    valid_norms = norms > 1e-6 # Маленькое число для предотвращения деления на ноль
-    sims = np.zeros_like(norms)
-    sims[valid_norms] = (all_q[valid_norms] @ v) / norms[valid_norms]
-
-    # топ-(n+1) индексов
-    top = np.argsort(-sims)[:n+1]
-    recs = []
-    for idx in top:
-        if idx == inner_id:
-            continue
-        raw_id = trainset.to_raw_iid(idx)
-        recs.append({"movieId": int(raw_id), "score": float(sims[idx])})
-        if len(recs) >= n:
-            break
-    return recs
+    row = db.session.query(Movie.rating_count, Movie.rating_mean).filter_by(movie_id=movie_id).first()
+    if row:
+        get_catalog().set_rating_stats(movie_id, row.rating_count, row.rating_mean)
 
-# ── 1) Гибридный рекоммендер ───────────────────────────────────────────
+@app.cli.command('recompute-rating-stats')
+def recompute_rating_stats_command():
+    """Пересчитать Movie.rating_count / rating_mean по всей таблице app_ratings."""
+    with db.engine.begin() as connection:
+        recompute_movie_rating_stats(connection)
+    print("✔ rating_count / rating_mean пересчитаны")
 
-# вверху файла
-W_KNN     = 0.2
-W_CONTENT = 0.4
-W_SVD     = 0.4  # теперь сумма = 1.0
+# ── Recommendation helpers ─────────────────────────────────────────
+# recommender — из того же снимка get_models(), по версии которого строится ключ кэша:
+# глобальный registry.recommender мог смениться подменой моделей между этими шагами
+def knn_recommend(recommender, movie_id: int, n: int):
+    return recommender.knn(movie_id, n)
 
-def hybrid_recommend(movie_id: int, n: int) -> list[dict]:
-    # считаем, сколько есть рейтингов, чтобы отключить KNN при малом числе
-    rating_count = Rating.query.filter_by(movie_id=movie_id).count()
-    recs_knn     = knn_recommend(movie_id, n*2)     if rating_count >= 5 else []
-    recs_content = content_recommend(movie_id, n*2)
-    recs_svd     = svd_recommend(movie_id, n*2)
-
-    # вспомогательная нормализация в [0,1]
-    def normalize(recs):
-        if not recs:
-            return {}
-        scores = [r['score'] for r in recs]
-        lo, hi = min(scores), max(scores)
-        denom = hi - lo if hi != lo else 1.0
-        # Добавим проверку denom != 0
-        if denom == 0:
-             return {r['movieId']: 0.0 for r in recs} # Все оценки одинаковы, нормализуем к 0
-        return {r['movieId']: (r['score'] - lo) / denom for r in recs}
-
-    norm_knn     = normalize(recs_knn)
-    norm_content = normalize(recs_content)
-    norm_svd     = normalize(recs_svd)
-
-    # смешиваем
-    combined = {}
-    all_movie_ids = set(norm_knn.keys()) | set(norm_content.keys()) | set(norm_svd.keys())
-
-    for mid in all_movie_ids:
-         score = (norm_knn.get(mid, 0) * W_KNN +
-                  norm_content.get(mid, 0) * W_CONTENT +
-                  norm_svd.get(mid, 0) * W_SVD)
-         combined[mid] = score
+def svd_recommend(recommender, movie_id: int, n: int, nprobe: int = DEFAULT_NPROBE):
+    return recommender.svd(movie_id, n, nprobe)
 
+def content_recommend(recommender, movie_id: int, n: int):
+    return recommender.content(movie_id, n)
+
+# ── 1) Гибридный рекоммендер ───────────────────────────────────────────
+def hybrid_recommend(recommender, movie_id: int, n: int, nprobe: int = DEFAULT_NPROBE) -> list[dict]:
+    # считаем, сколько есть рейтингов, чтобы отключить KNN при малом числе
+    # (materialized Movie.rating_count, зеркало в каталоге — без COUNT по app_ratings)
+    catalog = get_catalog()
+    rating_count = catalog.rating_count(movie_id)
+    top = recommender.hybrid(movie_id, n, rating_count, nprobe)
 
     # если ничего не дали
-    if not combined:
-        top_movies = Movie.query.order_by(Movie.popularity.desc()).limit(n).all()
-        # ИСПРАВЛЕНО: Использовать title_uk/title_en
+    if not top:
         return [
-            {"movieId": m.movie_id, "title": m.title_uk if m.title_uk else m.title_en, "score": 0.0}
-            for m in top_movies
+            {"movieId": m['movieId'], "title": m['title'], "score": 0.0}
+            for m in catalog.top_popular(n)
         ]
 
-    # сортируем и берём первые n
-    top = sorted(combined.items(), key=lambda x: -x[1])[:n]
     out = []
-    for mid, sc in top:
-        m = Movie.query.get(mid)
+    for r in top:
+        m = catalog.get(r['movieId'])
         if m:
-            # ИСПРАВЛЕНО: Использовать title_uk/title_en
-            out.append({"movieId": mid, "title": m.title_uk if m.title_uk else m.title_en, "score": round(sc, 3)})
+            out.append({"movieId": r['movieId'], "title": m['title'], "score": round(r['score'], 3)})
     return out
 
 
-
-def content_recommend(movie_id: int, n: int):
-    """
-    Контентные рекомендации по косинусному сходству.
-    """
-    # Маппинг movieId → индекс в content_features
-    idx = id_to_idx.get(movie_id)
-    if idx is None:
-        return []
-
-    # Берём n+1 сосед (первый — это сам фильм)
-    try:
-        # Добавим проверку на случай, если n+1 больше числа элементов
-        k = min(n + 1, content_features.shape[0])
-        dists, neighs = content_nn.kneighbors(
-            content_features[idx], n_neighbors=k
-        )
-    except IndexError:
-        # Если idx выходит за пределы, вернуть пустой список
-        return []
-
-
-    recs = []
-    for dist, neigh_idx in zip(dists[0][1:], neighs[0][1:]):
-        # Добавим проверку индекса соседа
-        if neigh_idx >= len(idx_to_id):
-             continue
-        raw_id = idx_to_id[neigh_idx]
-        # cosine distance → similarity
-        score = round(1 - float(dist), 3)
-        recs.append({"movieId": raw_id, "score": score})
-    return recs
-
-
-
 # svd_fallback не используется, можно удалить?
 # def svd_fallback(n:int):
 #     # допустим user_id=1 (или средний user), или можно брать весь VALID_IDS
@@ -311,6 +326,9 @@ def create_rating():
         db.session.rollback()
         app.logger.error(f"Database error on rating: {e}")
         abort(500, description="Database error, could not save rating.")
+    refresh_rating_stats(movie_id)
+    fold_in_worker.schedule(user_id)
+    record_rating_event(user_id, movie_id, score)
 
     # ИСПРАВЛЕНО: Возвращаем .rating в ключе 'score'
     return jsonify({'message':'ok', 'movieId': movie_id, 'score': score}), 201
@@ -364,12 +382,12 @@ def user_favorites():
 
     if request.method == 'GET':
         movies = []
-        # ИСПРАВЛЕНО: Используем fav_list.list_movies
-        for lm in fav_list.list_movies:
-            m = Movie.query.get(lm.movie_id)
+        catalog = get_catalog()
+        # Только movie_id из list_movies, названия — из каталога в памяти
+        for (movie_id,) in fav_list.list_movies.with_entities(ListMovie.movie_id):
+            m = catalog.get(movie_id)
             if m:
-                # ИСПРАВЛЕНО: Использовать title_uk/title_en
-                movies.append({'movieId': m.movie_id, 'title': m.title_uk if m.title_uk else m.title_en})
+                movies.append({'movieId': m['movieId'], 'title': m['title']})
         return jsonify(movies), 200
 
     # --- Блок для POST и DELETE ---
@@ -411,43 +429,65 @@ def user_favorites():
     abort(405) # Method Not Allowed
 
 # ── Movie-based recommendations ─────────────────────────────────────
+def get_nprobe_arg():
+    """?nprobe= из запроса; при ошибке — значение по умолчанию."""
+    try:
+        return max(0, int(request.args.get('nprobe', DEFAULT_NPROBE)))
+    except ValueError:
+        return DEFAULT_NPROBE
+
 @app.route('/api/recommend/movie/<int:movie_id>', methods=['GET'])
 def recommend_by_movie(movie_id):
     """
     Использует path-параметр movie_id, а не JSON.
     ?n= сколько вернуть
     ?alg= knn или svd или content или hybrid
+    ?nprobe= точность/скорость поиска по SVD (0 — точный поиск)
     """
     try:
         n = int(request.args.get('n', 10)) # Увеличил дефолтное значение
     except ValueError:
         n = 10
     alg = request.args.get('alg', 'hybrid').lower() # По умолчанию гибрид
-
-    # Получаем "сырые" рекомендации
-    raw = []
-    if alg == 'knn':
-        raw = knn_recommend(movie_id, n)
-    elif alg == 'content':
-        raw = content_recommend(movie_id, n)
-    elif alg == 'hybrid':
-       raw = hybrid_recommend(movie_id, n)
-    elif alg == 'svd':
-       raw = svd_recommend(movie_id, n)
-    else:
-        # Если алгоритм не распознан, можно вернуть ошибку или использовать дефолтный
-        # Используем гибрид по умолчанию
-        raw = hybrid_recommend(movie_id, n)
-
-
+    nprobe = get_nprobe_arg()
+
+    models = get_models()
+    recommender, precomputed = models.recommender, models.precomputed
+    # Пока модели грузятся, версия ещё может смениться — такие ответы не кэшируем
+    cache_key = rec_cache.make_key(models.version, movie_id, n, alg, nprobe) if recommender else None
+    cached = rec_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return jsonify(cached), 200
+
+    # Получаем "сырые" рекомендации: сначала из заранее посчитанной таблицы,
+    # вживую — только для фильмов, добавленных после её сборки
+    if alg not in ('knn', 'content', 'svd', 'hybrid'):
+        # Если алгоритм не распознан, используем гибрид по умолчанию
+        alg = 'hybrid'
+    # при загруженных моделях таблица — только если живой путь дал бы то же самое
+    # (тот же nprobe и тот же порог KNN по rating_count); пока грузятся — любая строка лучше популярных
+    live = recommender is not None
+    raw = precomputed.lookup(
+        alg, movie_id, n, nprobe=nprobe if live else None,
+        rating_count=get_catalog().rating_count(movie_id) if live and alg == 'hybrid' else None,
+    ) if precomputed is not None else None
+    if raw is None and recommender is None:
+        raw = []  # модели ещё не загружены → ниже фолбэк на популярные
+    elif raw is None:
+        if alg == 'knn':
+            raw = knn_recommend(recommender, movie_id, n)
+        elif alg == 'content':
+            raw = content_recommend(recommender, movie_id, n)
+        elif alg == 'svd':
+            raw = svd_recommend(recommender, movie_id, n, nprobe)
+        else:
+            raw = hybrid_recommend(recommender, movie_id, n, nprobe)
+
+    catalog = get_catalog()
     if not raw:
         # Если нет рекомендаций, возвращаем топ популярных, исключая текущий фильм
-        top_movies = Movie.query.filter(Movie.movie_id != movie_id)\
-                              .order_by(Movie.popularity.desc())\
-                              .limit(n).all()
         # Код ответа может быть 200, но с информацией об отсутствии рек.
-        # ИСПРАВЛЕНО: title
-        raw = [{'movieId': m.movie_id, 'title': m.title_uk if m.title_uk else m.title_en, 'score': 0} for m in top_movies]
+        raw = [{'movieId': m['movieId'], 'title': m['title'], 'score': 0} for m in catalog.top_popular(n, exclude=[movie_id])]
         # Можно добавить флаг, что это фолбэк
         # return jsonify({'recommendations': raw, 'fallback': True}), 200
         # Пока просто вернем список
@@ -460,19 +500,20 @@ def recommend_by_movie(movie_id):
         if movie_id_rec == movie_id or movie_id_rec in processed_ids: # Исключаем исходный фильм и дубликаты
             continue
 
-        m = Movie.query.get(movie_id_rec) # Используем get для скорости
+        m = catalog.get(movie_id_rec) # Каталог в памяти вместо запроса на каждый фильм
         if m:
-            genre_names = [genre.name_uk if genre.name_uk else genre.name_en for genre in m.genres]
             out.append({
-                'movieId': m.movie_id,
-                'title': m.title_uk if m.title_uk else m.title_en,
+                'movieId': m['movieId'],
+                'title': m['title'],
                 'score': round(r.get('score', 0), 3), # Используем get для score
-                'genres': "|".join(genre_names)
+                'genres': m['genres']
             })
             processed_ids.add(movie_id_rec)
             if len(out) >= n: # Убедимся, что вернули не больше n
                  break
 
+    if cache_key:
+        rec_cache.set(cache_key, out)
     return jsonify(out), 200
 
 @app.route('/api/movies/search')
@@ -481,16 +522,8 @@ def search_local_movies():
     if not q:
         return jsonify([]), 200
 
-    results = Movie.query \
-        .filter(
-            or_(Movie.title_en.ilike(f'%{q}%'), Movie.title_uk.ilike(f'%{q}%')),
-            Movie.movie_id.in_(VALID_IDS)
-        ) \
-        .order_by(Movie.title_en) \
-        .limit(10) \
-        .all()
-    # ИСПРАВЛЕНО: title
-    return jsonify([{'movieId': m.movie_id, 'title': m.title_uk if m.title_uk else m.title_en} for m in results]), 200
+    valid_ids = registry.valid_ids()  # None, пока модели и precomputed ещё не открыты
+    return jsonify(get_search_index().search(q, n=10, valid_ids=valid_ids)), 200
 # -------------------------
 # Додавання фільму — доступно тільки content_manager та admin
 @app.route('/api/movies', methods=['POST'])
@@ -502,6 +535,10 @@ def create_movie():
     фільм = Movie(**data)
     db.session.add(фільм)
     db.session.commit()
+    get_catalog().upsert(фільм)
+    get_search_index().upsert(фільм)
+    record_catalog_event(фільм.movie_id)
+    rec_cache.clear()
     return jsonify({'msg': 'Фільм створено'}), 201
 
 # Оновлення фільму — доступно тільки content_manager та admin
@@ -514,6 +551,10 @@ def update_movie(movie_id):
     for поле, значення in data.items():
         setattr(фільм, поле, значення)
     db.session.commit()
+    get_catalog().upsert(фільм)
+    get_search_index().upsert(фільм)
+    record_catalog_event(фільм.movie_id)
+    rec_cache.clear()
     return jsonify({'msg': 'Фільм оновлено'}), 200
 
 # Видалення фільму — доступно тільки content_manager та admin
@@ -524,8 +565,55 @@ def delete_movie(movie_id):
     фільм = Movie.query.get_or_404(movie_id)
     db.session.delete(фільм)
     db.session.commit()
+    get_catalog().remove(movie_id)
+    get_search_index().remove(movie_id)
+    record_catalog_event(movie_id)
+    rec_cache.clear()
     return jsonify({'msg': 'Фільм видалено'}), 200
 
+# Статистика кэша рекомендацій — тільки admin
+@app.route('/api/admin/cache', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def recommendation_cache_stats():
+    return jsonify({'model_version': registry.version, **rec_cache.stats()}), 200
+
+# Готовность моделей (readiness-проба для балансировщика / деплоя):
+# 200 — модели загружены, 503 — ещё грузятся (работаем в деградированном режиме) или упали
+@app.route('/api/health/ready', methods=['GET'])
+def readiness():
+    status = registry.status()
+    return jsonify(status), 200 if registry.ready else 503
+
+# Моделі: стан і доступні версії бандлів — тільки admin
+@app.route('/api/admin/models', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def models_status():
+    return jsonify({
+        **registry.status(),
+        'current_bundle': current_bundle(MODELS_DIR),
+        'bundles': list_bundles(MODELS_DIR),
+    }), 200
+
+# Гаряче перезавантаження моделей — тільки admin.
+# {"version": "..."} — переключити bundles/CURRENT на цю версію (її підхоплять і інші
+# воркери через watcher); без тіла — перечитати поточну версію.
+# Завантаження йде у фоні, запити обслуговуються старими моделями до підміни.
+@app.route('/api/admin/models/reload', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def reload_models():
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if version:
+        if version not in list_bundles(MODELS_DIR):
+            abort(404, description=f"Bundle {version} not found")
+        set_current_bundle(MODELS_DIR, version)
+    if not registry.reload(version):
+        return jsonify({'msg': 'Завантаження моделей вже триває', **registry.status()}), 409
+    return jsonify({'msg': 'Перезавантаження запущено', **registry.status()}), 202
+
 # -------------------------
 # Зміна ролі користувача — доступно тільки admin
 @app.route('/api/users/<int:user_id>/role', methods=['PATCH'])
@@ -576,6 +664,9 @@ def modify_rating(movie_id):
         rating.created_at = datetime.utcnow() # Обновляем время изменения
 
         db.session.commit()
+        refresh_rating_stats(movie_id)
+        fold_in_worker.schedule(user_id)
+        record_rating_event(user_id, movie_id, score)
         # ИСПРАВЛЕНО: Возвращаем .rating в ключе 'score'
         return jsonify({'message': 'Rating updated', 'movieId': movie_id, 'score': rating.rating}), 200
 
@@ -586,6 +677,9 @@ def modify_rating(movie_id):
 
         db.session.delete(rating)
         db.session.commit()
+        refresh_rating_stats(movie_id)
+        fold_in_worker.schedule(user_id)
+        record_rating_event(user_id, movie_id)
         return jsonify({'message': 'Rating deleted', 'movieId': movie_id}), 200
 
 # --- Эндпоинты для управления списками фильмов ---
@@ -773,6 +867,7 @@ def recommend_by_list(list_id):
     except ValueError:
         n = 10
     num_candidates_multiplier = 3
+    nprobe = get_nprobe_arg()
 
     # 1. Находим список
     # ИСПРАВЛЕНО: Используем MovieList
@@ -796,44 +891,85 @@ def recommend_by_list(list_id):
     if not movie_ids_in_list:
         return jsonify([]), 200
 
-    # 3. Агрегируем рекомендации
-    aggregated_recs = {}
-    num_to_fetch_per_movie = n * num_candidates_multiplier
-
-    # print(f"Generating recommendations based on list {list_id} ({target_list.name}) with {len(movie_ids_in_list)} movies.")
-
-    for movie_id in movie_ids_in_list:
-        individual_recs = hybrid_recommend(movie_id, num_to_fetch_per_movie)
-        for rec in individual_recs:
-            rec_movie_id = rec['movieId']
-            score = rec.get('score', 0)
-            aggregated_recs[rec_movie_id] = aggregated_recs.get(rec_movie_id, 0) + score
-
-    # 4. Фильтруем фильмы из исходного списка
-    filtered_recs = {mid: score for mid, score in aggregated_recs.items() if mid not in movie_ids_in_list}
-
-    # 5. Сортируем и берем топ N
-    sorted_recs = sorted(filtered_recs.items(), key=lambda item: item[1], reverse=True)[:n]
+    # 3. Считаем рекомендации сразу по всему списку (один проход по моделям)
+    # Число оценок для всех фильмов списка — из зеркала Movie.rating_count в каталоге
+    rating_counts = get_catalog().rating_counts_for(movie_ids_in_list)
+    # 4-5. Фильмы из исходного списка движок исключает сам, результат уже отсортирован
+    recommender = get_recommender()
+    if recommender is None:
+        # Модели ещё грузятся — популярные фильмы вне списка
+        sorted_recs = [
+            (m['movieId'], 0.0)
+            for m in get_catalog().top_popular(n, exclude=movie_ids_in_list)
+        ]
+    else:
+        sorted_recs = recommender.engine.recommend_many(
+            movie_ids_in_list, n,
+            per_seed=n * num_candidates_multiplier * 2,
+            rating_counts=rating_counts,
+            nprobe=nprobe,
+        )
 
-    # 6. Формируем ответ
+    # 6. Формируем ответ (названия — из каталога в памяти)
     output = []
-    # Оптимизация: Получаем все нужные фильмы одним запросом
-    movie_ids_to_fetch = [mid for mid, score in sorted_recs]
-    movies_dict = {m.movie_id: m for m in Movie.query.filter(Movie.movie_id.in_(movie_ids_to_fetch)).all()}
-
+    catalog = get_catalog()
     for movie_id, score in sorted_recs:
-        movie = movies_dict.get(movie_id)
+        movie = catalog.get(movie_id)
         if movie:
-            # ИСПРАВЛЕНО: Использовать title_uk/title_en
             output.append({
-                'movieId': movie.movie_id,
-                'title': movie.title_uk if movie.title_uk else movie.title_en,
+                'movieId': movie['movieId'],
+                'title': movie['title'],
                 'score': round(score, 3)
             })
 
     # print(f"Returning {len(output)} recommendations for list {list_id}.")
     return jsonify(output), 200
 
+# Персональні рекомендації для поточного користувача (фактори SVD)
+@app.route('/api/recommend/user', methods=['GET'])
+@jwt_required()
+def recommend_for_user():
+    """
+    ?n= скільки повернути. Весь каталог оцінюється одним векторним проходом
+    r̂ = μ + b_u + b_i + q_i·p_u, вже оцінені фільми виключаються. p_u, b_u — з онлайн
+    fold-in по оцінках з app_ratings (models/fold_in.py), тож нові оцінки враховуються одразу.
+    Користувач без оцінок і без факторів або моделі ще вантажаться — популярні фільми.
+    """
+    user_id = int(get_jwt_identity())
+    try:
+        n = int(request.args.get('n', 10))
+    except ValueError:
+        n = 10
+
+    rows = db.session.query(Rating.movie_id, Rating.rating, Rating.created_at) \
+        .filter(Rating.user_id == user_id).all()
+    seen = [r.movie_id for r in rows]
+    models = get_models()
+    recommender = models.recommender
+    raw = []
+    if recommender is not None and recommender.mf is not None:
+        # вектор з онлайн fold-in (нові оцінки, нові користувачі) або навчений p_u
+        vector = fold_in_worker.vector(user_id, recommender.mf, models.version, rows) if rows else None
+        # запас на фільми, яких немає в каталозі
+        raw = recommender.for_user(user_id, n * 2, seen_movie_ids=seen, vector=vector)
+
+    catalog = get_catalog()
+    if not raw:
+        raw = [{'movieId': m['movieId'], 'score': 0.0} for m in catalog.top_popular(n, exclude=seen)]
+    output = []
+    for r in raw:
+        movie = catalog.get(r['movieId'])
+        if movie:
+            output.append({
+                'movieId': movie['movieId'],
+                'title': movie['title'],
+                'genres': movie['genres'],
+                'score': round(r['score'], 3),
+            })
+            if len(output) >= n:
+                break
+    return jsonify(output), 200
+
 
 # Добавить фильм в конкретный список
 @app.route('/api/lists/<int:list_id>/movies', methods=['POST'])
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# build_indexes.py
+#
+# Офлайн-сборка индексов для сервинга рекомендаций из уже обученных моделей.
+# Запускать после train_models.py / train_ml_latest_small.py.
+
+import os
+import argparse
+from datetime import datetime
+
+import joblib
+
+from models.knn_index import DEFAULT_K, SparseItemKNN
+from models.ann_index import FactorIndex
+from models.content_index import DEFAULT_K as CONTENT_K
+from models.mf import as_mf, load_mf
+from models.item_sim import train_item_knn
+from models.data_loader import load_ratings
+from models.artifacts import publish_bundle, bundle_dir
+
+# ── ПУТИ ─────────────────────────────────────────────────────────────
+BASE_DIR   = os.path.dirname(__file__)
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+
+def build_knn(models_dir: str = MODELS_DIR, k: int = DEFAULT_K, knn=None, ratings_path=None):
+    """
+    → knn_sparse.npz (top-K соседей на фильм, CSR float32 + id-маппинг). Источник:
+    knn — готовый SparseItemKNN (models/item_sim.py) или обученный Surprise KNNBasic;
+    ratings_path — ratings.csv, соседи считаются блочно без плотной матрицы;
+    иначе — knn_model.pkl из models_dir.
+    """
+    if ratings_path is not None:
+        ratings = load_ratings(ratings_path)
+        knn = train_item_knn(ratings, k=k)
+    elif knn is None:
+        knn = joblib.load(os.path.join(models_dir, "knn_model.pkl"))
+
+    if isinstance(knn, SparseItemKNN):
+        index = knn
+    else:
+        print(f"[{datetime.now()}] Building sparse KNN artifact (k={k}) for {knn.sim.shape[0]} items…")
+        index = SparseItemKNN.from_surprise(knn, k=k)
+    out_path = os.path.join(models_dir, "knn_sparse.npz")
+    index.save(out_path)
+    print(f"[{datetime.now()}] ✔ {os.path.basename(out_path)} saved ({index.neighbors_csr.nnz} neighbor links)")
+    return index
+
+
+def build_svd_ann(models_dir: str = MODELS_DIR, n_lists=None, svd=None):
+    """
+    svd_factors.npz / svd_model.pkl → svd_ann.npz (нормализованные qi + IVF-кластеры).
+    svd — обученный Surprise SVD или models.mf.MFModel; по умолчанию — load_mf(models_dir).
+    """
+    mf = load_mf(models_dir) if svd is None else as_mf(svd)
+    print(f"[{datetime.now()}] Building SVD ANN index for {len(mf.qi)} items…")
+    index = FactorIndex.from_mf(mf, n_lists=n_lists)
+    out_path = os.path.join(models_dir, "svd_ann.npz")
+    index.save(out_path)
+    print(f"[{datetime.now()}] ✔ {os.path.basename(out_path)} saved ({len(index.centroids)} lists)")
+    return index
+
+
+def build_bundle(models_dir: str = MODELS_DIR, content_k: int = CONTENT_K):
+    """
+    Артефакты выше + факторы SVD (load_mf) → <models_dir>/bundles/<version>: плоские .npy для mmap
+    в воркерах. Новая версия сразу становится текущей (bundles/CURRENT) — запущенный
+    сервер подхватит её сам (MODELS_WATCH_INTERVAL) или по POST /api/admin/models/reload.
+    """
+    print(f"[{datetime.now()}] Exporting mmap bundle (content top-{content_k})…")
+    manifest = publish_bundle(models_dir, content_k=content_k)
+    print(f"[{datetime.now()}] ✔ bundle {manifest['version']} saved to "
+          f"{bundle_dir(models_dir, manifest['version'])} ({len(manifest['arrays'])} arrays)")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка индексов для сервинга рекомендаций")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--knn-k", type=int, default=DEFAULT_K, help="сколько соседей хранить на фильм")
+    parser.add_argument("--ratings", default=None,
+                        help="ratings.csv: считать KNN блочно по оценкам вместо knn_model.pkl")
+    parser.add_argument("--svd-lists", type=int, default=None, help="число IVF-кластеров (по умолчанию 4·√n)")
+    parser.add_argument("--bundle", action="store_true", help="дополнительно собрать mmap-бандл для сервера")
+    parser.add_argument("--content-k", type=int, default=CONTENT_K,
+                        help="размер таблицы контентных соседей в бандле (0 — не строить)")
+    args = parser.parse_args()
+
+    build_knn(args.models_dir, k=args.knn_k, ratings_path=args.ratings)
+    build_svd_ann(args.models_dir, n_lists=args.svd_lists)
+    if args.bundle:
+        build_bundle(args.models_dir, content_k=args.content_k)
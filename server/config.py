@@ -15,3 +15,19 @@ class Config:
     # остальные ваши настройки
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "super-secret-key")
     TMDB_API_KEY    = os.getenv("TMDB_API_KEY",    "11c77e7e912d89b40d8920eb43d1d057")
+
+    # кэш ответов /api/recommend/movie/<id>
+    REC_CACHE_SIZE = int(os.getenv("REC_CACHE_SIZE", 4096))
+    REC_CACHE_TTL  = int(os.getenv("REC_CACHE_TTL", 600))  # секунды
+    REDIS_URL      = os.getenv("REDIS_URL")                # необязательно, напр. redis://localhost:6379/0
+
+    # загрузка моделей: "background" — фоновый поток сразу при старте,
+    # "lazy" — при первом запросе к рекомендациям (удобно для `flask db ...`)
+    MODELS_LOAD = os.getenv("MODELS_LOAD", "background")
+    # раз в сколько секунд проверять models/bundles/CURRENT на новую версию (0 — не следить)
+    MODELS_WATCH_INTERVAL = float(os.getenv("MODELS_WATCH_INTERVAL", 0))
+
+    # онлайн fold-in оценок в векторы пользователей (models/fold_in.py):
+    # пауза после последней оценки до пересчёта и период сброса векторов на диск, секунды
+    FOLD_IN_DELAY = float(os.getenv("FOLD_IN_DELAY", 1.0))
+    FOLD_IN_PERSIST_INTERVAL = float(os.getenv("FOLD_IN_PERSIST_INTERVAL", 60))
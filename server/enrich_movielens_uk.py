@@ -1,16 +1,26 @@
 """
 Колонки в выходе:
     movieId,title,genres,year,imdbId,tmdbId,title_uk,genres_uk,studio
+
+Запросы к TMDb идут пулом потоков через общий token bucket (429 + Retry-After
+притормаживает все потоки). Ответы кэшируются в tmdb_uk_cache.jsonl по tmdbId,
+выходной CSV периодически перезаписывается целиком — после падения перезапуск
+продолжает с того же места. --base-url позволяет прогнать скрипт на локальном моке.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
+import json
 import logging
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 from typing import Any
 
@@ -30,12 +40,20 @@ BASE_DIR   = Path(r"D:/dyplom2/server/data/ml-latest")
 MOVIES_CSV = BASE_DIR / "movies.csv"
 LINKS_CSV  = BASE_DIR / "links.csv"
 OUT_CSV    = BASE_DIR / "movies_uk.csv"
+CACHE_JSONL = BASE_DIR / "tmdb_uk_cache.jsonl"   # ответы TMDb по tmdbId — для дозапуска
 
 # ----------- TMDb API-ключ ---------------------------------------------------
 TMDB_KEY = os.getenv("TMDB_API_KEY") or "11c77e7e912d89b40d8920eb43d1d057"
 if not TMDB_KEY or len(TMDB_KEY) != 32:
     sys.exit("TMDB_API_KEY не указан или неверный (ожидается 32-символьная строка)")
 
+# ----------- параметры загрузки ---------------------------------------------
+TMDB_BASE_URL    = "https://api.themoviedb.org/3"
+WORKERS          = 16
+RATE_LIMIT       = 40.0   # запросов/с на все потоки (лимит TMDb ~50/с)
+CHECKPOINT_EVERY = 1000
+MAX_RATE_WAIT    = 300.0  # секунд ожидания по 429 на один фильм, дальше — ошибка
+
 # ----------- вспомогательные функции ----------------------------------------
 YEAR_RE = re.compile(r"\((\d{4})\)\s*$")
 
@@ -55,38 +73,219 @@ def clean_title(title: str) -> str:
     return t
 
 
-def tmdb_uk_meta(tmdb_id: int, max_retries: int = 3, delay: float = 0.25) -> dict[str, Any]:
-    url = f"https://api.themoviedb.org/3/movie/{tmdb_id}"
-    params = {"api_key": TMDB_KEY, "language": "uk-UA"} # Новая строка
-
-    for attempt in range(1, max_retries + 1):
-        try:
-            r = requests.get(url, params=params, timeout=10)
+# ----------- ограничение частоты запросов -----------------------------------
+class TokenBucket:
+    """
+    Token bucket на все потоки: не больше rate запросов в секунду (всплеск до burst).
+    pause() — общая пауза для всех (ответ 429 с Retry-After).
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+# ----------- кэш ответов на диске --------------------------------------------
+class ResponseCache:
+    """
+    Ответы TMDb по tmdbId в JSONL (одна строка — один фильм, только нужные поля).
+    Файл дописывается по мере ответов, поэтому перезапуск пропускает уже скачанное;
+    оборванная при падении последняя строка просто игнорируется.
+    404 тоже кэшируется, сетевые ошибки — нет (их повторим при следующем запуске).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data: dict[int, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.data[int(entry["tmdbId"])] = entry
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def __contains__(self, tmdb_id: int) -> bool:
+        return tmdb_id in self.data
+
+    def get(self, tmdb_id: int) -> dict[str, Any] | None:
+        return self.data.get(tmdb_id)
+
+    def put(self, tmdb_id: int, entry: dict[str, Any]) -> None:
+        entry = {"tmdbId": tmdb_id, **entry}
+        with self._lock:
+            self.data[tmdb_id] = entry
+            self._fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        with self._lock:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        self._fh.close()
+
+
+# ----------- запросы к TMDb --------------------------------------------------
+class TmdbAuthError(RuntimeError):
+    """401 — дальше спрашивать бессмысленно."""
+
+
+def compact_meta(meta: dict[str, Any]) -> dict[str, Any]:
+    """Из полного ответа TMDb — только то, что идёт в movies_uk.csv."""
+    prod = meta.get("production_companies") or []
+    return {
+        "title":  meta.get("title"),
+        "genres": [g["name"] for g in meta.get("genres") or []],
+        "studio": prod[0]["name"] if prod else None,
+    }
+
+
+class TmdbClient:
+    """Потокобезопасный клиент: requests.Session на поток + общий TokenBucket."""
+
+    def __init__(self, base_url: str = TMDB_BASE_URL, rate: float = RATE_LIMIT, max_retries: int = 3,
+                 max_rate_wait: float = MAX_RATE_WAIT):
+        self.base_url = base_url.rstrip("/")
+        self.bucket = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.max_rate_wait = max_rate_wait
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def uk_meta(self, tmdb_id: int) -> dict[str, Any] | None:
+        """
+        Сжатые метаданные (compact_meta) на украинском; {"status": 404} для отсутствующих
+        фильмов; None — не удалось получить (в кэш не пишется, следующий запуск дозапросит).
+        """
+        url = f"{self.base_url}/movie/{tmdb_id}"
+        params = {"api_key": TMDB_KEY, "language": "uk-UA"}
+
+        attempt = 0
+        waited = 0.0
+        while attempt < self.max_retries:
+            self.bucket.acquire()
+            try:
+                r = self.session.get(url, params=params, timeout=10)
+            except requests.RequestException as e:
+                attempt += 1
+                log.error(" - tmdbId=%s попытка %s/%s: %s", tmdb_id, attempt, self.max_retries, e)
+                time.sleep(2 * attempt)
+                continue
 
             if r.status_code == 404:
-                log.warning(" - TMDb 404 (нет фильма)")
-                return {}
+                log.warning(" - tmdbId=%s: TMDb 404 (нет фильма)", tmdb_id)
+                return {"status": 404}
             if r.status_code == 401:
-                log.error(" - 401 Unauthorized. Проверьте API-ключ!")
-                sys.exit(1)
+                raise TmdbAuthError("401 Unauthorized. Проверьте API-ключ!")
             if r.status_code == 429:
-                wait = int(r.headers.get("Retry-After", 2))
+                # лимит — не ошибка запроса: попытку не тратим, притормаживаем все потоки
+                wait = retry_after(r.headers.get("Retry-After"))
+                if waited + wait > self.max_rate_wait:
+                    log.error(" - tmdbId=%s: 429 дольше %.0f с, пропускаем", tmdb_id, self.max_rate_wait)
+                    return None
+                waited += wait
                 log.warning(" - 429 Too Many Requests. ждём %s с…", wait)
-                time.sleep(wait)
+                self.bucket.pause(wait)
                 continue
+            if r.status_code >= 500:
+                attempt += 1
+                log.error(" - tmdbId=%s попытка %s/%s: HTTP %s", tmdb_id, attempt, self.max_retries, r.status_code)
+                time.sleep(2 * attempt)
+                continue
+
+            if r.status_code >= 400:
+                # 400/403/422… — запрос по этому id не пройдёт и при повторе; остальные фильмы качаем дальше
+                log.error(" - tmdbId=%s: HTTP %s", tmdb_id, r.status_code)
+                return None
+            try:
+                return {"status": 200, **compact_meta(r.json())}
+            except ValueError as e:
+                log.error(" - tmdbId=%s: некорректный ответ: %s", tmdb_id, e)
+                return None
+
+        return None
+
+
+def retry_after(value: str | None, default: float = 2.0) -> float:
+    """Retry-After в секундах (HTTP-дата тоже допустима)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+
+
+# ----------- выход -----------------------------------------------------------
+OUT_COLUMNS = [
+    "movieId",
+    "title",
+    "genres",
+    "year",
+    "imdbId",
+    "tmdbId",
+    "title_uk",
+    "genres_uk",
+    "studio",
+]
 
-            r.raise_for_status()
-            time.sleep(delay)
-            return r.json()
 
-        except requests.RequestException as e:
-            log.error(" - попытка %s/%s: %s", attempt, max_retries, e)
-            time.sleep(2 * attempt)
+def build_output(movies: pd.DataFrame, cache: ResponseCache) -> pd.DataFrame:
+    """movies + закэшированные ответы → таблица movies_uk.csv (ещё не скачанные — пустые)."""
+    def meta_field(tmdb_id, key):
+        entry = cache.get(int(tmdb_id)) if pd.notna(tmdb_id) else None
+        return entry.get(key) if entry else None
+
+    out = movies[["movieId", "title", "genres", "year", "imdbId", "tmdbId"]].copy()
+    out["title_uk"] = [meta_field(t, "title") for t in out["tmdbId"]]
+    out["genres_uk"] = ["|".join(meta_field(t, "genres") or []) or None for t in out["tmdbId"]]
+    out["studio"] = [meta_field(t, "studio") for t in out["tmdbId"]]
+    return out[OUT_COLUMNS]
+
+
+def write_output(movies: pd.DataFrame, cache: ResponseCache, path: Path) -> None:
+    """Атомарная запись: во временный файл и os.replace — на диске всегда целый CSV."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    build_output(movies, cache).to_csv(tmp, index=False, encoding="utf-8", quoting=csv.QUOTE_MINIMAL)
+    os.replace(tmp, path)
 
-    return {}
 
 # ----------- основной процесс ----------------------------------------------
-def main() -> None:
+def load_movies() -> pd.DataFrame:
     log.info("Читаем исходные CSV …")
 
     movies = pd.read_csv(MOVIES_CSV)
@@ -98,65 +297,72 @@ def main() -> None:
 
     log.info("Объединяем с links.csv")
     movies = movies.merge(links, on="movieId", how="left")
+    movies["tmdbId"] = pd.to_numeric(movies["tmdbId"], errors="coerce").astype("Int64")
+    return movies
 
-    out_columns = [
-        "movieId",
-        "title",
-        "genres",
-        "year",
-        "imdbId",
-        "tmdbId",
-        "title_uk",
-        "genres_uk",
-        "studio",
-    ]
-
-    log.info("Открываем выходной файл: %s", OUT_CSV)
-    with OUT_CSV.open("w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=out_columns, quoting=csv.QUOTE_MINIMAL)
-        writer.writeheader()
-
-        total = len(movies)
-        log.info("Запрашиваем TMDb для %d фильмов", total)
-
-        for idx, row in movies.iterrows():
-            movie_id = row["movieId"]
-            tmdb_raw = row["tmdbId"]
-            imdb_raw = row["imdbId"]
-
-            log.info("[%5d/%d] movieId=%s  tmdbId=%s  title='%s'",
-                     idx + 1, total, movie_id, tmdb_raw, row["title"])
-
-            out_row = {
-                "movieId": movie_id,
-                "title":   row["title"],
-                "genres":  row["genres"],
-                "year":    (int(row["year"]) if pd.notna(row["year"]) else None),
-                "imdbId":  imdb_raw if pd.notna(imdb_raw) else None,
-                "tmdbId":  tmdb_raw if pd.notna(tmdb_raw) else None,
-                "title_uk":  None,
-                "genres_uk": None,
-                "studio":    None,
-            }
-
-            if pd.notna(tmdb_raw):
-                meta = tmdb_uk_meta(int(tmdb_raw))
-                out_row["title_uk"]  = meta.get("title")
-                out_row["genres_uk"] = (
-                    "|".join(g["name"] for g in meta.get("genres", [])) or None
-                )
-                prod = meta.get("production_companies", [])
-                out_row["studio"] = prod[0]["name"] if prod else None
-            else:
-                log.warning(" - нет tmdbId, пропуск")
 
-            writer.writerow(out_row)
-
-            # сбрасываем буфер каждые 100 строк
-            if (idx + 1) % 100 == 0:
-                fh.flush()
-
-    log.info("Готово!  %d строк записано.", total)
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обогащение MovieLens украинскими данными TMDb")
+    parser.add_argument("--base-url", default=TMDB_BASE_URL, help="TMDb API (например, локальный мок)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="потоков-запросчиков")
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="запросов в секунду на все потоки")
+    parser.add_argument("--cache", type=Path, default=CACHE_JSONL, help="кэш ответов (JSONL)")
+    parser.add_argument("--out", type=Path, default=OUT_CSV)
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                        help="каждые N ответов — fsync кэша и перезапись выходного CSV")
+    args = parser.parse_args()
+
+    movies = load_movies()
+    cache = ResponseCache(args.cache)
+    tmdb_ids = movies["tmdbId"].dropna().astype(int).unique()
+    todo = [t for t in tmdb_ids if t not in cache]
+    log.info("Фильмов: %d, с tmdbId: %d, уже в кэше: %d, запрашиваем: %d",
+             len(movies), len(tmdb_ids), len(tmdb_ids) - len(todo), len(todo))
+
+    client = TmdbClient(args.base_url, rate=args.rate)
+    done = failed = 0
+    exit_code = 0
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        futures = {pool.submit(client.uk_meta, int(t)): int(t) for t in todo}
+        for future in as_completed(futures):
+            tmdb_id = futures[future]
+            try:
+                entry = future.result()
+            except TmdbAuthError:
+                raise  # прерывает весь запуск
+            except Exception as e:
+                log.error(" - tmdbId=%s: %s", tmdb_id, e)
+                entry = None
+            if entry is None:
+                failed += 1
+            else:
+                cache.put(tmdb_id, entry)
+            done += 1
+            if done % args.checkpoint_every == 0 or done == len(todo):
+                cache.flush()
+                write_output(movies, cache, args.out)
+                elapsed = time.monotonic() - started
+                log.info("[%d/%d] %.1f запросов/с, ошибок: %d — checkpoint записан",
+                         done, len(todo), done / max(elapsed, 1e-9), failed)
+    except TmdbAuthError as e:
+        log.error(" - %s", e)
+        exit_code = 1
+    except KeyboardInterrupt:
+        log.warning("Прервано — скачанное сохранено в кэше, следующий запуск продолжит")
+        exit_code = 130
+    finally:
+        # при любом исходе — fsync кэша и выходной CSV по всему, что уже скачано
+        pool.shutdown(wait=False, cancel_futures=True)
+        cache.close()
+        write_output(movies, cache, args.out)
+    if exit_code:
+        sys.exit(exit_code)
+
+    if failed:
+        log.warning("%d фильмов не удалось получить — перезапустите скрипт, чтобы дозапросить их", failed)
+    log.info("Готово!  %d строк записано в %s.", len(movies), args.out)
 
 
 if __name__ == "__main__":
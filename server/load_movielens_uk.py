@@ -1,12 +1,20 @@
 # load_movielens_uk.py (Версія БЕЗ Flask-Migrate, ВИКОРИСТОВУЄ drop_all/create_all)
+# --incremental — щоденне оновлення без drop_all: у БД пишуться лише нові/змінені рядки
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, select, bindparam
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import sessionmaker
 from collections import Counter
 import os
 import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+import numpy as np
 from flask import Flask
 from werkzeug.security import generate_password_hash
 
@@ -26,6 +34,15 @@ except AttributeError:
 BASE_DATA_DIR = "D:/dyplom2/server/data/ml-latest" # <--- ВАШ ШЛЯХ ДО ПАПКИ З ДАНИМИ
 MOVIES_CSV = os.path.join(BASE_DATA_DIR, "movies_uk.csv") # <--- Ваш збагачений український файл
 RATINGS_CSV = os.path.join(BASE_DATA_DIR, "ratings.csv") # <--- Файл рейтингів
+
+# Завантаження рейтингів: "executemany" — багаторядкові INSERT через сире DBAPI-з'єднання,
+# "infile" — LOAD DATA LOCAL INFILE (потрібно local_infile=ON на сервері MySQL)
+RATINGS_LOAD_MODE = os.getenv("RATINGS_LOAD_MODE", "executemany")
+RATINGS_CHUNK_SIZE = 1_000_000 # рядків ratings.csv за один прохід читання
+RATINGS_BATCH_SIZE = 50_000    # рядків в одному executemany
+MIN_RATINGS_PER_MOVIE = 5
+RATINGS_DTYPES = {'userId': np.int32, 'movieId': np.int32, 'rating': np.float32}
+USERS_PER_QUERY = 1000         # користувачів в одному SELECT ... WHERE user_id IN (...)
 # ----------------------------------------------------
 
 # Імпортуємо ВСІ моделі з єдиного models/models.py
@@ -33,7 +50,8 @@ try:
     # Використовуємо шлях імпорту models.models
     from models.models import (
         db, Movie, MovieLink, Rating, Tag, Genre, movie_genres, User, Role,
-        MovieList, ListMovie, SavedMovie, ListRating, SavedList
+        MovieList, ListMovie, SavedMovie, ListRating, SavedList,
+        recompute_movie_rating_stats
     )
 except ImportError as e:
      print(f"[!!!] Не вдалося імпортувати моделі з models.models: {e}")
@@ -63,9 +81,551 @@ try:
 except Exception as init_err:
     print(f"[*] Попередження: Не вдалося виконати db.init_app(app). Можливо, 'db' вже ініціалізовано.")
 
-def load_data():
+# --- ПОТОКОВЕ ЧИТАННЯ РЕЙТИНГІВ ---
+def iter_ratings(path=RATINGS_CSV, chunksize=RATINGS_CHUNK_SIZE):
+    """ratings.csv шматками з типізованими колонками (timestamp не читаємо)."""
+    return pd.read_csv(path, usecols=list(RATINGS_DTYPES), dtype=RATINGS_DTYPES, chunksize=chunksize)
+
+def scan_ratings(path=RATINGS_CSV):
+    """
+    Два потокові проходи по ratings.csv без завантаження файлу цілком:
+    1) кількість оцінок на фільм → популярні фільми (>= MIN_RATINGS_PER_MOVIE);
+    2) користувачі, що оцінили хоча б один популярний фільм.
+    """
+    counts = None
+    total = 0
+    for chunk in iter_ratings(path):
+        c = chunk['movieId'].value_counts()
+        counts = c if counts is None else counts.add(c, fill_value=0)
+        total += len(chunk)
+    popular = counts[counts >= MIN_RATINGS_PER_MOVIE].index.to_numpy(dtype=np.int32)
+
+    users = [
+        chunk.loc[chunk['movieId'].isin(popular), 'userId'].unique()
+        for chunk in iter_ratings(path)
+    ]
+    active_users = np.unique(np.concatenate(users)) if users else np.zeros(0, dtype=np.int32)
+    return total, set(popular.tolist()), set(active_users.tolist())
+
+def bulk_load_ratings(engine, movie_ids, mode=RATINGS_LOAD_MODE, path=RATINGS_CSV):
+    """
+    Стадія 7 без ORM: ratings.csv потоком → фільтр isin → MySQL пачками.
+    Перевірки FK/унікальності на час завантаження вимкнені (дані вже відфільтровані,
+    таблиця щойно створена); вторинні індекси app_ratings не чіпаємо — на movie_id
+    тримається зовнішній ключ. Завантажені оцінки запам'ятовуються в ImportedRatings
+    для наступного --incremental. Повертає кількість завантажених рядків.
+    """
+    movie_ids = np.fromiter(movie_ids, dtype=np.int32)
+    loaded_at = datetime.utcnow()
+    snapshot = ImportedRatings.for_engine(engine, path)
+    writer = snapshot.writer()
+    raw = engine.raw_connection()
+    cursor = raw.cursor()
+    started = time.time()
+    loaded = 0
+    try:
+        cursor.execute("SET foreign_key_checks = 0")
+        cursor.execute("SET unique_checks = 0")
+        for chunk in iter_ratings(path):
+            chunk = chunk[chunk['movieId'].isin(movie_ids)]
+            if chunk.empty:
+                continue
+            if mode == 'infile':
+                _load_chunk_infile(cursor, chunk)
+            else:
+                _load_chunk_executemany(cursor, chunk, loaded_at)
+            raw.commit()
+            writer.add(_rating_keys(chunk['userId'], chunk['movieId']), chunk['rating'].to_numpy())
+            loaded += len(chunk)
+            elapsed = time.time() - started
+            print(f"    - {loaded} рейтингів ({loaded / max(elapsed, 1e-9):,.0f} рядків/с)")
+    finally:
+        cursor.execute("SET unique_checks = 1")
+        cursor.execute("SET foreign_key_checks = 1")
+        cursor.close()
+        raw.close()
+    writer.commit()
+    elapsed = time.time() - started
+    print(f"    - Разом: {loaded} рядків за {elapsed:.1f} с ({loaded / max(elapsed, 1e-9):,.0f} рядків/с, режим {mode})")
+    return loaded
+
+RATINGS_INSERT_SQL = "INSERT INTO app_ratings (user_id, movie_id, rating, created_at) VALUES (%s, %s, %s, %s)"
+# інкрементальний режим: пару, яку застосунок створив між читанням і записом, не перезаписуємо
+RATINGS_INSERT_NEW_SQL = RATINGS_INSERT_SQL.replace("INSERT INTO", "INSERT IGNORE INTO", 1)
+# оновлення лише якщо в БД досі значення минулого імпорту (created_at не чіпаємо)
+RATINGS_UPDATE_SQL = ("UPDATE app_ratings SET rating = %s "
+                      "WHERE user_id = %s AND movie_id = %s AND ABS(rating - %s) < 1e-4")
+
+def _load_chunk_executemany(cursor, chunk, loaded_at, sql=RATINGS_INSERT_SQL):
+    users = chunk['userId'].to_numpy().tolist()
+    movies = chunk['movieId'].to_numpy().tolist()
+    ratings = chunk['rating'].to_numpy(dtype=np.float64).round(1).tolist()
+    for start in range(0, len(users), RATINGS_BATCH_SIZE):
+        stop = start + RATINGS_BATCH_SIZE
+        cursor.executemany(sql, list(zip(users[start:stop], movies[start:stop], ratings[start:stop],
+                                         [loaded_at] * len(users[start:stop]))))
+
+def _load_chunk_infile(cursor, chunk):
+    fd, tmp_path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            chunk[['userId', 'movieId', 'rating']].to_csv(f, header=False, index=False, lineterminator='\n')
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{tmp_path.replace(os.sep, '/')}' INTO TABLE app_ratings "
+            "FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\n' "
+            "(user_id, movie_id, rating) SET created_at = UTC_TIMESTAMP()"
+        )
+    finally:
+        os.remove(tmp_path)
+
+# --- ВЕКТОРНА ПІДГОТОВКА КАТАЛОГУ (стадії 2–5) ---
+CATALOG_BATCH_SIZE = 10_000
+
+def _none_if_na(df):
+    """NaN/NA → None, щоб драйвер писав NULL."""
+    return df.astype(object).where(df.notna(), None)
+
+def explode_genres(movies_df):
+    """(movieId, name_en) для кожного жанру фільму; назви нормалізовані як .strip().title()."""
+    genres = movies_df[['movieId', 'genres']].dropna(subset=['genres'])
+    genres = genres[genres['genres'].str.lower() != '(no genres listed)']
+    exploded = genres.assign(name_en=genres['genres'].str.split('|')).explode('name_en')
+    exploded['name_en'] = exploded['name_en'].str.strip().str.title()
+    exploded = exploded[exploded['name_en'].notna() & (exploded['name_en'] != '')]
+    return exploded[['movieId', 'name_en']].drop_duplicates()
+
+def genre_rows(movie_genres_df):
+    """Унікальні жанри → рядки для таблиці genres (name_uk через CANONICAL_EN_UK_GENRE_MAP)."""
+    names = pd.Series(movie_genres_df['name_en'].unique(), name='name_en')
+    name_uk = names.map(CANONICAL_EN_UK_GENRE_MAP)
+    for missing in names[name_uk.isna() & (names != '(No Genres Listed)')]:
+        print(f"    [Увага] Не знайдено українського перекладу для жанру: '{missing}'. Поле name_uk буде NULL.")
+    return _none_if_na(pd.DataFrame({'name_en': names, 'name_uk': name_uk}))
+
+def movie_rows(movies_df):
+    """movies_df → рядки таблиці movies (title_uk за замовчуванням — title_en)."""
+    out = pd.DataFrame({
+        'movie_id': movies_df['movieId'].astype('int64'),
+        'title_en': movies_df['title'],
+        'title_uk': movies_df['title_uk'].fillna(movies_df['title']) if 'title_uk' in movies_df else movies_df['title'],
+        'year': movies_df['year'].astype('Int64') if 'year' in movies_df else pd.NA,
+        'studio': movies_df['studio'] if 'studio' in movies_df else None,
+        'genres_str': movies_df['genres'],
+    })
+    return _none_if_na(out)
+
+def movie_genre_rows(movie_genres_df, genre_ids):
+    """(movieId, name_en) + {name_en: id} → рядки асоціативної таблиці movie_genres."""
+    ids = movie_genres_df['name_en'].map(genre_ids)
+    rows = pd.DataFrame({'movie_id': movie_genres_df['movieId'], 'genre_id': ids}).dropna()
+    return rows.astype('int64').drop_duplicates()
+
+def movie_link_rows(movies_df):
+    """imdbId/tmdbId → рядки movie_links; фільми без обох ідентифікаторів пропускаються."""
+    imdb_raw = movies_df['imdbId'] if 'imdbId' in movies_df else pd.Series(None, index=movies_df.index, dtype=object)
+    imdb_num = pd.to_numeric(imdb_raw, errors='coerce')
+    imdb = imdb_num.astype('Int64').astype(str).where(imdb_num.notna(), imdb_raw.astype(str).str.strip())
+    imdb = imdb.where(imdb_raw.notna(), None)
+    tmdb = movies_df['tmdbId'].astype('Int64') if 'tmdbId' in movies_df else pd.Series(pd.NA, index=movies_df.index, dtype='Int64')
+    out = pd.DataFrame({'movie_id': movies_df['movieId'].astype('int64'), 'imdb_id': imdb, 'tmdb_id': tmdb})
+    out = out[out['imdb_id'].notna() | out['tmdb_id'].notna()]
+    return _none_if_na(out)
+
+def insert_rows(session, table, rows, batch_size=CATALOG_BATCH_SIZE):
+    """Core insert() пачками (executemany), без ORM-об'єктів. Повертає кількість рядків."""
+    records = rows.to_dict('records')
+    for start in range(0, len(records), batch_size):
+        session.execute(table.insert(), records[start:start + batch_size])
+    return len(records)
+
+# --- ІНКРЕМЕНТАЛЬНЕ ОНОВЛЕННЯ (--incremental) ---
+def upsert_rows(session, table, rows, update_cols, batch_size=CATALOG_BATCH_SIZE):
+    """INSERT ... ON DUPLICATE KEY UPDATE пачками; оновлюються лише update_cols."""
+    records = rows.to_dict('records')
+    for start in range(0, len(records), batch_size):
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in update_cols})
+        session.execute(stmt, records[start:start + batch_size])
+    return len(records)
+
+def read_table(session, columns):
+    """SELECT колонок → DataFrame того ж вигляду, що й рядки з movie_rows()/movie_link_rows()."""
+    result = session.execute(select(*columns)).all()
+    return _none_if_na(pd.DataFrame(result, columns=[c.name for c in columns]))
+
+def changed_rows(rows, existing, key):
+    """Рядки rows, яких немає в existing (за ключем key) або які відрізняються хоча б в одній колонці."""
+    if existing.empty or rows.empty:
+        return rows
+    merged = rows.merge(existing, on=key, how='left', suffixes=('', '_db'), indicator=True)
+    changed = (merged['_merge'] == 'left_only').to_numpy()
+    for col in rows.columns.difference(key):
+        new, old = merged[col], merged[f'{col}_db']
+        changed = changed | ~((new == old) | (new.isna() & old.isna())).to_numpy()
+    return rows[changed]
+
+def _rating_keys(user_ids, movie_ids):
+    """(userId, movieId) → один int64-ключ для пошуку через searchsorted."""
+    return (np.asarray(user_ids, dtype=np.int64) << 32) | np.asarray(movie_ids, dtype=np.int64)
+
+class ImportedRatings:
+    """
+    Що імпорт записав в app_ratings минулого разу: відсортовані ключі (userId, movieId)
+    та оцінки — два сирі масиви (int64 / float32), читаються через np.memmap.
+    Потрібен --incremental, щоб відрізнити оцінки з CSV від змін застосунку: користувачі
+    застосунку ділять простір userId з MovieLens, тож оцінку, яку змінили або видалили
+    в застосунку, імпорт не повинен повертати до значення з CSV.
+    Лежить поруч із ratings.csv у .cache/ і прив'язаний до БД (хеш URI без пароля).
+    """
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+
+    @classmethod
+    def for_engine(cls, engine, path=RATINGS_CSV):
+        url = engine.url.render_as_string(hide_password=True)
+        tag = hashlib.sha1(url.encode()).hexdigest()[:8]
+        return cls(os.path.join(os.path.dirname(os.path.abspath(path)), '.cache', f'ratings_imported-{tag}'))
+
+    def open(self):
+        """(ключі, оцінки) минулого імпорту; порожні масиви, якщо знімка ще немає."""
+        keys_path = os.path.join(self.state_dir, 'keys.bin')
+        if not os.path.exists(keys_path) or os.path.getsize(keys_path) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        keys = np.memmap(keys_path, dtype=np.int64, mode='r')
+        values = np.memmap(os.path.join(self.state_dir, 'values.bin'), dtype=np.float32, mode='r')
+        return keys, values
+
+    def writer(self):
+        return _ImportedRatingsWriter(self.state_dir)
+
+
+class _ImportedRatingsWriter:
+    """Новий знімок потоком у тимчасовий каталог (per-pid) → заміна старого в commit()."""
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.tmp_dir = f'{state_dir}.tmp-{os.getpid()}'
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._keys = open(os.path.join(self.tmp_dir, 'keys.bin'), 'wb')
+        self._values = open(os.path.join(self.tmp_dir, 'values.bin'), 'wb')
+        self._last = None
+        self._sorted = True
+
+    def add(self, keys, values):
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(keys):
+            return
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], np.asarray(values, dtype=np.float32)[order]
+        # ratings.csv MovieLens відсортований за userId, movieId → шматки йдуть по зростанню
+        if self._last is not None and keys[0] <= self._last:
+            self._sorted = False
+        self._last = keys[-1]
+        self._keys.write(keys.tobytes())
+        self._values.write(values.tobytes())
+
+    def commit(self):
+        self._keys.close()
+        self._values.close()
+        if not self._sorted:
+            # CSV не відсортований — одноразове сортування в пам'яті
+            keys = np.fromfile(os.path.join(self.tmp_dir, 'keys.bin'), dtype=np.int64)
+            values = np.fromfile(os.path.join(self.tmp_dir, 'values.bin'), dtype=np.float32)
+            order = np.argsort(keys, kind='stable')
+            keys[order].tofile(os.path.join(self.tmp_dir, 'keys.bin'))
+            values[order].tofile(os.path.join(self.tmp_dir, 'values.bin'))
+        shutil.rmtree(self.state_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.state_dir)
+
+
+def _lookup(sorted_keys, values, keys):
+    """Пошук keys у відсортованих sorted_keys → (знайдено, значення; 0 — не знайдено)."""
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=np.float32)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    found = sorted_keys[pos] == keys
+    return found, np.where(found, values[pos], 0).astype(np.float32)
+
+def db_ratings_for_users(cursor, user_ids, users_per_query=USERS_PER_QUERY):
+    """
+    (ключі, оцінки) app_ratings лише для user_ids, відсортовані за ключем. Запит за
+    префіксом унікального індексу (user_id, movie_id) — у пам'яті тільки діапазон
+    користувачів поточного шматка CSV, а не вся таблиця.
+    """
+    keys, values = [], []
+    user_ids = [int(uid) for uid in user_ids]
+    for start in range(0, len(user_ids), users_per_query):
+        batch = user_ids[start:start + users_per_query]
+        cursor.execute(
+            "SELECT user_id, movie_id, rating FROM app_ratings WHERE user_id IN ("
+            + ", ".join(["%s"] * len(batch)) + ")",
+            batch,
+        )
+        rows = cursor.fetchall()
+        if rows:
+            page = np.array(rows, dtype=np.float64)
+            keys.append(_rating_keys(page[:, 0], page[:, 1]))
+            values.append(page[:, 2].astype(np.float32))
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    keys, values = np.concatenate(keys), np.concatenate(values)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], values[order]
+
+def plan_ratings(csv_ratings, db_found, db_ratings, prev_found, prev_ratings):
+    """
+    Рішення для кожної оцінки шматка CSV → (insert, update, kept, imported).
+    - пари немає ні в БД, ні в минулому імпорті — нова оцінка з CSV → insert;
+    - у БД досі значення минулого імпорту, а в CSV інше → update;
+    - kept: у БД інше значення, ніж записав імпорт (змінено в застосунку), пари вже немає
+      (видалено в застосунку) або імпорт її не записував (оцінка застосунку) — не чіпаємо.
+    imported — значення, які після прогону вважаються записаними імпортом (NaN — пара до
+    знімка не потрапляє): для kept лишається старе, щоб і надалі не чіпати.
+    """
+    same_as_csv = db_found & np.isclose(db_ratings, csv_ratings)
+    db_same_prev = db_found & prev_found & np.isclose(db_ratings, prev_ratings)
+    insert = ~db_found & ~prev_found
+    update = db_same_prev & ~same_as_csv
+    kept = (db_found & ~db_same_prev & ~same_as_csv) | (~db_found & prev_found)
+
+    imported = np.where(insert | update, csv_ratings, np.nan)
+    imported = np.where(kept & prev_found, prev_ratings, imported)
+    # у БД уже значення з CSV (зокрема після обірваного прогону) — далі CSV може його виправляти
+    imported = np.where(same_as_csv, csv_ratings, imported)
+    return insert, update, kept, imported.astype(np.float32)
+
+def upsert_ratings(engine, movie_ids, path=RATINGS_CSV):
+    """
+    Інкрементальна стадія 7: ratings.csv потоком; для кожного шматка — оцінки його
+    користувачів з app_ratings і знімок минулого імпорту (ImportedRatings), далі
+    plan_ratings: нові пари вставляються, оцінки, які досі мають значення минулого
+    імпорту, оновлюються. Змінені чи видалені в застосунку оцінки та оцінки
+    користувачів застосунку залишаються. Повертає (нових, змінених, пропущених).
+    """
+    movie_ids = np.fromiter(movie_ids, dtype=np.int32)
+    loaded_at = datetime.utcnow()
+    snapshot = ImportedRatings.for_engine(engine, path)
+    prev_keys, prev_values = snapshot.open()
+    if not len(prev_keys):
+        print("    - Знімка минулого імпорту немає: наявні в БД оцінки не оновлюються")
+    writer = snapshot.writer()
+    raw = engine.raw_connection()
+    cursor = raw.cursor()
+    started = time.time()
+    added = updated = kept = 0
+    try:
+        for chunk in iter_ratings(path):
+            chunk = chunk[chunk['movieId'].isin(movie_ids)]
+            if chunk.empty:
+                continue
+            keys = _rating_keys(chunk['userId'].to_numpy(), chunk['movieId'].to_numpy())
+            csv_ratings = chunk['rating'].to_numpy(dtype=np.float32)
+            db_keys, db_values = db_ratings_for_users(cursor, chunk['userId'].unique())
+            db_found, db_ratings = _lookup(db_keys, db_values, keys)
+            prev_found, prev_ratings = _lookup(prev_keys, prev_values, keys)
+            insert, update, keep, imported = plan_ratings(
+                csv_ratings, db_found, db_ratings, prev_found, prev_ratings)
+
+            if insert.any():
+                _load_chunk_executemany(cursor, chunk[insert], loaded_at, sql=RATINGS_INSERT_NEW_SQL)
+            if update.any():
+                cursor.executemany(RATINGS_UPDATE_SQL, list(zip(
+                    csv_ratings[update].astype(np.float64).round(1).tolist(),
+                    chunk['userId'].to_numpy()[update].tolist(),
+                    chunk['movieId'].to_numpy()[update].tolist(),
+                    db_ratings[update].astype(np.float64).tolist(),
+                )))
+            raw.commit()
+            known = ~np.isnan(imported)
+            writer.add(keys[known], imported[known])
+            added += int(insert.sum())
+            updated += int(update.sum())
+            kept += int(keep.sum())
+    finally:
+        cursor.close()
+        raw.close()
+    del prev_keys, prev_values  # закрити memmap старого знімка перед заміною каталогу
+    writer.commit()
+    print(f"    - Нових: {added}, змінених: {updated}, залишено змін застосунку: {kept} "
+          f"за {time.time() - started:.1f} с")
+    return added, updated, kept
+
+def refresh_data(session, engine, movies_df, active_user_ids):
+    """
+    Інкрементальний режим: без DROP ALL, дані застосунку (списки, збережені, оцінки
+    користувачів) зберігаються. CSV порівнюються з MySQL за movieId та (userId, movieId),
+    у БД пишуться тільки нові та змінені рядки.
+    """
+    # === 1. Ролі — лише відсутні ===
+    existing_roles = {name for (name,) in session.query(Role.name)}
+    missing_roles = [Role(name=name) for name in ('admin', 'user') if name not in existing_roles]
+    if missing_roles:
+        session.add_all(missing_roles); session.commit()
+        print(f"[+] Додано ролі: {', '.join(r.name for r in missing_roles)}.")
+    user_role_id = session.query(Role.id).filter(Role.name == 'user').scalar()
+
+    movies_df = movies_df.drop_duplicates(subset='movieId')
+    movie_genres_df = explode_genres(movies_df)
+
+    # === 2. Жанри — upsert за name_en (таблиця маленька) ===
+    print("\n[*] Оновлення жанрів...")
+    genres_df = genre_rows(movie_genres_df)
+    upsert_rows(session, Genre.__table__, genres_df, ['name_uk']); session.commit()
+    genre_ids = {name.title(): gid for gid, name in session.query(Genre.id, Genre.name_en)}
+    print(f"[+] Жанрів у CSV: {len(genres_df)}.")
+
+    # === 3. Фільми — нові та змінені ===
+    print("\n[*] Оновлення фільмів...")
+    movie_table = Movie.__table__
+    rows = movie_rows(movies_df)
+    existing = read_table(session, [movie_table.c[col] for col in rows.columns])
+    changed = changed_rows(rows, existing, ['movie_id'])
+    # popularity / rating_* не з CSV — їх не перезаписуємо
+    upsert_rows(session, movie_table, changed, [c for c in rows.columns if c != 'movie_id'])
+    session.commit()
+    print(f"[+] Фільмів нових або змінених: {len(changed)} з {len(rows)}.")
+
+    # === 4. Зв'язки фільм-жанр — додаємо нові пари, прибираємо зниклі (лише для фільмів з CSV) ===
+    print("\n[*] Оновлення зв'язків фільм-жанр...")
+    pairs = movie_genre_rows(movie_genres_df, genre_ids)
+    existing_pairs = read_table(session, [movie_genres.c.movie_id, movie_genres.c.genre_id]).astype('int64')
+    existing_pairs = existing_pairs[existing_pairs['movie_id'].isin(rows['movie_id'].astype('int64'))]
+    diff = pairs.merge(existing_pairs, on=['movie_id', 'genre_id'], how='outer', indicator=True)
+    new_pairs = diff.loc[diff['_merge'] == 'left_only', ['movie_id', 'genre_id']]
+    stale_pairs = diff.loc[diff['_merge'] == 'right_only', ['movie_id', 'genre_id']]
+    insert_rows(session, movie_genres, new_pairs)
+    if len(stale_pairs):
+        session.execute(
+            movie_genres.delete()
+            .where(movie_genres.c.movie_id == bindparam('m_id'))
+            .where(movie_genres.c.genre_id == bindparam('g_id')),
+            stale_pairs.rename(columns={'movie_id': 'm_id', 'genre_id': 'g_id'}).to_dict('records'),
+        )
+    session.commit()
+    print(f"[+] Зв'язків додано: {len(new_pairs)}, видалено: {len(stale_pairs)}.")
+
+    # === 5. Посилання — upsert за movie_id ===
+    print("\n[*] Оновлення посилань на фільми (IMDb, TMDB)...")
+    link_table = MovieLink.__table__
+    links = movie_link_rows(movies_df)
+    existing = read_table(session, [link_table.c.movie_id, link_table.c.imdb_id, link_table.c.tmdb_id])
+    changed = changed_rows(links, existing, ['movie_id'])
+    upsert_rows(session, link_table, changed, ['imdb_id', 'tmdb_id']); session.commit()
+    print(f"[+] Посилань нових або змінених: {len(changed)}.")
+
+    # === 6. Користувачі — лише нові (паролі та профілі наявних не чіпаємо) ===
+    print("\n[*] Оновлення користувачів...")
+    existing_users = {uid for (uid,) in session.query(User.id)}
+    new_users = sorted(int(uid) for uid in active_user_ids if int(uid) not in existing_users)
+    if new_users:
+        default_password = generate_password_hash("password123")
+        insert_rows(session, User.__table__, pd.DataFrame({
+            'id': new_users,
+            'email': [f"user{uid}@example.com" for uid in new_users],
+            'password': default_password,
+            'name': [f"User {uid}" for uid in new_users],
+            'role_id': user_role_id,
+            'created_at': datetime.utcnow(),
+        }))
+        session.commit()
+    print(f"[+] Нових користувачів: {len(new_users)}.")
+
+    # === 7. Рейтинги — нові та змінені ===
+    print("\n[*] Оновлення рейтингів фільмів...")
+    upsert_ratings(engine, set(movies_df['movieId'].astype(int)))
+    print("    - Перерахунок rating_count / rating_mean для фільмів...")
+    recompute_movie_rating_stats(session.connection()); session.commit()
+
+def load_full(session, engine, movies_df, active_user_ids):
+    """Стадії 1–7 повного завантаження у щойно створені порожні таблиці."""
+    # === 1. Завантаження Ролей ===
+    print("\n[*] Завантаження ролей...")
+    role_cache = {}
+    # Додаємо ролі, якщо їх немає (drop_all їх видалив)
+    admin_role = Role(name="admin")
+    user_role = Role(name="user")
+    session.add_all([admin_role, user_role])
+    session.commit()
+    print("[+] Ролі завантажено.")
+    role_cache['admin'] = admin_role
+    role_cache['user'] = user_role
+    user_role_obj = role_cache.get('user')
+    if not user_role_obj: raise Exception("Не вдалося створити/знайти роль 'user'") # Критична помилка
+
+    # Стадії 2–5 — векторні перетворення DataFrame + Core insert() пачками
+    movies_df = movies_df.drop_duplicates(subset='movieId')
+    movie_genres_df = explode_genres(movies_df)
+
+    # === 2. Завантаження Жанрів ===
+    print("\n[*] Завантаження жанрів (з українською картою EN->UK)...")
+    genres_df = genre_rows(movie_genres_df)
+    print(f"    - Знайдено {len(genres_df)} унікальних нормалізованих EN жанрів.")
+    if len(genres_df):
+        insert_rows(session, Genre.__table__, genres_df); session.commit()
+        print(f"[+] Додано {len(genres_df)} жанрів.")
+    else:
+         print("[-] Жанрів для додавання немає.")
+    genre_ids = {name.title(): gid for gid, name in session.query(Genre.id, Genre.name_en)}
+
+    # === 3. Завантаження Фільмів ===
+    print("\n[*] Завантаження фільмів...")
+    stage_start = time.time()
+    movies_count = insert_rows(session, Movie.__table__, movie_rows(movies_df))
+    print(f"[+] Додано {movies_count} фільмів ({time.time() - stage_start:.1f} с).")
+
+    # === 4. Завантаження Зв'язків Фільм-Жанр ===
+    print("\n[*] Зв'язування фільмів та жанрів...")
+    link_count = insert_rows(session, movie_genres, movie_genre_rows(movie_genres_df, genre_ids))
+    session.commit() # Коммітимо фільми і зв'язки разом
+    print(f"[+] Завантажено фільми та {link_count} зв'язків фільм-жанр.")
+    movie_ids_in_db = set(movies_df['movieId'].astype(int))
+
+    # === 5. Завантаження Посилань ===
+    print("\n[*] Завантаження посилань на фільми (IMDb, TMDB)...")
+    links_count = insert_rows(session, MovieLink.__table__, movie_link_rows(movies_df))
+    session.commit()
+    if links_count:
+         print(f"[+] {links_count} посилань на фільми завантажено.")
+    else:
+         print("[-] Нових дійсних посилань для завантаження не знайдено.")
+
+    # === 6. Завантаження Користувачів ===
+    print("\n[*] Завантаження користувачів...")
+    users_to_commit = []
+    default_password = generate_password_hash("password123")
+    new_user_count = 0
+    user_role_id = user_role_obj.id
+    for user_id in active_user_ids:
+         user_id_int = int(user_id)
+         # Не перевіряємо existing_user_ids, бо таблиця порожня
+         users_to_commit.append(User(id=user_id_int, email=f"user{user_id_int}@example.com", password=default_password, name=f"User {user_id_int}", role_id=user_role_id))
+         new_user_count += 1
+         if len(users_to_commit) >= 5000:
+             print(f"    - Комміт {len(users_to_commit)} користувачів...")
+             session.bulk_save_objects(users_to_commit); session.commit(); users_to_commit = []
+    if users_to_commit:
+         print(f"    - Комміт залишку ({len(users_to_commit)}) користувачів...")
+         session.bulk_save_objects(users_to_commit); session.commit()
+    print(f"[+] {new_user_count} користувачів завантажено.")
+
+    # === 7. Завантаження Рейтингів Фільмів ===
+    print("\n[*] Завантаження рейтингів фільмів...")
+    # Рейтинги — потоком з CSV прямо в MySQL (bulk_load_ratings), без ORM-об'єктів.
+    # Усі користувачі цих рейтингів уже завантажені (active_user_ids) на стадії 6.
+    added_count = bulk_load_ratings(engine, movie_ids_in_db)
+    print(f"[+] {added_count} рейтингів завантажено.")
+
+    # пряме завантаження не викликає слухачів подій — перераховуємо статистику разом
+    print("    - Перерахунок rating_count / rating_mean для фільмів...")
+    recompute_movie_rating_stats(session.connection()); session.commit()
+
+def load_data(incremental=False, assume_yes=False):
     start_time = time.time()
-    engine = create_engine(MYSQL_URI)
+    # LOAD DATA LOCAL INFILE вимагає дозволу і на стороні клієнта
+    connect_args = {'allow_local_infile': True} if RATINGS_LOAD_MODE == 'infile' else {}
+    engine = create_engine(MYSQL_URI, connect_args=connect_args)
     try:
         connection_test = engine.connect()
         connection_test.close()
@@ -86,10 +646,11 @@ def load_data():
         movies_df_raw = pd.read_csv(
             MOVIES_CSV, dtype={'movieId': 'int64', 'imdbId': 'str', 'tmdbId': 'Int64', 'year': 'Int64'}
         )
-        ratings_df_raw = pd.read_csv(RATINGS_CSV)
-        print("[+] CSV файли успішно прочитано.")
+        print("[+] CSV фільмів прочитано.")
         print(f"    Фільми (raw): {len(movies_df_raw)} рядків")
-        print(f"    Рейтинги (raw): {len(ratings_df_raw)} рядків")
+        # ratings.csv не вантажимо в пам'ять цілком — лише потокові проходи
+        ratings_total, popular_movie_ids, active_user_ids = scan_ratings(RATINGS_CSV)
+        print(f"    Рейтинги (raw): {ratings_total} рядків")
     except FileNotFoundError as e:
         print(f"[!!!] ПОМИЛКА: Не знайдено CSV файл - {e}")
         print(f"    Перевірте шлях: {os.path.dirname(MOVIES_CSV)}")
@@ -100,222 +661,69 @@ def load_data():
         session.close()
         return
 
-    print("[*] Фільтрація фільмів та рейтингів (мін. 5 рейтингів на фільм)...")
-    if 'movieId' not in ratings_df_raw.columns:
-        print("[!!!] ПОМИЛКА: Колонка 'movieId' відсутня у файлі ratings.csv")
-        session.close()
-        return
+    print(f"[*] Фільтрація фільмів та рейтингів (мін. {MIN_RATINGS_PER_MOVIE} рейтингів на фільм)...")
     if 'movieId' not in movies_df_raw.columns:
         print(f"[!!!] ПОМИЛКА: Колонка 'movieId' відсутня у файлі {MOVIES_CSV}")
         session.close()
         return
 
-    ratings_count = ratings_df_raw.groupby('movieId').size().reset_index(name='count')
-    popular_movie_ids = set(ratings_count[ratings_count['count'] >= 5]['movieId'])
     movies_df = movies_df_raw[movies_df_raw['movieId'].isin(popular_movie_ids)].copy()
-    ratings_df = ratings_df_raw[ratings_df_raw['movieId'].isin(popular_movie_ids)].copy()
 
     print(f"[*] Відфільтровано до {len(popular_movie_ids)} популярних фільмів.")
     print(f"[*] Використовується {len(movies_df)} рядків з даних про фільми для завантаження.")
-    active_user_ids = set(ratings_df['userId'].unique())
     print(f"[*] Знайдено {len(active_user_ids)} активних користувачів.")
 
 
     with app.app_context():
-        print("\n[*] Підготовка бази даних (DROP ALL -> CREATE ALL)...")
-        # !!! ЗАПИТ НА ПІДТВЕРДЖЕННЯ ВИДАЛЕННЯ ДАНИХ !!!
-        proceed = input("    !!! УВАГА !!! Цей скрипт видалить ВСІ існуючі таблиці та дані і створить їх заново! Продовжити? (yes/no): ")
-        if proceed.lower() != 'yes':
-            print("[-] Завантаження скасовано користувачем.")
-            session.close()
-            return
-
-# Замість попереднього блоку try...except для drop/create:
-        try:
-            print("    - Операції з таблицями бази даних...")
-            with engine.connect() as connection:
-                # Починаємо транзакцію для всього процесу видалення/створення
-                with connection.begin():
-                    print("      - Тимчасове вимкнення перевірки зовнішніх ключів...")
-                    connection.execute(text("SET FOREIGN_KEY_CHECKS = 0;"))
-
-                    print("      - Видалення всіх таблиць (якщо існують)...")
-                    # Передаємо з'єднання напряму в drop_all/create_all
-                    db.metadata.drop_all(bind=connection, checkfirst=True)
-
-                    print("      - Створення всіх таблиць...")
-                    db.metadata.create_all(bind=connection)
-
-                    print("      - Увімкнення перевірки зовнішніх ключів...")
-                    connection.execute(text("SET FOREIGN_KEY_CHECKS = 1;"))
-                    # Транзакція автоматично завершиться (commit) тут
-            print("[+] Таблиці успішно видалено та створено.")
-        except OperationalError as oe:
-             print(f"[!!!] ПОМИЛКА Операції з БД: {oe}")
-             session.close() # Закриваємо сесію SQLAlchemy, якщо вона ще відкрита
-             return
-        except Exception as e:
-            print(f"[!!!] ПОМИЛКА при видаленні/створенні таблиць: {e}")
-            session.close() # Закриваємо сесію SQLAlchemy
-            return
-        # ---> Кінець оновленого блоку <---
+        if incremental:
+            # Таблиці та дані застосунку (списки, збережені, оцінки) не чіпаємо —
+            # лише створюємо відсутні таблиці
+            print("\n[*] Інкрементальний режим: оновлення без DROP ALL...")
+            db.metadata.create_all(bind=engine, checkfirst=True)
+        else:
+            print("\n[*] Підготовка бази даних (DROP ALL -> CREATE ALL)...")
+            # !!! ЗАПИТ НА ПІДТВЕРДЖЕННЯ ВИДАЛЕННЯ ДАНИХ !!!
+            proceed = 'yes' if assume_yes else input("    !!! УВАГА !!! Цей скрипт видалить ВСІ існуючі таблиці та дані і створить їх заново! Продовжити? (yes/no): ")
+            if proceed.lower() != 'yes':
+                print("[-] Завантаження скасовано користувачем.")
+                session.close()
+                return
+
+            # Замість попереднього блоку try...except для drop/create:
+            try:
+                print("    - Операції з таблицями бази даних...")
+                with engine.connect() as connection:
+                    # Починаємо транзакцію для всього процесу видалення/створення
+                    with connection.begin():
+                        print("      - Тимчасове вимкнення перевірки зовнішніх ключів...")
+                        connection.execute(text("SET FOREIGN_KEY_CHECKS = 0;"))
+
+                        print("      - Видалення всіх таблиць (якщо існують)...")
+                        # Передаємо з'єднання напряму в drop_all/create_all
+                        db.metadata.drop_all(bind=connection, checkfirst=True)
+
+                        print("      - Створення всіх таблиць...")
+                        db.metadata.create_all(bind=connection)
+
+                        print("      - Увімкнення перевірки зовнішніх ключів...")
+                        connection.execute(text("SET FOREIGN_KEY_CHECKS = 1;"))
+                        # Транзакція автоматично завершиться (commit) тут
+                print("[+] Таблиці успішно видалено та створено.")
+            except OperationalError as oe:
+                 print(f"[!!!] ПОМИЛКА Операції з БД: {oe}")
+                 session.close() # Закриваємо сесію SQLAlchemy, якщо вона ще відкрита
+                 return
+            except Exception as e:
+                print(f"[!!!] ПОМИЛКА при видаленні/створенні таблиць: {e}")
+                session.close() # Закриваємо сесію SQLAlchemy
+                return
+            # ---> Кінець оновленого блоку <---
 
         try:
-            # === 1. Завантаження Ролей ===
-            print("\n[*] Завантаження ролей...")
-            role_cache = {}
-            # Додаємо ролі, якщо їх немає (drop_all їх видалив)
-            admin_role = Role(name="admin")
-            user_role = Role(name="user")
-            session.add_all([admin_role, user_role])
-            session.commit()
-            print("[+] Ролі завантажено.")
-            role_cache['admin'] = admin_role
-            role_cache['user'] = user_role
-            user_role_obj = role_cache.get('user')
-            if not user_role_obj: raise Exception("Не вдалося створити/знайти роль 'user'") # Критична помилка
-
-            # === 2. Завантаження Жанрів ===
-            print("\n[*] Завантаження жанрів (з українською картою EN->UK)...")
-            genre_cache_en_normalized = {}
-            all_genres_en_normalized_in_df = set()
-            for genres_str in movies_df['genres'].dropna().unique():
-                 if genres_str.lower() != '(no genres listed)':
-                      all_genres_en_normalized_in_df.update(g.strip().title() for g in genres_str.split('|') if g.strip())
-            print(f"    - Знайдено {len(all_genres_en_normalized_in_df)} унікальних нормалізованих EN жанрів.")
-
-            genres_to_add = []
-            for g_name_en_normalized in all_genres_en_normalized_in_df:
-                g_name_uk = CANONICAL_EN_UK_GENRE_MAP.get(g_name_en_normalized)
-                if g_name_uk is None and g_name_en_normalized != '(No Genres Listed)':
-                    print(f"    [Увага] Не знайдено українського перекладу для жанру: '{g_name_en_normalized}'. Поле name_uk буде NULL.")
-                genre_obj = Genre(name_en=g_name_en_normalized, name_uk=g_name_uk)
-                genres_to_add.append(genre_obj)
-                genre_cache_en_normalized[g_name_en_normalized] = genre_obj # Додаємо в кеш одразу
-
-            if genres_to_add:
-                print(f"    - Додавання {len(genres_to_add)} жанрів до БД...")
-                session.add_all(genres_to_add)
-                session.commit() # Коммітимо жанри
-                print(f"[+] Додано {len(genres_to_add)} жанрів.")
-                # Оновлюємо кеш з об'єктами, що мають ID
-                genre_cache_en_normalized = {g.name_en.title(): g for g in session.query(Genre).all()}
+            if incremental:
+                refresh_data(session, engine, movies_df, active_user_ids)
             else:
-                 print("[-] Жанрів для додавання немає.")
-            print(f"    - Розмір кешу жанрів (нормалізований): {len(genre_cache_en_normalized)}")
-
-
-            # === 3. Завантаження Фільмів ===
-            print("\n[*] Завантаження фільмів...")
-            movies_to_commit_objs = []
-            movie_objects_cache = {} # Цей кеш використовується для зв'язків
-            for _, row in movies_df.iterrows():
-                 movie_id = int(row['movieId'])
-                 title_en = row['title']; title_uk = row.get('title_uk') if pd.notna(row.get('title_uk')) else title_en
-                 year_val = row.get('year'); year = int(year_val) if pd.notna(year_val) else None
-                 studio = row.get('studio') if pd.notna(row.get('studio')) else None
-                 genres_original_str = row.get('genres') if pd.notna(row.get('genres')) else None
-                 # !!! ВИКОРИСТОВУЄМО movie_id ЯК ІМ'Я АРГУМЕНТУ !!!
-                 movie = Movie(
-                     movie_id=movie_id, # <--- Використовуємо ім'я колонки моделі
-                     title_en=title_en, title_uk=title_uk, year=year,
-                     studio=studio, genres_str=genres_original_str
-                     # popularity поки не завантажуємо
-                 )
-                 movies_to_commit_objs.append(movie)
-                 movie_objects_cache[movie_id] = movie
-
-            if movies_to_commit_objs:
-                 print(f"    - Підготовка {len(movies_to_commit_objs)} об'єктів фільмів...")
-                 session.add_all(movies_to_commit_objs)
-                 session.flush() # Потрібно, щоб об'єкти були в сесії для зв'язків
-                 print(f"[+] Додано {len(movies_to_commit_objs)} фільмів (перед коммітом).")
-
-            # === 4. Завантаження Зв'язків Фільм-Жанр ===
-            print("\n[*] Зв'язування фільмів та жанрів...")
-            link_count = 0
-            processed_movie_ids_linking = set()
-            for _, row in movies_df.iterrows():
-                  movie_id = int(row['movieId'])
-                  if movie_id in processed_movie_ids_linking: continue
-                  processed_movie_ids_linking.add(movie_id)
-                  movie = movie_objects_cache.get(movie_id) # Беремо з кешу сесії
-                  if not movie: continue
-                  genres_en_str = row['genres']
-                  if pd.notna(genres_en_str) and genres_en_str.lower() != '(no genres listed)':
-                      for g_name_en in genres_en_str.split('|'):
-                          g_clean_en_normalized = g_name_en.strip().title()
-                          if g_clean_en_normalized:
-                              genre = genre_cache_en_normalized.get(g_clean_en_normalized)
-                              if genre:
-                                  if genre not in movie.genres:
-                                      movie.genres.append(genre)
-                                      link_count += 1
-            print(f"    - Підготовлено {link_count} зв'язків фільм-жанр...")
-            session.commit() # Коммітимо фільми і зв'язки разом
-            print(f"[+] Завантажено фільми та {link_count} зв'язків фільм-жанр.")
-            # Оновлюємо кеш об'єктів фільмів тими, що точно є в БД
-            movie_objects_cache = {m.movie_id: m for m in session.query(Movie).filter(Movie.movie_id.in_(list(movie_objects_cache.keys()))).all()}
-
-            # === 5. Завантаження Посилань ===
-            print("\n[*] Завантаження посилань на фільми (IMDb, TMDB)...")
-            links_to_commit = []
-            for _, row in movies_df.iterrows():
-                 movie_id = int(row['movieId'])
-                 if movie_id in movie_objects_cache:
-                    imdb_id_val = row.get('imdbId'); tmdb_id_val = row.get('tmdbId'); imdb_id_str = None
-                    if pd.notna(imdb_id_val):
-                        try: imdb_id_str = str(int(float(imdb_id_val)))
-                        except (ValueError, TypeError): imdb_id_str = str(imdb_id_val).strip()
-                    tmdb_id_int = int(tmdb_id_val) if pd.notna(tmdb_id_val) else None
-                    if imdb_id_str or tmdb_id_int is not None:
-                        links_to_commit.append(MovieLink(movie_id=movie_id, imdb_id=imdb_id_str, tmdb_id=tmdb_id_int))
-            if links_to_commit:
-                 print(f"    - Підготовка {len(links_to_commit)} об'єктів посилань...")
-                 session.bulk_save_objects(links_to_commit); session.commit()
-                 print(f"[+] {len(links_to_commit)} посилань на фільми завантажено.")
-            else:
-                 print("[-] Нових дійсних посилань для завантаження не знайдено.")
-
-            # === 6. Завантаження Користувачів ===
-            print("\n[*] Завантаження користувачів...")
-            users_to_commit = []
-            default_password = generate_password_hash("password123")
-            new_user_count = 0
-            user_role_id = user_role_obj.id
-            for user_id in active_user_ids:
-                 user_id_int = int(user_id)
-                 # Не перевіряємо existing_user_ids, бо таблиця порожня
-                 users_to_commit.append(User(id=user_id_int, email=f"user{user_id_int}@example.com", password=default_password, name=f"User {user_id_int}", role_id=user_role_id))
-                 new_user_count += 1
-                 if len(users_to_commit) >= 5000:
-                     print(f"    - Комміт {len(users_to_commit)} користувачів...")
-                     session.bulk_save_objects(users_to_commit); session.commit(); users_to_commit = []
-            if users_to_commit:
-                 print(f"    - Комміт залишку ({len(users_to_commit)}) користувачів...")
-                 session.bulk_save_objects(users_to_commit); session.commit()
-            print(f"[+] {new_user_count} користувачів завантажено.")
-
-            # === 7. Завантаження Рейтингів Фільмів ===
-            print("\n[*] Завантаження рейтингів фільмів...")
-            ratings_to_commit = []
-            added_count = 0
-            movie_ids_in_db = set(movie_objects_cache.keys()) # ID фільмів, які ми завантажили
-
-            for _, row in ratings_df.iterrows():
-                 user_id = int(row['userId'])
-                 movie_id = int(row['movieId'])
-                 # Перевіряємо, чи користувач активний і фільм був завантажений
-                 if user_id in active_user_ids and movie_id in movie_ids_in_db:
-                     ratings_to_commit.append({'user_id': user_id, 'movie_id': movie_id, 'rating': float(row['rating'])})
-                     added_count += 1
-                 if len(ratings_to_commit) >= 10000:
-                     print(f"    - Комміт {len(ratings_to_commit)} рейтингів...")
-                     session.bulk_insert_mappings(Rating, ratings_to_commit); session.commit(); ratings_to_commit = []
-            if ratings_to_commit:
-                 print(f"    - Комміт залишку ({len(ratings_to_commit)}) рейтингів...")
-                 session.bulk_insert_mappings(Rating, ratings_to_commit); session.commit()
-            print(f"[+] {added_count} рейтингів завантажено.")
+                load_full(session, engine, movies_df, active_user_ids)
 
             # === 8. Завантаження Тегів - ПРОПУЩЕНО ===
             print("\n[*] Завантаження тегів пропущено.")
@@ -338,6 +746,13 @@ def load_data():
             print(f"\n[*] Загальний час завантаження: {end_time - start_time:.2f} секунд.")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Завантаження MovieLens (UK) у MySQL")
+    parser.add_argument("--incremental", action="store_true",
+                        help="без DROP ALL: лише нові/змінені фільми, зв'язки, користувачі та рейтинги")
+    parser.add_argument("--yes", action="store_true",
+                        help="повне перезавантаження без інтерактивного підтвердження")
+    args = parser.parse_args()
+
     print("=== Запуск скрипта завантаження даних (БЕЗ Flask-Migrate) ===")
     print(f"Використовується директорія MovieLens: {BASE_DATA_DIR}")
     print(f"Використовується CSV фільмів: {MOVIES_CSV}")
@@ -347,5 +762,5 @@ if __name__ == '__main__':
     elif not os.path.exists(RATINGS_CSV):
          print(f"\n[!!!] КРИТИЧНА ПОМИЛКА: Файл рейтингів '{RATINGS_CSV}' не знайдено!")
     else:
-         load_data()
+         load_data(incremental=args.incremental, assume_yes=args.yes)
     print("=== Скрипт завантаження даних завершив роботу ===")
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""movie rating stats: movies.rating_count / rating_mean, index on app_ratings.movie_id
+
+Revision ID: 3c9e1f7a2b54
+Revises:
+Create Date: 2026-10-18 11:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f7a2b54'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_app_ratings_movie_id'
+
+# SQL зафиксирован здесь, а не через models.models.recompute_movie_rating_stats:
+# миграция не должна меняться вместе с кодом приложения
+BACKFILL_SQL = """
+UPDATE movies SET
+    rating_count = (SELECT COUNT(app_ratings.id) FROM app_ratings
+                    WHERE app_ratings.movie_id = movies.movie_id),
+    rating_mean = (SELECT AVG(app_ratings.rating) FROM app_ratings
+                   WHERE app_ratings.movie_id = movies.movie_id)
+"""
+
+
+def _existing(inspector):
+    """(колонки movies, индексы app_ratings, начинающиеся с movie_id)."""
+    columns = {c['name'] for c in inspector.get_columns('movies')}
+    # MySQL сам создаёт индекс под внешний ключ app_ratings.movie_id — под другим
+    # именем, поэтому ищем по первой колонке, а не по INDEX_NAME
+    movie_indexes = {i['name'] for i in inspector.get_indexes('app_ratings')
+                     if i['column_names'][:1] == ['movie_id']}
+    return columns, movie_indexes
+
+
+def upgrade():
+    # база могла быть создана через db.create_all() / load_movielens_uk.py уже с новыми
+    # колонками — добавляем только то, чего нет
+    columns, movie_indexes = _existing(sa.inspect(op.get_bind()))
+    with op.batch_alter_table('movies') as batch_op:
+        if 'rating_count' not in columns:
+            batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+        if 'rating_mean' not in columns:
+            batch_op.add_column(sa.Column('rating_mean', sa.Float(), nullable=True))
+    if not movie_indexes:
+        op.create_index(INDEX_NAME, 'app_ratings', ['movie_id'], unique=False)
+
+    # оценки, поставленные до появления колонок, слушатели не учли — считаем заново
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade():
+    columns, movie_indexes = _existing(sa.inspect(op.get_bind()))
+    # индекс под внешний ключ, созданный MySQL, не трогаем — только свой
+    if INDEX_NAME in movie_indexes:
+        op.drop_index(INDEX_NAME, table_name='app_ratings')
+    with op.batch_alter_table('movies') as batch_op:
+        if 'rating_mean' in columns:
+            batch_op.drop_column('rating_mean')
+        if 'rating_count' in columns:
+            batch_op.drop_column('rating_count')
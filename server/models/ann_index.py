@@ -0,0 +1,166 @@
+# server/models/ann_index.py
+#
+# Индекс ближайших соседей по item-факторам SVD (qi).
+# Факторы нормализуются один раз при сборке, так что косинус = скалярное произведение.
+# Поверх — простой IVF на чистом NumPy: сферический k-means делит фильмы на кластеры,
+# запрос сканирует только nprobe ближайших кластеров. nprobe=0 — точный поиск.
+
+import numpy as np
+
+from models.id_map import IdMap
+
+DEFAULT_NPROBE = 32
+KMEANS_ITERS = 15
+BLOCK_SIZE = 4096
+
+
+def normalize_rows(X):
+    X = np.asarray(X, dtype=np.float32)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    # нулевые векторы оставляем нулевыми — их похожесть со всеми будет 0
+    return np.divide(X, norms, out=np.zeros_like(X), where=norms > 1e-6)
+
+
+def _assign(X, centroids, block_size: int = BLOCK_SIZE):
+    labels = np.empty(len(X), dtype=np.int32)
+    for start in range(0, len(X), block_size):
+        labels[start:start + block_size] = np.argmax(X[start:start + block_size] @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(X, n_clusters: int, n_iter: int = KMEANS_ITERS, seed: int = 42, init=None):
+    """
+    k-means по косинусу для нормализованных строк X. Возвращает (centroids, labels).
+    init — стартовые центроиды (например, прежнего индекса): тогда хватает пары итераций.
+    """
+    rng = np.random.default_rng(seed)
+    if init is not None:
+        centroids = np.array(init, dtype=np.float32)
+    else:
+        centroids = X[rng.choice(len(X), size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(X, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, X)
+        sizes = np.bincount(labels, minlength=n_clusters)
+        # пустой кластер пересеваем случайной точкой
+        empty = np.flatnonzero(sizes == 0)
+        if len(empty):
+            sums[empty] = X[rng.choice(len(X), size=len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids, _assign(X, centroids)
+
+
+class FactorIndex:
+    """
+    Нормализованные item-факторы + IVF-кластеры.
+    lists_items — inner-индексы, сгруппированные по кластерам; lists_offsets — границы групп.
+    """
+
+    def __init__(self, factors, raw_ids, centroids=None, lists_offsets=None, lists_items=None):
+        self.factors = factors
+        self.ids = IdMap(raw_ids)
+        self.centroids = centroids
+        self.lists_offsets = lists_offsets
+        self.lists_items = lists_items
+
+    @property
+    def raw_ids(self):
+        return self.ids.raw_ids
+
+    @classmethod
+    def build(cls, qi, raw_ids, n_lists=None, seed: int = 42, centroids=None, n_iter: int = KMEANS_ITERS):
+        """centroids — прежние центроиды для warm start (n_lists берётся из них)."""
+        factors = normalize_rows(qi)
+        n_items = len(factors)
+        if centroids is not None:
+            n_lists = len(centroids)
+        elif n_lists is None:
+            n_lists = int(4 * np.sqrt(n_items))
+        n_lists = max(1, min(n_lists, n_items))
+        if centroids is not None and len(centroids) != n_lists:
+            centroids = None
+        centroids, labels = spherical_kmeans(factors, n_lists, n_iter=n_iter, seed=seed, init=centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))]).astype(np.int64)
+        return cls(factors, raw_ids, centroids, offsets, order)
+
+    @classmethod
+    def from_surprise(cls, svd, n_lists=None):
+        trainset = svd.trainset
+        qi = getattr(svd, 'qi', getattr(svd, 'qi_', None))
+        raw_ids = np.array([int(trainset.to_raw_iid(i)) for i in range(len(qi))], dtype=np.int32)
+        return cls.build(qi, raw_ids, n_lists=n_lists)
+
+    @classmethod
+    def from_mf(cls, mf, n_lists=None):
+        """Из models.mf.MFModel (ALS или сконвертированный Surprise SVD)."""
+        return cls.build(mf.qi, mf.item_ids, n_lists=n_lists)
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            factors=self.factors, raw_ids=self.raw_ids, centroids=self.centroids,
+            lists_offsets=self.lists_offsets, lists_items=self.lists_items,
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(
+                data["factors"], data["raw_ids"], data["centroids"],
+                data["lists_offsets"], data["lists_items"],
+            )
+
+    @classmethod
+    def from_arrays(cls, arrays: dict):
+        """Из массивов бандла (models/artifacts.py) — без копирования memmap."""
+        return cls(
+            arrays["svd_factors"], arrays["svd_raw_ids"], arrays["svd_centroids"],
+            arrays["svd_lists_offsets"], arrays["svd_lists_items"],
+        )
+
+    def __contains__(self, movie_id):
+        return movie_id in self.ids
+
+    def _candidates(self, v, nprobe: int):
+        """inner-индексы фильмов из nprobe ближайших к запросу кластеров."""
+        probe = np.argsort(-(self.centroids @ v))[:nprobe]
+        return np.concatenate([
+            self.lists_items[self.lists_offsets[c]:self.lists_offsets[c + 1]] for c in probe
+        ])
+
+    def search(self, v, n: int, nprobe: int = DEFAULT_NPROBE, exclude=None):
+        """
+        top-n по косинусу к нормализованному вектору v → (inner-индексы, похожести).
+        nprobe <= 0 или индекс без кластеров — точный поиск по всему каталогу.
+        """
+        if nprobe > 0 and self.centroids is not None and nprobe < len(self.centroids):
+            cand = self._candidates(v, nprobe)
+            sims = self.factors[cand] @ v
+        else:
+            cand = None
+            sims = self.factors @ v
+        if exclude is not None:
+            if cand is None:
+                sims[np.asarray(exclude, dtype=np.int64)] = -np.inf
+            else:
+                sims[np.isin(cand, exclude)] = -np.inf
+        k = min(n, len(sims))
+        if k <= 0:
+            return np.zeros(0, np.int32), np.zeros(0, np.float32)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        top = top[np.isfinite(sims[top])]
+        items = cand[top] if cand is not None else top
+        return items, sims[top]
+
+    def similar(self, movie_id: int, n: int, nprobe: int = DEFAULT_NPROBE):
+        inner_id = self.ids.to_inner(movie_id)
+        if inner_id is None:
+            return []
+        items, sims = self.search(self.factors[inner_id], n, nprobe=nprobe, exclude=[inner_id])
+        return [
+            {"movieId": int(mid), "score": float(sc)}
+            for mid, sc in zip(self.raw_ids[items], sims)
+        ]
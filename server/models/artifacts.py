@@ -0,0 +1,199 @@
+# server/models/artifacts.py
+#
+# Формат артефактов моделей для сервинга: каталог плоских .npy-файлов + manifest.json.
+# Сервер открывает их через np.load(..., mmap_mode='r'), поэтому все воркеры gunicorn
+# читают одни и те же страницы из page cache ОС, а не держат каждый свою копию —
+# память растёт O(1) по числу воркеров.
+#
+# Бандлы версионируются: <models_dir>/bundles/<version>/, а bundles/CURRENT хранит имя
+# активной версии. Сервер следит за CURRENT и подменяет модели без рестарта (models/registry.py).
+
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+
+from models.knn_index import SparseItemKNN
+from models.ann_index import FactorIndex
+from models.mf import load_mf
+from models.content_index import ContentIndex, DEFAULT_K as CONTENT_K
+
+MANIFEST = 'manifest.json'
+BUNDLE_FORMAT = 1
+
+BUNDLES_DIR = 'bundles'
+CURRENT = 'CURRENT'
+KEEP_BUNDLES = 3
+
+
+def _csr_arrays(prefix: str, m):
+    """CSR → плоские массивы; индексы одного dtype, чтобы scipy не копировал их при загрузке."""
+    m = sp.csr_matrix(m)
+    idx_dtype = np.int32 if m.nnz < np.iinfo(np.int32).max else np.int64
+    return {
+        f'{prefix}_data': m.data.astype(np.float32),
+        f'{prefix}_indices': m.indices.astype(idx_dtype),
+        f'{prefix}_indptr': m.indptr.astype(idx_dtype),
+    }
+
+
+def csr_from_arrays(arrays: dict, prefix: str, shape):
+    return sp.csr_matrix(
+        (arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'], arrays[f'{prefix}_indptr']),
+        shape=tuple(shape), copy=False,
+    )
+
+
+def write_bundle(out_dir: str, arrays: dict, meta: dict):
+    """Пишет массивы как <name>.npy и manifest.json с версией (хэш содержимого)."""
+    os.makedirs(out_dir, exist_ok=True)
+    h = hashlib.sha1()
+    for name in sorted(arrays):
+        arr = np.ascontiguousarray(arrays[name])
+        np.save(os.path.join(out_dir, f'{name}.npy'), arr)
+        h.update(name.encode())
+        h.update(arr.data)
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': h.hexdigest()[:12],
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'arrays': sorted(arrays),
+        **meta,
+    }
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_bundle(bundle_dir: str, mmap: bool = True):
+    """(manifest, {name: массив}); при mmap=True массивы — read-only memmap."""
+    with open(os.path.join(bundle_dir, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(os.path.join(bundle_dir, f'{name}.npy'), mmap_mode=mode)
+        for name in manifest['arrays']
+    }
+    return manifest, arrays
+
+
+def export_bundle(models_dir: str, out_dir: str, content_k: int = CONTENT_K, content_neighbors=None,
+                  content=None):
+    """
+    Собирает бандл из артефактов build_indexes.py и pickle-моделей в models_dir:
+    KNN (CSR соседей), SVD (нормализованные qi + IVF, сырые qi/pu/bi/bu),
+    content (L2-нормализованная CSR и, если content_k > 0, таблица top-K соседей) и id-массивы.
+    content_neighbors — готовая таблица контентных соседей (инкрементальное обучение
+    обновляет прежнюю, models/incremental.py) вместо пересчёта по всему каталогу.
+    content — (признаки, index_to_movie_id) ещё не записанного content-артефакта вместо
+    content_features.npz / index_to_movie_id.pkl из models_dir.
+    """
+    knn = SparseItemKNN.load(os.path.join(models_dir, 'knn_sparse.npz'))
+    ann = FactorIndex.load(os.path.join(models_dir, 'svd_ann.npz'))
+    svd = load_mf(models_dir)
+    if content is not None:
+        content, idx_to_id = content
+    else:
+        content = sp.load_npz(os.path.join(models_dir, 'content_features.npz'))
+        idx_to_id = joblib.load(os.path.join(models_dir, 'index_to_movie_id.pkl'))
+
+    arrays = {
+        'knn_raw_ids': knn.raw_ids,
+        'knn_item_counts': knn.item_counts,
+        **_csr_arrays('knn', knn.neighbors_csr),
+        'svd_raw_ids': ann.raw_ids,
+        'svd_factors': ann.factors,
+        'svd_centroids': ann.centroids,
+        'svd_lists_offsets': ann.lists_offsets,
+        'svd_lists_items': ann.lists_items,
+        'svd_qi': svd.qi,
+        'svd_bi': svd.bi,
+        'svd_pu': svd.pu,
+        'svd_bu': svd.bu,
+        'svd_user_ids': svd.user_ids,
+    }
+    content_index = ContentIndex(content, [idx_to_id[i] for i in range(content.shape[0])])
+    arrays['content_raw_ids'] = content_index.raw_ids
+    arrays.update(_csr_arrays('content_norm', content_index.features))
+    if content_neighbors is not None:
+        arrays.update(_csr_arrays('content_nn', content_neighbors))
+    elif content_k > 0:
+        arrays.update(_csr_arrays('content_nn', content_index.build_neighbors(content_k)))
+
+    meta = {
+        'knn_shape': list(knn.neighbors_csr.shape),
+        'content_shape': list(content.shape),
+        'svd_global_mean': svd.global_mean,
+        'svd_rating_scale': list(svd.rating_scale),
+    }
+    return write_bundle(out_dir, arrays, meta)
+
+
+# ── версии бандлов ────────────────────────────────────────────────────
+def bundle_dir(models_dir: str, version: str) -> str:
+    return os.path.join(models_dir, BUNDLES_DIR, version)
+
+
+def list_bundles(models_dir: str):
+    """Версии полностью записанных бандлов, от новых к старым."""
+    root = os.path.join(models_dir, BUNDLES_DIR)
+    if not os.path.isdir(root):
+        return []
+    versions = [
+        name for name in os.listdir(root)
+        if not name.startswith('.') and os.path.exists(os.path.join(root, name, MANIFEST))
+    ]
+    return sorted(versions, key=lambda v: os.path.getmtime(os.path.join(root, v, MANIFEST)), reverse=True)
+
+
+def current_bundle(models_dir: str):
+    """Активная версия из bundles/CURRENT или None."""
+    try:
+        with open(os.path.join(models_dir, BUNDLES_DIR, CURRENT), encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def set_current_bundle(models_dir: str, version: str):
+    """Атомарно переключает bundles/CURRENT (запись во временный файл + os.replace)."""
+    if not os.path.exists(os.path.join(bundle_dir(models_dir, version), MANIFEST)):
+        raise FileNotFoundError(f"bundle {version} not found")
+    root = os.path.join(models_dir, BUNDLES_DIR)
+    tmp_path = os.path.join(root, f'.{CURRENT}.{os.getpid()}')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, CURRENT))
+
+
+def publish_bundle(models_dir: str, keep: int = KEEP_BUNDLES, content_k: int = CONTENT_K,
+                   content_neighbors=None, content=None):
+    """
+    export_bundle во временный каталог → переименование в bundles/<version> → CURRENT.
+    Воркеры никогда не видят недописанный бандл. Старые версии сверх keep удаляются
+    (открытые mmap у ещё не переключившихся воркеров остаются валидными).
+    """
+    root = os.path.join(models_dir, BUNDLES_DIR)
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = os.path.join(root, f'.tmp-{os.getpid()}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    manifest = export_bundle(models_dir, tmp_dir, content_k=content_k, content_neighbors=content_neighbors,
+                             content=content)
+
+    target = bundle_dir(models_dir, manifest['version'])
+    if os.path.exists(target):
+        shutil.rmtree(tmp_dir)  # те же массивы уже опубликованы
+    else:
+        os.rename(tmp_dir, target)
+    set_current_bundle(models_dir, manifest['version'])
+
+    for version in list_bundles(models_dir)[keep:]:
+        if version != manifest['version']:
+            shutil.rmtree(bundle_dir(models_dir, version), ignore_errors=True)
+    return manifest
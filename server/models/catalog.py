@@ -0,0 +1,205 @@
+# server/models/catalog.py
+#
+# Каталог фильмов в памяти процесса для гидрации рекомендаций.
+# Строится один раз из таблиц movies / movie_genres / genres двумя запросами,
+# хранится в компактных массивах (id отсортированы, поиск — бинарный)
+# и точечно обновляется при create/update/delete фильма.
+# Заодно это зеркало Movie.rating_count / rating_mean для гибридного рекомендера.
+# Изменения из других воркеров приходят через журналы (models/catalog_log.py: LogTail) —
+# refresh перечитывает из БД только затронутые фильмы.
+
+import threading
+
+import numpy as np
+from sqlalchemy.orm import selectinload
+
+from models.models import Movie, Genre, movie_genres
+
+REFRESH_CHUNK = 1000   # movie_id в одном IN (...)
+
+
+def display_title(title_uk, title_en):
+    return title_uk if title_uk else title_en
+
+
+def _genres_of(movie):
+    return "|".join(g.name_uk if g.name_uk else g.name_en for g in movie.genres)
+
+
+class MovieCatalog:
+    """
+    movie_id → (title, genres, year, popularity, rating_count, rating_mean).
+    year = -1 и popularity / rating_mean = nan означают «нет данных».
+    """
+
+    def __init__(self, ids, titles, genres, years, popularity, rating_counts=None, rating_means=None):
+        self._lock = threading.RLock()
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.titles = list(titles)
+        self.genres = list(genres)
+        self.years = np.asarray(years, dtype=np.int16)
+        self.popularity = np.asarray(popularity, dtype=np.float32)
+        if rating_counts is None:
+            rating_counts = np.zeros(len(self.ids))
+        if rating_means is None:
+            rating_means = np.full(len(self.ids), np.nan)
+        self.rating_counts = np.asarray(rating_counts, dtype=np.int32)
+        self.rating_means = np.asarray(rating_means, dtype=np.float32)
+        self._popular_order = None
+
+    @classmethod
+    def load(cls, session):
+        rows = (
+            session.query(Movie.movie_id, Movie.title_en, Movie.title_uk, Movie.year, Movie.popularity,
+                          Movie.rating_count, Movie.rating_mean)
+            .order_by(Movie.movie_id)
+            .all()
+        )
+        genre_rows = (
+            session.query(movie_genres.c.movie_id, Genre.name_uk, Genre.name_en)
+            .join(Genre, Genre.id == movie_genres.c.genre_id)
+            .order_by(movie_genres.c.movie_id, Genre.id)
+            .all()
+        )
+        genres_by_movie = {}
+        for mid, name_uk, name_en in genre_rows:
+            genres_by_movie.setdefault(mid, []).append(name_uk if name_uk else name_en)
+
+        return cls(
+            ids=[r.movie_id for r in rows],
+            titles=[display_title(r.title_uk, r.title_en) for r in rows],
+            genres=["|".join(genres_by_movie.get(r.movie_id, [])) for r in rows],
+            years=[r.year if r.year is not None else -1 for r in rows],
+            popularity=[r.popularity if r.popularity is not None else np.nan for r in rows],
+            rating_counts=[r.rating_count or 0 for r in rows],
+            rating_means=[r.rating_mean if r.rating_mean is not None else np.nan for r in rows],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, movie_id):
+        with self._lock:
+            return self._pos(movie_id) is not None
+
+    def _pos(self, movie_id):
+        pos = int(np.searchsorted(self.ids, movie_id))
+        if pos < len(self.ids) and self.ids[pos] == movie_id:
+            return pos
+        return None
+
+    def get(self, movie_id):
+        with self._lock:
+            pos = self._pos(movie_id)
+            if pos is None:
+                return None
+            year = int(self.years[pos])
+            pop = float(self.popularity[pos])
+            return {
+                'movieId': int(movie_id),
+                'title': self.titles[pos],
+                'genres': self.genres[pos],
+                'year': year if year >= 0 else None,
+                'popularity': pop if not np.isnan(pop) else None,
+            }
+
+    def rating_count(self, movie_id) -> int:
+        with self._lock:
+            pos = self._pos(movie_id)
+            return int(self.rating_counts[pos]) if pos is not None else 0
+
+    def rating_counts_for(self, movie_ids) -> dict:
+        """{movie_id: rating_count} для набора фильмов одним бинарным поиском."""
+        with self._lock:
+            ids = np.asarray(list(movie_ids), dtype=np.int32)
+            if not len(ids) or not len(self.ids):
+                return {}
+            pos = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+            found = self.ids[pos] == ids
+            return {int(mid): int(cnt) for mid, cnt in zip(ids[found], self.rating_counts[pos[found]])}
+
+    def set_rating_stats(self, movie_id, count, mean):
+        with self._lock:
+            pos = self._pos(movie_id)
+            if pos is None:
+                return
+            self.rating_counts[pos] = count or 0
+            self.rating_means[pos] = mean if mean is not None else np.nan
+
+    def top_popular(self, n: int, exclude=()):
+        """Самые популярные фильмы (как ORDER BY popularity DESC), без exclude."""
+        with self._lock:
+            if self._popular_order is None:
+                # nan (нет популярности) — в конец, как NULL при сортировке DESC в MySQL
+                pop = np.nan_to_num(self.popularity, nan=-np.inf)
+                self._popular_order = np.argsort(-pop, kind="stable")
+            exclude = set(exclude)
+            out = []
+            for pos in self._popular_order:
+                mid = int(self.ids[pos])
+                if mid in exclude:
+                    continue
+                out.append(self.get(mid))
+                if len(out) >= n:
+                    break
+            return out
+
+    # ── инкрементальные обновления ────────────────────────────────────
+    def upsert(self, movie):
+        """Добавляет или обновляет фильм по ORM-объекту Movie."""
+        year = movie.year if movie.year is not None else -1
+        pop = movie.popularity if movie.popularity is not None else np.nan
+        title = display_title(movie.title_uk, movie.title_en)
+        genres = _genres_of(movie)
+        count = movie.rating_count or 0
+        mean = movie.rating_mean if movie.rating_mean is not None else np.nan
+        with self._lock:
+            pos = self._pos(movie.movie_id)
+            if pos is None:
+                pos = int(np.searchsorted(self.ids, movie.movie_id))
+                self.ids = np.insert(self.ids, pos, movie.movie_id)
+                self.years = np.insert(self.years, pos, year)
+                self.popularity = np.insert(self.popularity, pos, pop)
+                self.rating_counts = np.insert(self.rating_counts, pos, count)
+                self.rating_means = np.insert(self.rating_means, pos, mean)
+                self.titles.insert(pos, title)
+                self.genres.insert(pos, genres)
+            else:
+                self.years[pos] = year
+                self.popularity[pos] = pop
+                self.rating_counts[pos] = count
+                self.rating_means[pos] = mean
+                self.titles[pos] = title
+                self.genres[pos] = genres
+            self._popular_order = None
+
+    def refresh(self, session, movie_ids):
+        """Перечитывает фильмы movie_ids из БД: есть — upsert, удалён — remove."""
+        movie_ids = [int(mid) for mid in movie_ids]
+        found = set()
+        for start in range(0, len(movie_ids), REFRESH_CHUNK):
+            chunk = movie_ids[start:start + REFRESH_CHUNK]
+            movies = (
+                session.query(Movie).options(selectinload(Movie.genres))
+                .filter(Movie.movie_id.in_(chunk)).all()
+            )
+            for movie in movies:
+                self.upsert(movie)
+                found.add(movie.movie_id)
+        for movie_id in movie_ids:
+            if movie_id not in found:
+                self.remove(movie_id)
+
+    def remove(self, movie_id):
+        with self._lock:
+            pos = self._pos(movie_id)
+            if pos is None:
+                return
+            self.ids = np.delete(self.ids, pos)
+            self.years = np.delete(self.years, pos)
+            self.popularity = np.delete(self.popularity, pos)
+            self.rating_counts = np.delete(self.rating_counts, pos)
+            self.rating_means = np.delete(self.rating_means, pos)
+            del self.titles[pos]
+            del self.genres[pos]
+            self._popular_order = None
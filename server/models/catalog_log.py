@@ -0,0 +1,86 @@
+# server/models/catalog_log.py
+#
+# Append-only журнал изменений каталога (create / update / delete фильма через API),
+# общий для всех воркеров gunicorn — как rating_events.bin (models/rating_log.py):
+# записи фиксированной ширины (ts, movie_id), одна запись — один os.write в O_APPEND.
+#
+# Размер журнала в байтах — «поколение» каталога: растёт при каждом изменении в любом
+# воркере и читается одним os.stat, без Redis. Оно входит в ключи кэша рекомендаций
+# (models/rec_cache.py): после CRUD старые ключи не строятся ни в одном воркере.
+#
+# Каталог в памяти воркера (models/catalog.py) догоняет изменения других воркеров через
+# LogTail: хвосты этого журнала и журнала оценок → изменённые movie_id → перечитать из БД.
+
+import os
+import time
+
+import numpy as np
+
+CATALOG_LOG_FILE = 'catalog_events.bin'
+EVENT_DTYPE = np.dtype([
+    ('ts', '<i8'),          # миллисекунды unix time
+    ('movie_id', '<i4'),
+])
+
+
+class CatalogLog:
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, movie_id: int):
+        event = np.zeros(1, dtype=EVENT_DTYPE)
+        event['ts'] = int(time.time() * 1000)
+        event['movie_id'] = movie_id
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, event.tobytes())
+        finally:
+            os.close(fd)
+
+    def size(self) -> int:
+        """Текущий конец журнала в байтах (только целые записи) — поколение каталога."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+        return size - size % EVENT_DTYPE.itemsize
+
+    def read(self, start: int = 0, stop=None):
+        """События в байтах [start, stop) → (структурный массив, смещение конца)."""
+        stop = self.size() if stop is None else stop
+        count = (stop - start) // EVENT_DTYPE.itemsize
+        if count <= 0:
+            return np.zeros(0, dtype=EVENT_DTYPE), start
+        events = np.memmap(self.path, dtype=EVENT_DTYPE, mode='r', offset=start, shape=(count,))
+        return events, start + count * EVENT_DTYPE.itemsize
+
+
+class LogTail:
+    """
+    Позиция одного читателя в нескольких журналах с полем movie_id (CatalogLog, RatingLog).
+    Позиции берутся при создании — создавать до загрузки данных из БД, чтобы изменения,
+    пришедшие во время загрузки, не потерялись (повторное применение безвредно).
+    """
+
+    def __init__(self, *logs):
+        self.logs = logs
+        self.offsets = [log.size() for log in logs]
+
+    def pending(self) -> bool:
+        """Есть ли непрочитанные записи — только os.stat, без чтения журналов."""
+        return any(log.size() != offset for log, offset in zip(self.logs, self.offsets))
+
+    def advance(self):
+        """
+        Изменённые movie_id (уникальные, int32) с прошлого вызова; None — журнал стал
+        короче позиции (пересоздан), и читателю нужно перечитать всё.
+        """
+        ends = [log.size() for log in self.logs]
+        if any(end < offset for end, offset in zip(ends, self.offsets)):
+            self.offsets = ends
+            return None
+        changed = []
+        for i, (log, start, stop) in enumerate(zip(self.logs, self.offsets, ends)):
+            events, self.offsets[i] = log.read(start, stop)
+            changed.append(np.asarray(events['movie_id'], dtype=np.int32))
+        return np.unique(np.concatenate(changed)) if changed else np.zeros(0, dtype=np.int32)
@@ -0,0 +1,218 @@
+# server/models/content_builder.py
+#
+# Потоковая сборка content_features (жанры + год + TF-IDF по тегам) для больших дампов
+# MovieLens. tags.csv читается кусками, теги хэшируются HashingVectorizer'ом (словарь
+# в памяти не нужен) и сразу суммируются по фильмам разреженным умножением —
+# без groupby со склейкой строк. На выходе — float32 CSR.
+
+import os
+import time
+import pickle
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from models.id_map import IdMap
+
+try:
+    import resource
+except ImportError:  # нет на Windows — пиковую память просто не показываем
+    resource = None
+
+HASH_FEATURES = 2 ** 20
+MAX_TAG_FEATURES = 2000
+CHUNK_SIZE = 500_000
+
+
+def peak_memory_mb():
+    """
+    Пиковый RSS процесса с его запуска в МБ (ru_maxrss в Linux — в КБ) или None.
+    Значение не убывает: это максимум за всю жизнь процесса, а не за этап.
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageTimer:
+    """
+    Замер этапов: with timer('tags'): ... → в лог и в .stages (имя, секунды, пиковый RSS
+    процесса, на сколько этап его поднял). Пик накопительный — этап, который уложился
+    в память предыдущих, даёт прирост 0; прирост и показывает, какой этап задаёт пик.
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    def __call__(self, name: str):
+        self._name = name
+        return self
+
+    def __enter__(self):
+        self._peak_before = peak_memory_mb()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._started
+        peak = peak_memory_mb()
+        growth = peak - self._peak_before if peak is not None else None
+        self.stages.append((self._name, seconds, peak, growth))
+        peak_str = f", process peak RSS {peak:.0f} MB (+{growth:.0f} MB)" if peak is not None else ""
+        print(f"[{datetime.now()}]   {self._name}: {seconds:.2f}s{peak_str}")
+        return False
+
+
+# ── признаки ──────────────────────────────────────────────────────────
+def genre_features(movies: pd.DataFrame, genres=None):
+    """One-hot жанры → (CSR float32, список жанров); genres — столбцы прежней сборки."""
+    dummies = movies["genres"].fillna("").str.get_dummies(sep="|")
+    dummies = dummies.drop(columns=["(no genres listed)"], errors="ignore")
+    if genres is not None:
+        dummies = dummies.reindex(columns=list(genres), fill_value=0)
+    return sp.csr_matrix(dummies.to_numpy(dtype=np.float32)), list(dummies.columns)
+
+
+def extract_years(movies: pd.DataFrame):
+    return (
+        movies["title"].str.extract(r"\((\d{4})\)$", expand=False)
+        .fillna(0).astype(np.float32).to_numpy()
+    )
+
+
+def year_feature(movies: pd.DataFrame, year_range=None):
+    """
+    Год из названия, min-max в [0, 1] (фильмы без года → 0 до масштабирования).
+    year_range — (min, max) прежней сборки, чтобы новые строки были в той же шкале.
+    """
+    years = extract_years(movies)
+    lo, hi = year_range if year_range is not None else (years.min(), years.max())
+    scaled = np.clip((years - lo) / (hi - lo), 0, None) if hi > lo else np.zeros_like(years)
+    return sp.csr_matrix(scaled.astype(np.float32).reshape(-1, 1))
+
+
+def stream_tag_counts(tags_path: str, movie_ids, n_features: int = HASH_FEATURES,
+                      chunk_size: int = CHUNK_SIZE):
+    """
+    Частоты термов тегов по фильмам: (n_movies × n_features) CSR float32.
+    Каждый кусок tags.csv хэшируется и сворачивается по фильмам умножением
+    на разреженную матрицу принадлежности «фильм × строка куска».
+    """
+    ids = IdMap(movie_ids)
+    vectorizer = HashingVectorizer(
+        n_features=n_features, alternate_sign=False, norm=None, dtype=np.float32
+    )
+    counts = sp.csr_matrix((len(ids), n_features), dtype=np.float32)
+    reader = pd.read_csv(
+        tags_path, usecols=["movieId", "tag"], dtype={"movieId": np.int32, "tag": str},
+        chunksize=chunk_size,
+    )
+    n_rows = 0
+    for chunk in reader:
+        rows = ids.to_inner_many(chunk["movieId"].to_numpy())
+        keep = rows >= 0
+        rows = rows[keep]
+        if len(rows) == 0:
+            continue
+        hashed = vectorizer.transform(chunk["tag"].fillna("").to_numpy()[keep])
+        owner = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, np.arange(len(rows)))),
+            shape=(len(ids), len(rows)),
+        )
+        counts = counts + owner @ hashed
+        n_rows += len(chunk)
+    print(f"[{datetime.now()}]   tags: {n_rows} rows streamed")
+    return counts.tocsr(), vectorizer
+
+
+def tfidf_from_counts(counts, max_features: int = MAX_TAG_FEATURES):
+    """
+    TF-IDF как у TfidfVectorizer(max_features=...): оставляем max_features самых частых
+    термов, idf = ln((1 + n) / (1 + df)) + 1, строки нормализуются по L2.
+    Возвращает (CSR float32, выбранные столбцы хэш-пространства, idf).
+    """
+    counts = sp.csc_matrix(counts)
+    totals = np.asarray(counts.sum(axis=0)).ravel()
+    nonzero = np.flatnonzero(totals)
+    if len(nonzero) > max_features:
+        top = nonzero[np.argpartition(-totals[nonzero], max_features - 1)[:max_features]]
+    else:
+        top = nonzero
+    columns = np.sort(top)
+    X = counts[:, columns].tocsr()
+
+    df = np.bincount(X.indices, minlength=X.shape[1])
+    idf = (np.log((1 + X.shape[0]) / (1 + df)) + 1).astype(np.float32)
+    X = X @ sp.diags(idf)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    inv = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    X = sp.diags(inv.astype(np.float32)) @ X
+    return sp.csr_matrix(X, dtype=np.float32), columns, idf
+
+
+def build_content_features(data_dir: str, out_dir: str = None,
+                           max_tag_features: int = MAX_TAG_FEATURES, chunk_size: int = CHUNK_SIZE):
+    """
+    movies.csv + tags.csv → (content_features CSR float32, movieId по строкам, StageTimer).
+    Столбцы: жанры | год | TF-IDF тегов. Если задан out_dir — туда же сохраняется
+    tag_vectorizer.pkl (хэшер + выбранные столбцы + idf, жанры и диапазон лет) —
+    по нему content_rows векторизует новые фильмы в том же пространстве признаков.
+    """
+    timer = StageTimer()
+    with timer("movies"):
+        movies = pd.read_csv(
+            os.path.join(data_dir, "movies.csv"),
+            dtype={"movieId": np.int32, "title": str, "genres": str},
+        )
+        movie_ids = movies["movieId"].to_numpy()
+    with timer("genres + year"):
+        genres, genre_names = genre_features(movies)
+        year = year_feature(movies)
+        years = extract_years(movies)
+    with timer("tags (streamed)"):
+        counts, vectorizer = stream_tag_counts(
+            os.path.join(data_dir, "tags.csv"), movie_ids, chunk_size=chunk_size
+        )
+    with timer("tf-idf"):
+        tags, columns, idf = tfidf_from_counts(counts, max_tag_features)
+        del counts
+    with timer("hstack"):
+        features = sp.hstack([genres, year, tags], format="csr", dtype=np.float32)
+
+    if out_dir is not None:
+        with open(os.path.join(out_dir, "tag_vectorizer.pkl"), "wb") as f:
+            pickle.dump({
+                "vectorizer": vectorizer, "columns": columns, "idf": idf,
+                "genres": genre_names, "year_range": (float(years.min()), float(years.max())),
+            }, f)
+    return features, movie_ids, timer
+
+
+def content_rows(data_dir: str, movie_ids, meta: dict, chunk_size: int = CHUNK_SIZE):
+    """
+    Строки content_features для фильмов movie_ids (новые фильмы при инкрементальном
+    обучении) в пространстве прежней сборки: meta — содержимое tag_vectorizer.pkl.
+    TF-IDF — по сохранённым столбцам и idf, df остальных фильмов не пересчитывается.
+    """
+    movies = pd.read_csv(
+        os.path.join(data_dir, "movies.csv"),
+        dtype={"movieId": np.int32, "title": str, "genres": str},
+    )
+    movies = movies.set_index("movieId").reindex(np.asarray(movie_ids, dtype=np.int32))
+    movies = movies.rename_axis("movieId").reset_index()
+    movies["title"] = movies["title"].fillna("")
+    genres, _ = genre_features(movies, genres=meta["genres"])
+    year = year_feature(movies, year_range=meta["year_range"])
+
+    counts, _ = stream_tag_counts(
+        os.path.join(data_dir, "tags.csv"), movies["movieId"].to_numpy(),
+        n_features=meta["vectorizer"].n_features, chunk_size=chunk_size,
+    )
+    tags = sp.csr_matrix(counts)[:, meta["columns"]] @ sp.diags(meta["idf"])
+    norms = np.sqrt(np.asarray(tags.multiply(tags).sum(axis=1)).ravel())
+    inv = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    tags = sp.diags(inv.astype(np.float32)) @ tags
+    return sp.hstack([genres, year, tags], format="csr", dtype=np.float32)
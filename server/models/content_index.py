@@ -0,0 +1,130 @@
+# server/models/content_index.py
+#
+# Контентная похожесть фильмов без sklearn NearestNeighbors: content_features
+# L2-нормализуются один раз, косинус = скалярное произведение, которое считается
+# одним разреженным умножением на весь блок запросов, top-K — через argpartition.
+# Опционально — заранее посчитанная таблица top-K соседей (CSR, как у item-KNN).
+
+import numpy as np
+import scipy.sparse as sp
+
+from models.id_map import IdMap
+
+DEFAULT_K = 50
+BLOCK_SIZE = 256
+
+
+def l2_normalize_csr(X):
+    """Нормализует строки CSR по L2 (нулевые строки остаются нулевыми)."""
+    X = sp.csr_matrix(X, dtype=np.float32)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    inv = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sp.diags(inv.astype(np.float32)) @ X
+
+
+class ContentIndex:
+    """
+    features — CSR (n_items × n_features), строки соответствуют raw_ids.
+    normalized=True — матрица уже L2-нормализована (из бандла), не копируем её.
+    neighbors — необязательная CSR top-K соседей (inner-индексы, по убыванию).
+    """
+
+    def __init__(self, features, raw_ids, normalized: bool = False, neighbors=None):
+        self.features = features if normalized else l2_normalize_csr(features)
+        self.ids = IdMap(raw_ids)
+        self._set_neighbors(neighbors)
+
+    def _set_neighbors(self, neighbors):
+        self.neighbors_csr = neighbors
+        # у строки таблицы либо >= table_k соседей, либо все положительные —
+        # значит, запросы с n <= table_k она покрывает полностью
+        has_rows = neighbors is not None and neighbors.nnz
+        self.table_k = int(np.diff(neighbors.indptr).max()) if has_rows else 0
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, manifest: dict):
+        """Из массивов бандла (models/artifacts.py): нормализованная матрица и таблица, если есть."""
+        from models.artifacts import csr_from_arrays
+        n_items = manifest['content_shape'][0]
+        neighbors = None
+        if 'content_nn_data' in arrays:
+            neighbors = csr_from_arrays(arrays, 'content_nn', (n_items, n_items))
+        return cls(
+            csr_from_arrays(arrays, 'content_norm', manifest['content_shape']),
+            arrays['content_raw_ids'], normalized=True, neighbors=neighbors,
+        )
+
+    @property
+    def raw_ids(self):
+        return self.ids.raw_ids
+
+    def __contains__(self, movie_id):
+        return movie_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ── поиск ─────────────────────────────────────────────────────────
+    def similarity_rows(self, inner_ids):
+        """Косинус фильмов inner_ids со всеми фильмами → плотная матрица (b, n_items)."""
+        F = self.features
+        # F @ Q.T, а не Q @ F.T: так scipy не переводит транспонированную F в CSR целиком
+        return (F @ F[inner_ids].T).T.toarray()
+
+    def search_many(self, inner_ids, k: int):
+        """
+        top-k соседей для блока фильмов (сам фильм исключён) →
+        (cols, sims) формы (b, k), внутри строки — по убыванию похожести.
+        """
+        inner_ids = np.asarray(inner_ids, dtype=np.int64)
+        k = max(1, min(k, len(self) - 1))
+        cols = np.zeros((len(inner_ids), k), dtype=np.int32)
+        sims = np.zeros((len(inner_ids), k), dtype=np.float32)
+        for start in range(0, len(inner_ids), BLOCK_SIZE):
+            block = inner_ids[start:start + BLOCK_SIZE]
+            S = self.similarity_rows(block)
+            S[np.arange(len(block)), block] = -np.inf  # сам фильм не сосед
+            top = np.argpartition(-S, k - 1, axis=1)[:, :k]
+            top_sims = np.take_along_axis(S, top, axis=1)
+            order = np.argsort(-top_sims, axis=1, kind="stable")
+            cols[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+            sims[start:start + len(block)] = np.take_along_axis(top_sims, order, axis=1)
+        return cols, sims
+
+    def build_neighbors(self, k: int = DEFAULT_K):
+        """Таблица top-K соседей по всем фильмам (только с положительной похожестью)."""
+        cols, sims = self.search_many(np.arange(len(self)), k)
+        keep = sims > 0
+        indptr = np.concatenate([[0], np.cumsum(keep.sum(axis=1))]).astype(np.int64)
+        self._set_neighbors(sp.csr_matrix(
+            (sims[keep], cols[keep], indptr), shape=(len(self), len(self))
+        ))
+        return self.neighbors_csr
+
+    def similar_many(self, movie_ids, n: int):
+        """[[{"movieId", "score"}], ...] для каждого movieId; неизвестный фильм → []."""
+        inner = self.ids.to_inner_many(movie_ids)
+        known = np.flatnonzero(inner >= 0)
+        out = [[] for _ in range(len(inner))]
+        if len(known) == 0 or len(self) < 2:
+            return out
+
+        m = self.neighbors_csr
+        if m is not None and n <= self.table_k:
+            for pos in known:
+                lo, hi = m.indptr[inner[pos]], m.indptr[inner[pos] + 1]
+                out[pos] = self._to_recs(m.indices[lo:hi][:n], m.data[lo:hi][:n])
+            return out
+
+        cols, sims = self.search_many(inner[known], n)
+        for row, pos in enumerate(known):
+            keep = sims[row] > 0
+            out[pos] = self._to_recs(cols[row][keep], sims[row][keep])
+        return out
+
+    def similar(self, movie_id: int, n: int):
+        return self.similar_many([movie_id], n)[0]
+
+    def _to_recs(self, cols, sims):
+        raw = self.raw_ids[cols]
+        return [{"movieId": int(mid), "score": round(float(sc), 3)} for mid, sc in zip(raw, sims)]
@@ -1,29 +1,209 @@
+# server/models/data_loader.py
+#
+# Загрузка CSV MovieLens через колоночный кэш: при первом чтении CSV разбирается
+# кусками и каждая колонка сохраняется отдельным .npy с урезанными типами (id → int32,
+# оценки → float32), рядом — meta.json с размером, mtime и sha1 исходника. Дальше колонки
+# открываются через np.load(mmap_mode='c') — без парсинга, страницы делятся через page
+# cache ОС между процессами; copy-on-write: в колонки можно писать, как в DataFrame из
+# pd.read_csv, изменения видит только этот процесс. Строковые колонки хранятся одним
+# UTF-8 блоком с разделителем.
+# Кэш лежит в <каталог CSV>/.cache/<имя>-<хэш опций>/: каждая сборка — в своём подкаталоге
+# (sha1 исходника + pid), активную указывает meta.json, который заменяется атомарно —
+# два процесса, собирающие кэш одновременно, не пишут в одни и те же файлы.
+
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
 import pandas as pd
 
-def load_ratings(path: str = "data/ml-latest/ratings.csv") -> pd.DataFrame:
+CACHE_DIR = '.cache'
+CACHE_FORMAT = 2
+CHUNK_SIZE = 5_000_000
+_SEP = '\x1f'          # разделитель строк в блоке (unit separator — в CSV не встречается)
+
+
+def _file_sha1(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_path(path: str, dtype) -> str:
+    """<dir>/.cache/<имя CSV>-<хэш опций разбора>: разные dtype — разные кэши (каталог с meta.json)."""
+    options = json.dumps(dtype or {}, sort_keys=True, default=str)
+    tag = hashlib.sha1(options.encode()).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR, f'{name}-{tag}')
+
+
+def _downcast(values):
+    """Целые → int32, если влезают; float → float32, если без потерь (NaN сохраняются)."""
+    if values.dtype.kind in 'iu':
+        if len(values) == 0 or (values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max):
+            return values.astype(np.int32)
+        return values.astype(np.int64)
+    if values.dtype.kind == 'f':
+        small = values.astype(np.float32)
+        if np.array_equal(small.astype(values.dtype), values, equal_nan=True):
+            return small
+        return values.astype(np.float64)
+    if values.dtype.kind == 'b':
+        return values.astype(bool)
+    return None  # строки — отдельно
+
+
+def _source_stamp(path: str):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _read_meta(cache: str):
+    try:
+        with open(os.path.join(cache, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(cache: str, meta: dict):
+    """meta.json через временный файл этого процесса → os.replace (атомарно)."""
+    tmp_path = os.path.join(cache, f'.meta.{os.getpid()}')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache, 'meta.json'))
+
+
+def _is_fresh(path: str, cache: str, meta) -> bool:
+    """Размер и mtime совпали — кэш свежий; изменился только mtime — сверяем sha1."""
+    if meta is None or meta.get('format') != CACHE_FORMAT:
+        return False
+    if not os.path.isdir(os.path.join(cache, meta['build'])):
+        return False
+    stamp = _source_stamp(path)
+    if stamp == meta['source']:
+        return True
+    if stamp['size'] != meta['source']['size'] or _file_sha1(path) != meta['sha1']:
+        return False
+    # файл перезаписан тем же содержимым (копия, touch) — обновляем отметку
+    meta['source'] = stamp
+    _write_meta(cache, meta)
+    return True
+
+
+def _remove_stale_builds(cache: str, sha1: str):
+    """
+    Сборки от прежних версий CSV (и файлы кэша старого формата). Сборки того же sha1 —
+    в том числе параллельные — не трогаем: их meta.json может быть ещё не записан.
+    Открытые через mmap файлы на POSIX переживают удаление; где нельзя — пропускаем.
+    """
+    for name in os.listdir(cache):
+        if name == 'meta.json' or name.startswith('.') or name.startswith(sha1[:12] + '-'):
+            continue
+        full = os.path.join(cache, name)
+        if os.path.isdir(full):
+            shutil.rmtree(full, ignore_errors=True)
+        else:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def _build_cache(path: str, cache: str, dtype=None, chunk_size: int = CHUNK_SIZE):
+    """CSV → колонки .npy в новом подкаталоге сборки, затем meta.json указывает на него."""
+    stamp = _source_stamp(path)
+    sha1 = _file_sha1(path)
+    parts = {}
+    for chunk in pd.read_csv(path, dtype=dtype, chunksize=chunk_size):
+        for col in chunk.columns:
+            values = chunk[col].to_numpy()
+            small = _downcast(values)
+            parts.setdefault(col, []).append(small if small is not None else values.astype(object))
+
+    build = f'{sha1[:12]}-{os.getpid()}'
+    out = os.path.join(cache, build)
+    shutil.rmtree(out, ignore_errors=True)
+    os.makedirs(out)
+    columns = []
+    for i, (col, chunks) in enumerate(parts.items()):
+        values = np.concatenate(chunks)
+        entry = {'name': col, 'file': f'c{i}'}
+        if values.dtype == object:
+            nulls = pd.isna(values)
+            text = _SEP.join('' if null else str(v) for v, null in zip(values, nulls))
+            np.save(os.path.join(out, f'c{i}.npy'), np.frombuffer(text.encode('utf-8'), dtype=np.uint8))
+            if nulls.any():
+                np.save(os.path.join(out, f'c{i}_null.npy'), nulls)
+                entry['nulls'] = True
+            entry.update(kind='str', length=len(values))
+        else:
+            np.save(os.path.join(out, f'c{i}.npy'), values)
+            entry['kind'] = 'num'
+        columns.append(entry)
+
+    meta = {'format': CACHE_FORMAT, 'source': stamp, 'sha1': sha1, 'build': build, 'columns': columns}
+    _write_meta(cache, meta)
+    _remove_stale_builds(cache, sha1)
+    return meta
+
+
+def _load_column(build_dir: str, entry: dict, mmap: bool):
+    file = os.path.join(build_dir, f"{entry['file']}.npy")
+    if entry['kind'] == 'num':
+        return np.load(file, mmap_mode='c' if mmap else None)
+    blob = np.load(file, mmap_mode='r')
+    values = np.array(blob.tobytes().decode('utf-8').split(_SEP) if entry['length'] else [], dtype=object)
+    if entry.get('nulls'):
+        values[np.load(os.path.join(build_dir, f"{entry['file']}_null.npy"))] = np.nan
+    return values
+
+
+def read_table(path: str, usecols=None, dtype=None, mmap: bool = True) -> pd.DataFrame:
+    """
+    pd.read_csv через колоночный кэш. dtype — как у read_csv, применяется при первом
+    разборе (например, {"imdbId": str}, чтобы не потерять ведущие нули). mmap=True —
+    числовые колонки copy-on-write memmap: запись в них, как и в обычный DataFrame,
+    работает и не меняет кэш на диске; mmap=False — колонки целиком в памяти.
+    """
+    cache = _cache_path(path, dtype)
+    os.makedirs(cache, exist_ok=True)
+    meta = _read_meta(cache)
+    if not _is_fresh(path, cache, meta):
+        meta = _build_cache(path, cache, dtype=dtype)
+    build_dir = os.path.join(cache, meta['build'])
+    entries = {e['name']: e for e in meta['columns']}
+    names = list(usecols) if usecols is not None else list(entries)
+    missing = [name for name in names if name not in entries]
+    if missing:
+        raise ValueError(f"{path}: no columns {missing}")
+    return pd.DataFrame({name: _load_column(build_dir, entries[name], mmap) for name in names}, copy=False)
+
+
+def load_ratings(path: str = "data/ml-latest/ratings.csv", mmap: bool = True) -> pd.DataFrame:
     """
     Полный датасет MovieLens Latest (25M):
-    возвращает DataFrame с колонками userId, movieId, rating.
+    возвращает DataFrame с колонками userId, movieId (int32), rating (float32).
     """
-    df = pd.read_csv(path)
-    # Оставляем только нужные колонки
-    return df[["userId", "movieId", "rating"]]
+    return read_table(path, usecols=["userId", "movieId", "rating"], mmap=mmap)
 
 def load_movies(path: str = "data/ml-latest/movies.csv") -> pd.DataFrame:
     """
     Полный список фильмов:
     возвращает DataFrame с колонками movieId, title, genres.
     """
-    df = pd.read_csv(path)
-    return df[["movieId", "title", "genres"]]
+    return read_table(path, usecols=["movieId", "title", "genres"])
 
 def load_links(path: str = "data/ml-latest/links.csv") -> pd.DataFrame:
     """
     Полная таблица связей:
     возвращает DataFrame с колонками movieId, imdbId, tmdbId.
     """
-    df = pd.read_csv(path, dtype={"imdbId": str})
-    df["movieId"] = df["movieId"].astype(int)
-    df["tmdbId"]  = pd.to_numeric(df["tmdbId"], errors="coerce") \
-                       .fillna(0).astype(int)
-    return df[["movieId", "imdbId", "tmdbId"]]
+    df = read_table(path, usecols=["movieId", "imdbId", "tmdbId"], dtype={"imdbId": str})
+    df["tmdbId"] = pd.to_numeric(df["tmdbId"], errors="coerce") \
+                     .fillna(0).astype(np.int32)
+    return df
@@ -0,0 +1,226 @@
+# server/models/fold_in.py
+#
+# Онлайн fold-in пользователей в SVD без переобучения: при фиксированных факторах фильмов
+# (q_i, b_i) вектор пользователя — решение маленького регуляризованного МНК, того же,
+# что полушаг ALS в models/mf.py. Так новые оценки из app_ratings и пользователи,
+# зарегистрированные после обучения, попадают в персональные рекомендации за секунды.
+#
+# Векторы живут в памяти (UserFactorStore) и привязаны к версии моделей: после подмены
+# бандла они пересчитываются под новые q_i. Периодически сбрасываются в npz, чтобы
+# переживать рестарт и делиться между воркерами gunicorn.
+
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+
+from models.mf import REG
+
+log = logging.getLogger(__name__)
+
+STORE_FILE = 'user_factors.npz'
+# векторы пишутся раз в PERSIST_INTERVAL — держим их в подкаталоге, а не рядом с артефактами:
+# model_version (models/rec_cache.py) хэширует *.npz в models_dir, и каждая запись меняла бы версию
+STATE_DIR = 'state'
+DELAY = 1.0               # секунд тишины после оценки до пересчёта (серия оценок — один пересчёт)
+PERSIST_INTERVAL = 60.0   # как часто сбрасывать векторы на диск
+
+
+def fold_in(mf, movie_ids, ratings, reg: float = REG):
+    """
+    (p_u, b_u) по оценкам пользователя: r - μ - b_i ≈ [p, b]·[q_i, 1] с регуляризацией
+    reg·n, как в ALS. Фильмы вне модели пропускаются; ни одного известного → None.
+    """
+    inner = mf.items.to_inner_many(np.asarray(movie_ids, dtype=np.int64))
+    known = inner >= 0
+    if not known.any():
+        return None
+    inner = inner[known]
+    target = np.asarray(ratings, dtype=np.float32)[known] - mf.global_mean - mf.bi[inner]
+    Y = np.hstack([mf.qi[inner], np.ones((len(inner), 1), dtype=np.float32)])
+    G = Y.T @ Y + reg * len(inner) * np.eye(Y.shape[1], dtype=np.float32)
+    x = np.linalg.solve(G, Y.T @ target)
+    return x[:-1].astype(np.float32), float(x[-1])
+
+
+def rating_stamp(rows):
+    """Отпечаток оценок пользователя: (число, последнее изменение) — по нему видно, устарел ли вектор."""
+    times = [r.created_at.timestamp() for r in rows if r.created_at is not None]
+    return (float(len(rows)), max(times) if times else 0.0)
+
+
+class UserFactorStore:
+    """user_id → (p_u, b_u, stamp) для одной версии моделей; потокобезопасно."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.version = None
+        self._vectors = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def get(self, user_id: int, version: str):
+        with self._lock:
+            if version != self.version:
+                return None
+            return self._vectors.get(user_id)
+
+    def put(self, user_id: int, version: str, p, b: float, stamp):
+        with self._lock:
+            if version != self.version:
+                # векторы под старые q_i бессмысленны для новой модели
+                self._vectors = {}
+                self.version = version
+            self._vectors[user_id] = (p, b, tuple(stamp))
+            self._dirty = True
+
+    def discard(self, user_id: int):
+        with self._lock:
+            if self._vectors.pop(user_id, None) is not None:
+                self._dirty = True
+
+    def users(self):
+        with self._lock:
+            return list(self._vectors)
+
+    # ── диск ──────────────────────────────────────────────────────────
+    def _read(self):
+        """(version, {user_id: (p, b, stamp)}) из файла или (None, {})."""
+        if not self.path or not os.path.exists(self.path):
+            return None, {}
+        with np.load(self.path) as data:
+            version = str(data['version'])
+            vectors = {
+                int(uid): (p, float(b), tuple(stamp))
+                for uid, p, b, stamp in zip(data['user_ids'], data['pu'], data['bu'], data['stamps'])
+            }
+        return version, vectors
+
+    def load(self):
+        try:
+            self.version, self._vectors = self._read()
+        except (OSError, ValueError, KeyError):
+            log.exception("Cannot read %s, starting with empty user factors", self.path)
+        return self
+
+    def save(self):
+        """
+        Атомарная запись (временный файл + os.replace). Векторы других воркеров из файла
+        той же версии подмешиваются, если они новее наших (по stamp).
+        """
+        if not self.path:
+            return
+        with self._lock:
+            try:
+                version, on_disk = self._read()
+            except (OSError, ValueError, KeyError):
+                version, on_disk = None, {}
+            if version == self.version:
+                for uid, entry in on_disk.items():
+                    if uid not in self._vectors or entry[2] > self._vectors[uid][2]:
+                        self._vectors[uid] = entry
+            if not self._dirty and version == self.version:
+                return
+            user_ids = np.fromiter(self._vectors, dtype=np.int64, count=len(self._vectors))
+            entries = [self._vectors[uid] for uid in user_ids.tolist()]
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    version=np.array(self.version or ''),
+                    user_ids=user_ids,
+                    pu=np.array([e[0] for e in entries], dtype=np.float32).reshape(len(entries), -1),
+                    bu=np.array([e[1] for e in entries], dtype=np.float32),
+                    stamps=np.array([e[2] for e in entries], dtype=np.float64).reshape(len(entries), 2),
+                )
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+class FoldInWorker:
+    """
+    Фоновый debounced пересчёт: schedule(user_id) после записи оценки, через delay секунд
+    поток читает оценки пользователя (load_ratings) и делает fold_in против текущей модели.
+    get_model() → (MFModel, version) или (None, None), пока модели грузятся;
+    load_ratings(user_id) → строки с movie_id, rating, created_at.
+    """
+
+    def __init__(self, store: UserFactorStore, get_model, load_ratings,
+                 delay: float = DELAY, persist_interval: float = PERSIST_INTERVAL):
+        self.store = store
+        self.get_model = get_model
+        self.load_ratings = load_ratings
+        self.delay = delay
+        self.persist_interval = persist_interval
+        self._pending = {}    # user_id → время последней оценки
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, user_id: int):
+        with self._lock:
+            self._pending[user_id] = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='fold-in', daemon=True)
+                self._thread.start()
+
+    def vector(self, user_id: int, mf, version: str, rows):
+        """
+        Вектор для запроса: из хранилища, если он построен по тем же оценкам; иначе —
+        fold-in прямо сейчас (оценка пришла в другой воркер, новая версия моделей, первый
+        запрос после рестарта) — это один solve (k+1)×(k+1), дешевле обращения к БД.
+        None — ни одного оценённого фильма, известного модели.
+        """
+        stamp = rating_stamp(rows)
+        entry = self.store.get(user_id, version)
+        if entry is not None and entry[2] == stamp:
+            return entry[0], entry[1]
+        vec = fold_in(mf, [r.movie_id for r in rows], [r.rating for r in rows])
+        if vec is not None:
+            self.store.put(user_id, version, vec[0], vec[1], stamp)
+        return vec
+
+    def refresh(self, user_id: int):
+        mf, version = self.get_model()
+        if mf is None:
+            return None
+        rows = self.load_ratings(user_id)
+        vec = fold_in(mf, [r.movie_id for r in rows], [r.rating for r in rows])
+        if vec is None:
+            self.store.discard(user_id)
+        else:
+            self.store.put(user_id, version, vec[0], vec[1], rating_stamp(rows))
+        return vec
+
+    def _due(self):
+        """Пользователи, у которых после последней оценки прошло delay секунд."""
+        now = time.monotonic()
+        with self._lock:
+            due = [uid for uid, at in self._pending.items() if now - at >= self.delay]
+            for uid in due:
+                del self._pending[uid]
+        return due
+
+    def _loop(self):
+        last_persist = time.monotonic()
+        while True:
+            time.sleep(self.delay / 2)
+            try:
+                _, version = self.get_model()
+                if version is not None and self.store.version not in (None, version):
+                    # новая версия моделей — пересчитываем всех, кого знали, под новые q_i
+                    with self._lock:
+                        for uid in self.store.users():
+                            self._pending.setdefault(uid, 0.0)
+                for uid in self._due():
+                    self.refresh(uid)
+                if time.monotonic() - last_persist >= self.persist_interval:
+                    self.store.save()
+                    last_persist = time.monotonic()
+            except Exception:
+                log.exception("User fold-in failed")
@@ -0,0 +1,158 @@
+# server/models/hybrid_engine.py
+#
+# Батчевый гибридный рекомендер для набора фильмов (например, списка пользователя).
+# Вместо hybrid_recommend на каждый фильм: одно матричное умножение по SVD-факторам,
+# одно разреженное по content-матрице (ContentIndex), один gather из таблицы соседей KNN —
+# и агрегация всех seed-фильмов в NumPy. SVD с IVF (0 < nprobe < числа кластеров) идёт
+# через FactorIndex.search по seed'у на вызов — те же кандидаты, что у svd_recommend.
+
+import numpy as np
+
+from models.ann_index import DEFAULT_NPROBE
+from models.id_map import IdMap
+
+SEED_BLOCK = 64
+MIN_KNN_RATINGS = 5
+
+
+def minmax_rows(scores):
+    """Min-max нормализация каждой строки в [0,1]; строка из одинаковых значений → 0."""
+    lo = scores.min(axis=1, keepdims=True)
+    hi = scores.max(axis=1, keepdims=True)
+    denom = np.where(hi > lo, hi - lo, 1.0)
+    return np.where(hi > lo, (scores - lo) / denom, 0.0).astype(np.float32)
+
+
+def topk_rows(S, k: int):
+    """top-k столбцов каждой строки плотной матрицы S → (cols, scores) формы (s, k)."""
+    k = min(k, S.shape[1])
+    cols = np.argpartition(-S, k - 1, axis=1)[:, :k]
+    return cols, np.take_along_axis(S, cols, axis=1)
+
+
+class HybridEngine:
+    """
+    Все три модели приводятся к общему «универсуму» raw movieId;
+    *_to_u — отображение inner-индекса модели в индекс универсума.
+    """
+
+    def __init__(self, knn_index, svd_index, content_index,
+                 w_knn: float, w_content: float, w_svd: float):
+        self.knn = knn_index
+        self.svd = svd_index
+        self.content = content_index
+        self.weights = (w_knn, w_content, w_svd)
+
+        self.universe = np.union1d(
+            np.union1d(knn_index.raw_ids, svd_index.raw_ids), content_index.raw_ids
+        ).astype(np.int32)
+        self.ids = IdMap(self.universe)
+        self.knn_to_u = self.ids.to_inner_many(knn_index.raw_ids)
+        self.svd_to_u = self.ids.to_inner_many(svd_index.raw_ids)
+        self.content_to_u = self.ids.to_inner_many(content_index.raw_ids)
+
+    # ── компоненты ────────────────────────────────────────────────────
+    @staticmethod
+    def _accumulate(u, scores, weight, acc, touched):
+        """Строки кандидатов (индексы универсума) и их скоры → min-max по строке → накопление."""
+        ok = u >= 0
+        np.add.at(acc, u[ok], weight * minmax_rows(scores)[ok])
+        touched[u[ok]] = True
+
+    def _dense_component(self, seeds, rows_fn, to_u, k, weight, acc, touched):
+        """Общая часть для SVD и content: блок похожестей → top-k → min-max → накопление."""
+        for start in range(0, len(seeds), SEED_BLOCK):
+            block = seeds[start:start + SEED_BLOCK]
+            S = rows_fn(block)
+            S[np.arange(len(block)), block] = -np.inf  # сам фильм не кандидат
+            # k < числа столбцов, поэтому -inf самого фильма в top-k не попадает
+            cols, scores = topk_rows(S, min(k, S.shape[1] - 1))
+            self._accumulate(to_u[cols], scores, weight, acc, touched)
+
+    def _svd_component(self, seed_ids, k, acc, touched, nprobe: int = DEFAULT_NPROBE):
+        seeds = self.svd.ids.to_inner_many(seed_ids)
+        seeds = seeds[seeds >= 0]
+        if len(seeds) == 0:
+            return
+        F = self.svd.factors
+        n_lists = len(self.svd.centroids) if self.svd.centroids is not None else 0
+        if 0 < nprobe < n_lists:
+            # IVF: кандидаты только из nprobe кластеров каждого seed'а — как svd_recommend
+            for s in seeds:
+                items, sims = self.svd.search(F[s], k, nprobe=nprobe, exclude=[s])
+                self._accumulate(self.svd_to_u[items][None, :], sims[None, :],
+                                 self.weights[2], acc, touched)
+            return
+        # точный поиск (nprobe=0 или индекс без кластеров) — одним умножением на блок seed'ов
+        self._dense_component(
+            seeds, lambda b: F[b] @ F.T, self.svd_to_u, k, self.weights[2], acc, touched
+        )
+
+    def _content_component(self, seed_ids, k, acc, touched):
+        seeds = self.content.ids.to_inner_many(seed_ids)
+        seeds = seeds[seeds >= 0]
+        if len(seeds) == 0:
+            return
+        self._dense_component(
+            seeds, self.content.similarity_rows, self.content_to_u, k, self.weights[1], acc, touched
+        )
+
+    def _knn_component(self, seed_ids, k, acc, touched):
+        seeds = self.knn.ids.to_inner_many(seed_ids)
+        seeds = seeds[seeds >= 0]
+        if len(seeds) == 0:
+            return
+        m = self.knn.neighbors_csr
+        lo = m.indptr[seeds]
+        lengths = np.minimum(m.indptr[seeds + 1] - lo, k)
+        seeds, lo, lengths = seeds[lengths > 0], lo[lengths > 0], lengths[lengths > 0]
+        if len(seeds) == 0:
+            return
+        # позиции первых k элементов каждой строки CSR одним массивом
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        pos = np.repeat(lo, lengths) + (np.arange(lengths.sum()) - starts)
+        cols, scores = m.indices[pos], m.data[pos]
+        # строки отсортированы по убыванию: максимум — первый, минимум — последний
+        seg_hi = np.repeat(scores[np.cumsum(lengths) - lengths], lengths)
+        seg_lo = np.repeat(scores[np.cumsum(lengths) - 1], lengths)
+        spread = seg_hi - seg_lo
+        norm = np.where(spread > 0, (scores - seg_lo) / np.where(spread > 0, spread, 1.0), 0.0)
+        u = self.knn_to_u[cols]
+        ok = u >= 0
+        np.add.at(acc, u[ok], self.weights[0] * norm[ok])
+        touched[u[ok]] = True
+
+    # ── публичный API ─────────────────────────────────────────────────
+    def recommend_many(self, seed_ids, n: int, per_seed: int, rating_counts=None,
+                       nprobe: int = DEFAULT_NPROBE):
+        """
+        seed_ids — movieId исходного набора, per_seed — сколько кандидатов берём
+        от каждой модели на каждый seed, rating_counts — {movieId: число оценок}
+        (KNN учитывается только для фильмов с >= MIN_KNN_RATINGS оценками),
+        nprobe — IVF-кластеры SVD, как у svd_recommend (0 — точный поиск).
+        Возвращает [(movieId, score)] по убыванию, без самих seed-фильмов.
+        """
+        seed_ids = np.unique(np.asarray(list(seed_ids), dtype=np.int32))
+        acc = np.zeros(len(self.universe), dtype=np.float32)
+        touched = np.zeros(len(self.universe), dtype=bool)
+
+        if rating_counts is None:
+            knn_seeds = seed_ids
+        else:
+            knn_seeds = np.array(
+                [mid for mid in seed_ids if rating_counts.get(int(mid), 0) >= MIN_KNN_RATINGS],
+                dtype=np.int32,
+            )
+        self._knn_component(knn_seeds, per_seed, acc, touched)
+        self._content_component(seed_ids, per_seed, acc, touched)
+        self._svd_component(seed_ids, per_seed, acc, touched, nprobe)
+
+        seeds_u = self.ids.to_inner_many(seed_ids)
+        touched[seeds_u[seeds_u >= 0]] = False
+        cand = np.flatnonzero(touched)
+        if len(cand) == 0:
+            return []
+        k = min(n, len(cand))
+        top = cand[np.argpartition(-acc[cand], k - 1)[:k]]
+        top = top[np.argsort(-acc[top], kind="stable")]
+        return [(int(self.universe[i]), float(acc[i])) for i in top]
@@ -0,0 +1,39 @@
+# server/models/id_map.py
+#
+# Компактный маппинг raw movieId ↔ inner-индекс без питоновских dict:
+# inner → raw — просто массив, raw → inner — бинарный поиск по отсортированной копии.
+
+import numpy as np
+
+
+class IdMap:
+    def __init__(self, raw_ids):
+        self.raw_ids = np.asarray(raw_ids, dtype=np.int32)
+        self._order = np.argsort(self.raw_ids, kind="stable").astype(np.int32)
+        self._sorted = self.raw_ids[self._order]
+
+    def __len__(self):
+        return len(self.raw_ids)
+
+    def __contains__(self, raw_id):
+        return self.to_inner(raw_id) is not None
+
+    def to_inner(self, raw_id):
+        """raw movieId → inner-индекс или None."""
+        pos = int(np.searchsorted(self._sorted, raw_id))
+        if pos < len(self._sorted) and self._sorted[pos] == raw_id:
+            return int(self._order[pos])
+        return None
+
+    def to_inner_many(self, raw_ids):
+        """Векторная версия to_inner: для неизвестных id возвращает -1."""
+        raw_ids = np.asarray(raw_ids, dtype=np.int32)
+        if not len(self._sorted):
+            return np.full(raw_ids.shape, -1, dtype=np.int32)
+        pos = np.searchsorted(self._sorted, raw_ids)
+        pos = np.minimum(pos, len(self._sorted) - 1)
+        found = self._sorted[pos] == raw_ids
+        return np.where(found, self._order[pos], -1)
+
+    def to_raw(self, inner_id):
+        return int(self.raw_ids[inner_id])
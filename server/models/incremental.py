@@ -0,0 +1,253 @@
+# server/models/incremental.py
+#
+# Инкрементальное переобучение по журналу оценок (models/rating_log.py) вместо полного
+# прогона train_ml_latest_small.py. Полное обучение сохраняет ratings_state.npz — CSR
+# оценок, на которой обучены модели, и смещение журнала, до которого он учтён. Здесь:
+#   1. хвост журнала → последнее событие на пару (user, movie) → слияние в CSR;
+#   2. SVD: warm start от прежних факторов, заново решаются только затронутые
+#      пользователи и фильмы (models/mf.py: als_update), IVF — от прежних центроидов;
+#   3. item-KNN: пересчитываются строки косинуса только затронутых фильмов
+#      (models/item_sim.py: update_item_knn);
+#   4. content: признаки и строки таблицы соседей — только для новых фильмов из movies.csv
+#      (в models_dir записываются после публикации бандла, вместе со смещением журнала);
+#   5. новый бандл через publish_bundle → сервер подхватывает его по bundles/CURRENT.
+# Стоимость — от размера дельты, а не всей истории; полное обучение время от времени
+# всё равно стоит запускать (μ и соседи вне затронутых строк со временем устаревают).
+#
+#   python -m models.incremental [--models-dir ...] [--data-dir ...]
+
+import os
+import pickle
+import argparse
+from datetime import datetime
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+
+from models.ann_index import FactorIndex, KMEANS_ITERS as FULL_KMEANS_ITERS
+from models.artifacts import publish_bundle, current_bundle, bundle_dir, read_bundle, csr_from_arrays
+from models.content_builder import content_rows
+from models.content_index import ContentIndex
+from models.data_loader import load_movies
+from models.item_sim import update_item_knn, item_similarity
+from models.knn_index import SparseItemKNN, update_topk
+from models.mf import als_update, load_mf, FACTORS_FILE
+from models.rating_log import RatingLog, latest_events, LOG_FILE
+
+STATE_FILE = 'ratings_state.npz'
+ALS_ITERS = 2        # warm start: затронутые факторы сходятся за пару полушагов
+KMEANS_ITERS = 2     # IVF от прежних центроидов
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(BASE_DIR, 'models')
+DATA_DIR = os.path.join(BASE_DIR, 'data', 'ml-latest')
+
+
+# ── состояние оценок ──────────────────────────────────────────────────
+def save_state(models_dir: str, R, user_ids, item_ids, log_offset: int):
+    """CSR оценок (user × item в порядке user_ids/item_ids) + учтённое смещение журнала."""
+    R = sp.csr_matrix(R, dtype=np.float32)
+    tmp_path = os.path.join(models_dir, f'.{STATE_FILE}.{os.getpid()}')
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f, data=R.data, indices=R.indices, indptr=R.indptr,
+            user_ids=np.asarray(user_ids, dtype=np.int32), item_ids=np.asarray(item_ids, dtype=np.int32),
+            log_offset=np.int64(log_offset),
+        )
+    os.replace(tmp_path, os.path.join(models_dir, STATE_FILE))
+
+
+def load_state(models_dir: str):
+    """(R, user_ids, item_ids, log_offset); FileNotFoundError — полного обучения ещё не было."""
+    with np.load(os.path.join(models_dir, STATE_FILE)) as data:
+        user_ids, item_ids = data['user_ids'], data['item_ids']
+        R = sp.csr_matrix(
+            (data['data'], data['indices'], data['indptr']), shape=(len(user_ids), len(item_ids))
+        )
+        return R, user_ids, item_ids, int(data['log_offset'])
+
+
+def _append_ids(ids, raw):
+    """inner-индексы raw в ids; неизвестные дописываются в конец → (индексы, новый ids)."""
+    order = np.argsort(ids, kind='stable')
+    pos = np.minimum(np.searchsorted(ids[order], raw), max(len(ids) - 1, 0))
+    found = (ids[order][pos] == raw) if len(ids) else np.zeros(len(raw), dtype=bool)
+    inner = np.where(found, order[pos] if len(ids) else 0, -1).astype(np.int64)
+    new = np.unique(raw[~found])
+    inner[~found] = len(ids) + np.searchsorted(new, raw[~found])
+    return inner, np.concatenate([ids, new]).astype(np.int32)
+
+
+def apply_events(R, user_ids, item_ids, latest):
+    """
+    Слияние последних событий (latest_events) в CSR. Новые пользователи и фильмы
+    дописываются в конец, удаление неизвестной пары игнорируется.
+    → (R, user_ids, item_ids, затронутые строки, затронутые столбцы).
+    """
+    users = latest['userId'].to_numpy(np.int32)
+    movies = latest['movieId'].to_numpy(np.int32)
+    values = latest['rating'].to_numpy(np.float32)
+    upsert = ~np.isnan(values)
+
+    # новые id берём только из добавлений — удаление не создаёт пользователя или фильм
+    rows, user_ids = _append_ids(user_ids, users[upsert])
+    cols, item_ids = _append_ids(item_ids, movies[upsert])
+    n_rows, n_cols = len(user_ids), len(item_ids)
+    del_rows, _ = _append_ids(user_ids, users[~upsert])
+    del_cols, _ = _append_ids(item_ids, movies[~upsert])
+    known = (del_rows < n_rows) & (del_cols < n_cols)
+    del_rows, del_cols = del_rows[known], del_cols[known]
+
+    # ключи row·n_cols + col у CSR с отсортированными индексами уже упорядочены
+    R = sp.csr_matrix(R)
+    R.sort_indices()
+    old_rows = np.repeat(np.arange(R.shape[0], dtype=np.int64), np.diff(R.indptr))
+    old_keys = old_rows * n_cols + R.indices
+    touched = np.unique(np.concatenate([rows * n_cols + cols, del_rows * n_cols + del_cols]))
+    pos = np.minimum(np.searchsorted(old_keys, touched), max(len(old_keys) - 1, 0))
+    hit = pos[(old_keys[pos] == touched)] if len(old_keys) else pos[:0]
+    keep = np.ones(len(old_keys), dtype=bool)
+    keep[hit] = False
+
+    merged = sp.csr_matrix(
+        (np.concatenate([R.data[keep], values[upsert]]),
+         (np.concatenate([old_rows[keep], rows]), np.concatenate([R.indices[keep], cols]))),
+        shape=(n_rows, n_cols), dtype=np.float32,
+    )
+    affected_rows = np.unique(np.concatenate([rows, del_rows]))
+    affected_cols = np.unique(np.concatenate([cols, del_cols]))
+    return merged, user_ids, item_ids, affected_rows, affected_cols
+
+
+# ── модели ────────────────────────────────────────────────────────────
+def update_svd(models_dir: str, R, user_ids, item_ids, users, items):
+    mf = als_update(load_mf(models_dir), R, user_ids, item_ids, users, items, n_iters=ALS_ITERS)
+    mf.save(os.path.join(models_dir, FACTORS_FILE))
+    ann_path = os.path.join(models_dir, 'svd_ann.npz')
+    prev = FactorIndex.load(ann_path) if os.path.exists(ann_path) else None
+    ann = FactorIndex.build(
+        mf.qi, mf.item_ids,
+        centroids=prev.centroids if prev is not None else None,
+        n_iter=KMEANS_ITERS if prev is not None else FULL_KMEANS_ITERS,
+    )
+    ann.save(ann_path)
+    return mf
+
+
+def update_knn(models_dir: str, R, item_ids, items):
+    path = os.path.join(models_dir, 'knn_sparse.npz')
+    knn = SparseItemKNN.load(path)
+    try:
+        knn = update_item_knn(knn, R, item_ids, items)
+    except ValueError as e:
+        # соседи не из той же матрицы (Surprise KNNBasic) — один раз пересчитываем целиком
+        print(f"[{datetime.now()}]   {e}")
+        neighbors = item_similarity(R)
+        knn = SparseItemKNN(neighbors, item_ids, np.diff(R.tocsc().indptr))
+    knn.save(path)
+    return knn
+
+
+def _previous_content_neighbors(models_dir: str, n_items: int):
+    """Таблица контентных соседей из текущего бандла, если она есть и совпадает по размеру."""
+    version = current_bundle(models_dir)
+    if version is None:
+        return None
+    manifest, arrays = read_bundle(bundle_dir(models_dir, version))
+    if 'content_nn_data' not in arrays or manifest['content_shape'][0] != n_items:
+        return None
+    return csr_from_arrays(arrays, 'content_nn', (n_items, n_items))
+
+
+def save_content(models_dir: str, features, idx_to_id):
+    """content_features.npz + маппинги: каждый файл пишется во временный и переименовывается."""
+    staged = []
+    for name, dump in (
+        ('content_features.npz', lambda f: sp.save_npz(f, features)),
+        ('index_to_movie_id.pkl', lambda f: joblib.dump(idx_to_id, f)),
+        ('movie_id_to_index.pkl', lambda f: joblib.dump({v: k for k, v in idx_to_id.items()}, f)),
+    ):
+        tmp_path = os.path.join(models_dir, f'.{name}.{os.getpid()}')
+        with open(tmp_path, 'wb') as f:
+            dump(f)
+        staged.append((tmp_path, os.path.join(models_dir, name)))
+    # переименования — в самом конце, чтобы между ними не было долгой работы
+    for tmp_path, path in staged:
+        os.replace(tmp_path, path)
+
+
+def update_content(models_dir: str, data_dir: str):
+    """
+    Новые фильмы из movies.csv → строки content_features + маппинги, таблица соседей
+    текущего бандла дополняется update_topk. Ничего не записывает: → ((признаки,
+    index_to_movie_id) для publish_bundle и save_content или None — новых фильмов нет,
+    таблица для бандла; None — строить целиком).
+    """
+    features = sp.load_npz(os.path.join(models_dir, 'content_features.npz'))
+    idx_to_id = joblib.load(os.path.join(models_dir, 'index_to_movie_id.pkl'))
+    n_old = features.shape[0]
+    previous = _previous_content_neighbors(models_dir, n_old)
+
+    movies_csv = os.path.join(data_dir, 'movies.csv')
+    if not os.path.exists(movies_csv):
+        return None, previous
+    known = np.fromiter((idx_to_id[i] for i in range(n_old)), dtype=np.int64, count=n_old)
+    movie_ids = load_movies(movies_csv)['movieId'].to_numpy(np.int64)
+    new_ids = movie_ids[~np.isin(movie_ids, known)]
+    if len(new_ids) == 0:
+        return None, previous
+
+    print(f"[{datetime.now()}] Content: {len(new_ids)} new movies")
+    with open(os.path.join(models_dir, 'tag_vectorizer.pkl'), 'rb') as f:
+        meta = pickle.load(f)
+    if 'genres' not in meta:
+        raise RuntimeError("tag_vectorizer.pkl is from an older build, run full training first")
+    rows = content_rows(data_dir, new_ids, meta)
+    features = sp.vstack([features, rows], format='csr', dtype=np.float32)
+    for i, mid in enumerate(new_ids, n_old):
+        idx_to_id[i] = int(mid)
+
+    if previous is None:
+        return (features, idx_to_id), None
+    index = ContentIndex(features, [idx_to_id[i] for i in range(features.shape[0])])
+    return (features, idx_to_id), update_topk(previous, features.shape[0], np.arange(n_old, features.shape[0]),
+                                              index.similarity_rows)
+
+
+def retrain(models_dir: str = MODELS_DIR, data_dir: str = DATA_DIR):
+    """Один инкрементальный прогон; → manifest нового бандла или None, если учитывать нечего."""
+    R, user_ids, item_ids, offset = load_state(models_dir)
+    events, end = RatingLog(os.path.join(models_dir, LOG_FILE)).read(offset)
+    latest = latest_events(events)
+    print(f"[{datetime.now()}] Rating log: {len(events)} events, {len(latest)} (user, movie) pairs")
+
+    content, content_neighbors = update_content(models_dir, data_dir)
+    if latest.empty and content is None:
+        print(f"[{datetime.now()}] Nothing to update")
+        return None
+
+    if not latest.empty:
+        R, user_ids, item_ids, users, items = apply_events(R, user_ids, item_ids, latest)
+        print(f"[{datetime.now()}] Affected: {len(users)} users, {len(items)} items")
+        update_svd(models_dir, R, user_ids, item_ids, users, items)
+        print(f"[{datetime.now()}] ✔ SVD updated")
+        update_knn(models_dir, R, item_ids, items)
+        print(f"[{datetime.now()}] ✔ item-KNN updated")
+
+    manifest = publish_bundle(models_dir, content_neighbors=content_neighbors, content=content)
+    # content и смещение пишем только после публикации — упавший прогон повторит те же
+    # события и те же новые фильмы, а content_features не разойдётся с опубликованным
+    if content is not None:
+        save_content(models_dir, *content)
+    save_state(models_dir, R, user_ids, item_ids, end)
+    print(f"[{datetime.now()}] ✔ bundle {manifest['version']} published")
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Инкрементальное переобучение по журналу оценок")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--data-dir', default=DATA_DIR, help="movies.csv / tags.csv для новых фильмов")
+    args = parser.parse_args()
+    retrain(args.models_dir, args.data_dir)
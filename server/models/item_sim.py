@@ -0,0 +1,139 @@
+# server/models/item_sim.py
+#
+# Item-item косинус без плотной матрицы n_items²: считается блоками фильмов разреженными
+# умножениями по CSR оценок, блоки раздаются по процессам, от каждой строки остаются
+# только top-K соседей. Результат — SparseItemKNN (тот же артефакт knn_sparse.npz).
+#
+# Косинус — как у Surprise (sim_options name="cosine"): суммы только по общим пользователям,
+#   sim(i, j) = Σ r_ui·r_uj / sqrt(Σ r_ui² · Σ r_uj²),
+# и пары с числом общих пользователей < min_support отбрасываются.
+
+import os
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from models.knn_index import SparseItemKNN, DEFAULT_K, update_topk
+from models.mf import ratings_matrix
+
+MIN_SUPPORT = 5
+BLOCK_CELLS = 16_000_000  # ячеек плотного блока (строки × n_items) на одну задачу
+
+_mats = None
+
+
+def _init_worker(R):
+    """Матрицы, общие для всех блоков воркера: item × user (Xt, Bt, X2t) и user × item."""
+    global _mats
+    X = sp.csr_matrix(R, dtype=np.float32)
+    B = X.copy()
+    B.data[:] = 1
+    X2 = X.multiply(X).tocsr()
+    _mats = (X.T.tocsr(), B.T.tocsr(), X2.T.tocsr(), X, B, X2)
+
+
+def _cosine_rows(Xt, Bt, X2t, X, B, X2, min_support):
+    """Косинус строк Xt (фильмы × пользователи) со всеми фильмами X → плотный блок."""
+    prod = (Xt @ X).toarray()
+    sq_i = (X2t @ B).toarray()     # Σ r_ui² по пользователям, оценившим и j
+    sq_j = (Bt @ X2).toarray()     # Σ r_uj² по пользователям, оценившим и i
+    support = (Bt @ B).toarray()
+
+    denom = np.sqrt(sq_i * sq_j)
+    sim = np.divide(prod, denom, out=np.zeros_like(prod), where=denom > 0)
+    sim[support < min_support] = 0
+    return sim
+
+
+def _block_topk(args):
+    start, stop, k, min_support = args
+    Xt, Bt, X2t, X, B, X2 = _mats
+    sim = _cosine_rows(Xt[start:stop], Bt[start:stop], X2t[start:stop], X, B, X2, min_support)
+    rows = np.arange(stop - start)
+    sim[rows, rows + start] = 0                # сам фильм не сосед
+
+    k = min(k, sim.shape[1] - 1)
+    top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+    top_sims = np.take_along_axis(sim, top, axis=1)
+    order = np.argsort(-top_sims, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_sims = np.take_along_axis(top_sims, order, axis=1)
+    keep = top_sims > 0
+    return keep.sum(axis=1), top[keep].astype(np.int32), top_sims[keep].astype(np.float32)
+
+
+def item_similarity(R, k: int = DEFAULT_K, min_support: int = MIN_SUPPORT, workers=None,
+                    block_size=None, verbose: bool = True):
+    """
+    R — CSR user × item. Возвращает CSR item × item с top-K положительными соседями
+    в строке (по убыванию похожести), как prune_dense_sim для плотной матрицы.
+    workers=1 — без пула процессов, в текущем процессе.
+    """
+    n_items = R.shape[1]
+    if block_size is None:
+        block_size = max(1, BLOCK_CELLS // max(n_items, 1))
+    blocks = [(s, min(s + block_size, n_items), k, min_support) for s in range(0, n_items, block_size)]
+    if verbose:
+        print(f"[{datetime.now()}] Item-item cosine: {n_items} items, {len(blocks)} blocks, "
+              f"{workers or os.cpu_count()} workers")
+
+    counts, indices, data = [], [], []
+    if workers == 1:
+        _init_worker(R)
+        results = map(_block_topk, blocks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(R,))
+        # map сохраняет порядок блоков — строки CSR идут подряд
+        results = pool.map(_block_topk, blocks)
+    try:
+        for i, (c, idx, d) in enumerate(results, 1):
+            counts.append(c)
+            indices.append(idx)
+            data.append(d)
+            if verbose and (i % 50 == 0 or i == len(blocks)):
+                print(f"[{datetime.now()}]   {i}/{len(blocks)} blocks done")
+    finally:
+        if workers != 1:
+            pool.shutdown()
+
+    indptr = np.concatenate([[0], np.cumsum(np.concatenate(counts))]).astype(np.int64)
+    return sp.csr_matrix(
+        (np.concatenate(data), np.concatenate(indices), indptr), shape=(n_items, n_items)
+    )
+
+
+def train_item_knn(df, k: int = DEFAULT_K, min_support: int = MIN_SUPPORT, workers=None):
+    """DataFrame (userId, movieId, rating) → SparseItemKNN."""
+    R, _, item_ids = ratings_matrix(df)
+    neighbors = item_similarity(R, k=k, min_support=min_support, workers=workers)
+    item_counts = np.diff(R.tocsc().indptr).astype(np.int32)
+    return SparseItemKNN(neighbors, item_ids, item_counts)
+
+
+def update_item_knn(knn, R, item_ids, items, k=None, min_support: int = MIN_SUPPORT):
+    """
+    Частичный пересчёт после новых оценок: R — CSR user × item с теми же столбцами, что
+    у knn, плюс новые фильмы в конце (item_ids), items — inner-индексы фильмов, чьи
+    столбцы изменились. Пересчитываются только их строки косинуса (update_topk) —
+    похожесть пар без изменённых фильмов от новых оценок не зависит.
+    k=None — сколько соседей хранит knn.
+    """
+    n_items = R.shape[1]
+    if not np.array_equal(knn.raw_ids, np.asarray(item_ids)[:len(knn)]):
+        raise ValueError("KNN items do not match the ratings matrix, full retrain required")
+    X = sp.csr_matrix(R, dtype=np.float32)
+    B = X.copy()
+    B.data[:] = 1
+    X2 = X.multiply(X).tocsr()
+    Xc, Bc, X2c = X.tocsc(), B.tocsc(), X2.tocsc()
+
+    def similarity_rows(ids):
+        return _cosine_rows(Xc[:, ids].T.tocsr(), Bc[:, ids].T.tocsr(), X2c[:, ids].T.tocsr(),
+                            X, B, X2, min_support)
+
+    neighbors = update_topk(knn.neighbors_csr, n_items, items, similarity_rows, k=k,
+                            block_size=max(1, BLOCK_CELLS // max(n_items, 1)))
+    item_counts = np.diff(Xc.indptr).astype(np.int32)
+    return SparseItemKNN(neighbors, item_ids, item_counts)
@@ -0,0 +1,187 @@
+# server/models/knn_index.py
+#
+# Разреженный артефакт item-KNN для сервинга.
+# Строится офлайн из обученного Surprise KNNBasic: хранит только top-K соседей
+# на фильм (CSR, float32) и маппинг raw movieId ↔ inner, без плотной матрицы
+# sim и без trainset со всеми рейтингами.
+
+import numpy as np
+import scipy.sparse as sp
+
+from models.id_map import IdMap
+
+DEFAULT_K = 50
+BLOCK_SIZE = 1024
+FORMAT_VERSION = 2
+
+
+def prune_dense_sim(sim, k: int = DEFAULT_K, block_size: int = BLOCK_SIZE):
+    """
+    Плотная n×n матрица похожести → CSR с top-K положительными соседями в строке
+    (сам фильм исключён, внутри строки — по убыванию похожести).
+    """
+    n_items = sim.shape[0]
+    k = max(1, min(k, n_items - 1))
+    counts = np.zeros(n_items, dtype=np.int64)
+    indices_parts, data_parts = [], []
+
+    # идём блоками строк, чтобы не копировать всю матрицу целиком
+    for start in range(0, n_items, block_size):
+        stop = min(start + block_size, n_items)
+        rows = np.arange(stop - start)
+        block = np.array(sim[start:stop], dtype=np.float32)
+        block[rows, np.arange(start, stop)] = -np.inf  # сам фильм не сосед
+
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        # соседей с нулевой или отрицательной похожестью не храним
+        keep = top_scores > 0
+        counts[start:stop] = keep.sum(axis=1)
+        indices_parts.append(top[keep].astype(np.int32))
+        data_parts.append(top_scores[keep])
+
+    indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    indices = np.concatenate(indices_parts) if indices_parts else np.zeros(0, np.int32)
+    data = np.concatenate(data_parts) if data_parts else np.zeros(0, np.float32)
+    return sp.csr_matrix((data, indices, indptr), shape=(n_items, n_items))
+
+
+def topk_coo(n_items: int, rows, cols, sims, k: int = DEFAULT_K):
+    """Тройки (строка, сосед, похожесть) → CSR с top-K положительными соседями в строке."""
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int32)
+    sims = np.asarray(sims, dtype=np.float32)
+    keep = (sims > 0) & (rows != cols)
+    rows, cols, sims = rows[keep], cols[keep], sims[keep]
+    order = np.lexsort((-sims, rows))
+    rows, cols, sims = rows[order], cols[order], sims[order]
+    counts = np.bincount(rows, minlength=n_items)
+    rank = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    keep = rank < k
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[keep], minlength=n_items))]).astype(np.int64)
+    return sp.csr_matrix((sims[keep], cols[keep], indptr), shape=(n_items, n_items))
+
+
+def kth_similarity(neighbors, k: int = DEFAULT_K):
+    """Порог входа в строку: похожесть k-го соседа или 0, если соседей меньше k."""
+    counts = np.diff(neighbors.indptr)
+    full = np.flatnonzero(counts >= k)
+    out = np.zeros(neighbors.shape[0], dtype=np.float32)
+    # строки отсортированы по убыванию — k-й сосед стоит на позиции k-1
+    out[full] = neighbors.data[neighbors.indptr[full] + k - 1]
+    return out
+
+
+def update_topk(neighbors, n_items: int, replaced, similarity_rows, k=None,
+                block_size: int = BLOCK_SIZE):
+    """
+    Частичное обновление таблицы top-K после изменения строк replaced (inner-индексы).
+    similarity_rows(ids) → плотные похожести ids со всеми n_items фильмами (n_items ≥
+    старого размера, новые фильмы — в конце). Строки replaced собираются заново; в чужие
+    строки replaced входят, если обходят текущего k-го соседа. Пары вне replaced не
+    меняются, поэтому обновление стоит O(|replaced| · n_items), а не O(n_items²).
+    Строка, из которой ушёл сосед из replaced, добирается только из replaced (следующий
+    сосед вне replaced не хранится) — до полной пересборки она может быть неточной.
+    k=None — как в существующей таблице (самая длинная строка).
+    """
+    if k is None:
+        k = int(np.diff(neighbors.indptr).max(initial=0)) or DEFAULT_K
+    replaced = np.unique(np.asarray(replaced, dtype=np.int64))
+    touched = np.zeros(n_items, dtype=bool)
+    touched[replaced] = True
+    coo = sp.coo_matrix(neighbors)
+    keep = ~touched[coo.row] & ~touched[coo.col]
+    rows, cols, sims = [coo.row[keep]], [coo.col[keep]], [coo.data[keep]]
+    threshold = kth_similarity(topk_coo(n_items, rows[0], cols[0], sims[0], k), k)
+
+    kk = max(1, min(k, n_items - 1))
+    for start in range(0, len(replaced), block_size):
+        block = replaced[start:start + block_size]
+        S = np.asarray(similarity_rows(block), dtype=np.float32)
+        S[np.arange(len(block)), block] = 0           # сам фильм не сосед
+        # строки replaced целиком
+        top = np.argpartition(-S, kk - 1, axis=1)[:, :kk]
+        rows.append(np.repeat(block, kk))
+        cols.append(top.ravel())
+        sims.append(np.take_along_axis(S, top, axis=1).ravel())
+        # replaced как кандидаты в чужие строки — только если проходят порог строки
+        a, j = np.nonzero((S > threshold[None, :]) & ~touched[None, :])
+        rows.append(j)
+        cols.append(block[a])
+        sims.append(S[a, j])
+    return topk_coo(n_items, np.concatenate(rows), np.concatenate(cols), np.concatenate(sims), k)
+
+
+class SparseItemKNN:
+    """
+    Item-KNN для сервинга: CSR top-K соседей (inner-индексы) + IdMap.
+    item_counts — сколько оценок у фильма в обучающей выборке.
+    """
+
+    def __init__(self, neighbors, raw_ids, item_counts=None):
+        self.neighbors_csr = neighbors.tocsr()
+        self.ids = IdMap(raw_ids)
+        if item_counts is None:
+            item_counts = np.zeros(len(raw_ids), dtype=np.int32)
+        self.item_counts = np.asarray(item_counts, dtype=np.int32)
+
+    @property
+    def raw_ids(self):
+        return self.ids.raw_ids
+
+    @classmethod
+    def from_surprise(cls, knn, k: int = DEFAULT_K):
+        trainset = knn.trainset
+        n_items = knn.sim.shape[0]
+        raw_ids = np.array([int(trainset.to_raw_iid(i)) for i in range(n_items)], dtype=np.int32)
+        item_counts = np.array([len(trainset.ir[i]) for i in range(n_items)], dtype=np.int32)
+        return cls(prune_dense_sim(knn.sim, k=k), raw_ids, item_counts)
+
+    def save(self, path: str):
+        m = self.neighbors_csr
+        np.savez(
+            path,
+            format_version=np.int32(FORMAT_VERSION),
+            indptr=m.indptr, indices=m.indices.astype(np.int32),
+            data=m.data.astype(np.float32),
+            raw_ids=self.raw_ids, item_counts=self.item_counts,
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            n_items = len(data["raw_ids"])
+            neighbors = sp.csr_matrix(
+                (data["data"], data["indices"], data["indptr"]), shape=(n_items, n_items)
+            )
+            return cls(neighbors, data["raw_ids"], data["item_counts"])
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, shape):
+        """Из массивов бандла (models/artifacts.py) — без копирования memmap."""
+        from models.artifacts import csr_from_arrays
+        return cls(csr_from_arrays(arrays, 'knn', shape), arrays['knn_raw_ids'], arrays['knn_item_counts'])
+
+    def __contains__(self, movie_id):
+        return movie_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, inner_id: int):
+        """(inner-индексы соседей, похожести) для фильма — срез CSR без копий."""
+        m = self.neighbors_csr
+        lo, hi = m.indptr[inner_id], m.indptr[inner_id + 1]
+        return m.indices[lo:hi], m.data[lo:hi]
+
+    def neighbors(self, movie_id: int, n: int):
+        inner_id = self.ids.to_inner(movie_id)
+        if inner_id is None:
+            return []
+        idx, scores = self.row(inner_id)
+        raw = self.raw_ids[idx[:n]]
+        return [{"movieId": int(mid), "score": float(sc)} for mid, sc in zip(raw, scores[:n])]
@@ -0,0 +1,300 @@
+# server/models/mf.py
+#
+# Biased matrix factorization без Surprise: r̂(u, i) = μ + b_u + b_i + p_u·q_i.
+# Оценки → scipy CSR (user × item, int32-индексы, float32), обучение — ALS:
+# на каждом полушаге все пользователи (затем все фильмы) решаются пачками
+# батчевым np.linalg.solve, пачки раздаются по потокам (BLAS/LAPACK отпускают GIL).
+# Артефакт svd_factors.npz содержит то же, что сервинг берёт из Surprise SVD:
+# qi/bi/pu/bu, raw id пользователей и фильмов и глобальное среднее.
+
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from models.id_map import IdMap
+
+FACTORS_FILE = 'svd_factors.npz'
+SURPRISE_FILE = 'svd_model.pkl'
+
+N_FACTORS = 50
+N_ITERS = 15
+REG = 0.05
+CHUNK_ROWS = 262_144  # сколько (padded) оценок обрабатывается одной пачкой
+
+
+class MFModel:
+    def __init__(self, qi, bi, pu, bu, item_ids, user_ids, global_mean: float, rating_scale=(0.5, 5.0)):
+        self.qi = np.asarray(qi, dtype=np.float32)
+        self.bi = np.asarray(bi, dtype=np.float32)
+        self.pu = np.asarray(pu, dtype=np.float32)
+        self.bu = np.asarray(bu, dtype=np.float32)
+        self.items = IdMap(item_ids)
+        self.users = IdMap(user_ids)
+        self.global_mean = float(global_mean)
+        self.rating_scale = tuple(float(x) for x in rating_scale)
+
+    @property
+    def item_ids(self):
+        return self.items.raw_ids
+
+    @property
+    def user_ids(self):
+        return self.users.raw_ids
+
+    @classmethod
+    def from_surprise(cls, svd):
+        trainset = svd.trainset
+        return cls(
+            svd.qi, svd.bi, svd.pu, svd.bu,
+            item_ids=[int(trainset.to_raw_iid(i)) for i in range(trainset.n_items)],
+            user_ids=[int(trainset.to_raw_uid(u)) for u in range(trainset.n_users)],
+            global_mean=trainset.global_mean,
+            rating_scale=trainset.rating_scale,
+        )
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            qi=self.qi, bi=self.bi, pu=self.pu, bu=self.bu,
+            item_ids=self.item_ids, user_ids=self.user_ids,
+            global_mean=np.float32(self.global_mean),
+            rating_scale=np.array(self.rating_scale, dtype=np.float32),
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(
+                data["qi"], data["bi"], data["pu"], data["bu"],
+                data["item_ids"], data["user_ids"],
+                float(data["global_mean"]), tuple(data["rating_scale"]),
+            )
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, manifest: dict):
+        """Из массивов бандла (models/artifacts.py); qi выровнены с svd_raw_ids."""
+        return cls(
+            arrays["svd_qi"], arrays["svd_bi"], arrays["svd_pu"], arrays["svd_bu"],
+            arrays["svd_raw_ids"], arrays["svd_user_ids"],
+            manifest["svd_global_mean"], manifest.get("svd_rating_scale", (0.5, 5.0)),
+        )
+
+    def predict_many(self, user_ids, item_ids):
+        """Векторный прогноз; для неизвестных пользователей/фильмов — без их слагаемых (как в Surprise)."""
+        u = self.users.to_inner_many(user_ids)
+        i = self.items.to_inner_many(item_ids)
+        est = np.full(len(u), self.global_mean, dtype=np.float32)
+        ku, ki = u >= 0, i >= 0
+        est[ku] += self.bu[u[ku]]
+        est[ki] += self.bi[i[ki]]
+        both = ku & ki
+        est[both] += np.einsum('ij,ij->i', self.pu[u[both]], self.qi[i[both]])
+        return np.clip(est, *self.rating_scale)
+
+    # ── персональные рекомендации ─────────────────────────────────────
+    def user_vector(self, user_id):
+        """(p_u, b_u) обученного пользователя или None."""
+        u = self.users.to_inner(user_id)
+        if u is None:
+            return None
+        return self.pu[u], float(self.bu[u])
+
+    def top_n(self, p, b: float, n: int, exclude=()):
+        """
+        Весь каталог одним проходом: r̂ = μ + b_u + b_i + q_i·p_u, без фильмов exclude
+        (raw movieId; их inner-индексы — отсортированный массив). → [{"movieId", "score"}].
+        """
+        scores = self.qi @ np.asarray(p, dtype=np.float32)
+        scores += self.bi
+        scores += self.global_mean + b
+        seen = self.items.to_inner_many(np.fromiter(exclude, dtype=np.int64))
+        seen = np.unique(seen[seen >= 0])
+        scores[seen] = -np.inf
+
+        k = min(n, len(scores) - len(seen))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        est = np.clip(scores[top], *self.rating_scale)
+        return [{"movieId": int(mid), "score": float(sc)} for mid, sc in zip(self.item_ids[top], est)]
+
+    def recommend_for_user(self, user_id: int, n: int, exclude=()):
+        """top-n для обученного пользователя; неизвестный → []."""
+        vec = self.user_vector(user_id)
+        if vec is None:
+            return []
+        return self.top_n(vec[0], vec[1], n, exclude)
+
+
+def as_mf(model):
+    """MFModel как есть; обученный Surprise SVD → MFModel."""
+    return model if isinstance(model, MFModel) else MFModel.from_surprise(model)
+
+
+def load_mf(models_dir: str):
+    """
+    Факторы SVD для сервинга: svd_factors.npz (ALS, см. ниже) или svd_model.pkl (Surprise) —
+    какой из файлов новее.
+    """
+    native = os.path.join(models_dir, FACTORS_FILE)
+    legacy = os.path.join(models_dir, SURPRISE_FILE)
+    if os.path.exists(native) and (
+        not os.path.exists(legacy) or os.path.getmtime(native) >= os.path.getmtime(legacy)
+    ):
+        return MFModel.load(native)
+    import joblib
+    return MFModel.from_surprise(joblib.load(legacy))
+
+
+# ── обучение ──────────────────────────────────────────────────────────
+def ratings_matrix(df, user_col: str = "userId", item_col: str = "movieId", rating_col: str = "rating"):
+    """DataFrame оценок → (CSR user × item float32, raw user ids, raw item ids)."""
+    user_ids, rows = np.unique(df[user_col].to_numpy(dtype=np.int32), return_inverse=True)
+    item_ids, cols = np.unique(df[item_col].to_numpy(dtype=np.int32), return_inverse=True)
+    R = sp.csr_matrix(
+        (df[rating_col].to_numpy(dtype=np.float32), (rows.astype(np.int32), cols.astype(np.int32))),
+        shape=(len(user_ids), len(item_ids)),
+    )
+    R.sum_duplicates()
+    return R, user_ids, item_ids
+
+
+def _solve_chunk(R, residual, Y, reg, rows, width, out_f, out_b):
+    """
+    Регуляризованный МНК для строк rows (у каждой <= width оценок): строки дополняются
+    нулями до width, матрицы Грама и правые части считаются батчевым matmul.
+    """
+    k = Y.shape[1]
+    counts = (R.indptr[rows + 1] - R.indptr[rows]).astype(np.int64)
+    offs = np.arange(width)
+    mask = offs[None, :] < counts[:, None]
+    pos = np.where(mask, R.indptr[rows][:, None] + offs[None, :], 0)
+    Yb = Y[R.indices[pos]] * mask[..., None]              # (c, width, k)
+    target = np.where(mask, residual[pos], 0.0).astype(np.float32)
+    Yt = Yb.transpose(0, 2, 1)
+    G = Yt @ Yb                                           # (c, k, k)
+    G += (reg * counts)[:, None, None] * np.eye(k, dtype=np.float32)
+    x = np.linalg.solve(G, (Yt @ target[..., None]))[..., 0]
+    out_f[rows] = x[:, :-1]
+    out_b[rows] = x[:, -1]
+
+
+def _als_half_step(R, fixed_f, fixed_b, mu, reg, out_f, out_b, pool):
+    """
+    Решает строки R при фиксированных факторах столбцов: r - μ - b_col ≈ [f, b]·[q_col, 1].
+    Строки группируются по числу оценок (до ближайшей степени двойки), чтобы паддинг был ≤ 2×.
+    """
+    residual = R.data - mu - fixed_b[R.indices]
+    Y = np.hstack([fixed_f, np.ones((len(fixed_f), 1), dtype=np.float32)])
+    counts = np.diff(R.indptr)
+    out_f[counts == 0] = 0
+    out_b[counts == 0] = 0
+
+    jobs = []
+    rated = np.flatnonzero(counts)
+    buckets = np.ceil(np.log2(counts[rated])).astype(np.int64)
+    for b in np.unique(buckets):
+        rows = rated[buckets == b]
+        width = int(counts[rows].max())
+        step = max(1, CHUNK_ROWS // width)
+        for start in range(0, len(rows), step):
+            jobs.append((rows[start:start + step], width))
+    list(pool.map(lambda job: _solve_chunk(R, residual, Y, reg, job[0], job[1], out_f, out_b), jobs))
+
+
+def rmse(R, pu, bu, qi, bi, mu, chunk: int = 1_000_000):
+    coo = R.tocoo()
+    se = 0.0
+    for start in range(0, coo.nnz, chunk):
+        u, i = coo.row[start:start + chunk], coo.col[start:start + chunk]
+        est = mu + bu[u] + bi[i] + np.einsum('ij,ij->i', pu[u], qi[i])
+        se += float(((coo.data[start:start + chunk] - est) ** 2).sum())
+    return float(np.sqrt(se / max(coo.nnz, 1)))
+
+
+def train_als(df, n_factors: int = N_FACTORS, n_iters: int = N_ITERS, reg: float = REG,
+              n_jobs=None, seed: int = 42, verbose: bool = True):
+    """Biased MF методом ALS по DataFrame (userId, movieId, rating) → MFModel."""
+    R, user_ids, item_ids = ratings_matrix(df)
+    Rt = R.T.tocsr()
+    mu = float(R.data.mean())
+    rng = np.random.default_rng(seed)
+    qi = rng.normal(0, 0.1, (R.shape[1], n_factors)).astype(np.float32)
+    bi = np.zeros(R.shape[1], dtype=np.float32)
+    pu = np.zeros((R.shape[0], n_factors), dtype=np.float32)
+    bu = np.zeros(R.shape[0], dtype=np.float32)
+    if verbose:
+        print(f"[{datetime.now()}] ALS: {R.shape[0]} users × {R.shape[1]} items, {R.nnz} ratings, "
+              f"{n_factors} factors")
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        for it in range(1, n_iters + 1):
+            started = time.perf_counter()
+            _als_half_step(R, qi, bi, mu, reg, pu, bu, pool)
+            _als_half_step(Rt, pu, bu, mu, reg, qi, bi, pool)
+            if verbose:
+                print(f"[{datetime.now()}]   iter {it}/{n_iters}: train RMSE "
+                      f"{rmse(R, pu, bu, qi, bi, mu):.4f} ({time.perf_counter() - started:.1f}s)")
+
+    scale = (float(R.data.min()), float(R.data.max()))
+    return MFModel(qi, bi, pu, bu, item_ids, user_ids, mu, rating_scale=scale)
+
+
+def _extend(ids_map, raw_ids):
+    """inner-индексы raw_ids в модели; неизвестным выдаются новые индексы после существующих."""
+    inner = ids_map.to_inner_many(raw_ids).astype(np.int64)
+    new = np.flatnonzero(inner < 0)
+    inner[new] = len(ids_map) + np.arange(len(new))
+    return inner, np.asarray(raw_ids)[new]
+
+
+def _remap_rows(M, rows, col_map, n_cols):
+    """Строки rows из CSR M со столбцами, переведёнными через col_map."""
+    sub = M[rows]
+    return sp.csr_matrix((sub.data, col_map[sub.indices], sub.indptr), shape=(len(rows), n_cols))
+
+
+def als_update(mf, R, user_ids, item_ids, users, items, n_iters: int = 2, reg: float = REG,
+               n_jobs=None, seed: int = 42):
+    """
+    Warm start ALS после новых оценок: факторы mf остаются как есть, заново решаются только
+    пользователи users и фильмы items (inner-индексы строк/столбцов R, user_ids/item_ids —
+    их raw id). Новые пользователи и фильмы дописываются в конец модели. Каждый полушаг —
+    тот же _als_half_step, но на подматрице затронутых строк, так что стоимость зависит от
+    их оценок, а не от всего R. μ не пересчитывается — biases остаются к прежнему среднему.
+    """
+    u_map, new_users = _extend(mf.users, user_ids)
+    i_map, new_items = _extend(mf.items, item_ids)
+    rng = np.random.default_rng(seed)
+    pu = np.vstack([mf.pu, np.zeros((len(new_users), mf.pu.shape[1]), dtype=np.float32)])
+    bu = np.concatenate([mf.bu, np.zeros(len(new_users), dtype=np.float32)])
+    qi = np.vstack([mf.qi, rng.normal(0, 0.1, (len(new_items), mf.qi.shape[1])).astype(np.float32)])
+    bi = np.concatenate([mf.bi, np.zeros(len(new_items), dtype=np.float32)])
+
+    users = np.asarray(users, dtype=np.int64)
+    items = np.asarray(items, dtype=np.int64)
+    R_users = _remap_rows(sp.csr_matrix(R), users, i_map, len(qi))
+    R_items = _remap_rows(sp.csc_matrix(R).T.tocsr(), items, u_map, len(pu))
+    out_pu = np.zeros((len(users), pu.shape[1]), dtype=np.float32)
+    out_bu = np.zeros(len(users), dtype=np.float32)
+    out_qi = np.zeros((len(items), qi.shape[1]), dtype=np.float32)
+    out_bi = np.zeros(len(items), dtype=np.float32)
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        for _ in range(n_iters):
+            _als_half_step(R_users, qi, bi, mf.global_mean, reg, out_pu, out_bu, pool)
+            pu[u_map[users]], bu[u_map[users]] = out_pu, out_bu
+            _als_half_step(R_items, pu, bu, mf.global_mean, reg, out_qi, out_bi, pool)
+            qi[i_map[items]], bi[i_map[items]] = out_qi, out_bi
+
+    return MFModel(
+        qi, bi, pu, bu,
+        np.concatenate([mf.item_ids, new_items]).astype(mf.item_ids.dtype),
+        np.concatenate([mf.user_ids, new_users]).astype(mf.user_ids.dtype),
+        mf.global_mean, mf.rating_scale,
+    )
@@ -79,6 +79,9 @@ class Movie(db.Model):
     studio = db.Column(db.String(150), nullable=True)    # Студія (з CSV)
     genres_str = db.Column(db.String(255), nullable=True) # Зберігаємо оригінальну строку жанрів з CSV 'genres'
     popularity = db.Column(db.Float, nullable=True)      # Поле з вашого movie.py
+    # Матеріалізована статистика оцінок з app_ratings (підтримується слухачами нижче)
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_mean = db.Column(db.Float, nullable=True)
 
     # Зв'язок з жанрами (багато-до-багатьох) через таблицю movie_genres
     genres = db.relationship('Genre', secondary='movie_genres', backref=db.backref('movies', lazy='dynamic'))
@@ -125,7 +128,7 @@ class Rating(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     # !!! ВИКОРИСТОВУЄМО movies.movie_id !!!
-    movie_id = db.Column(db.Integer, db.ForeignKey('movies.movie_id', ondelete='CASCADE'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.movie_id', ondelete='CASCADE'), nullable=False, index=True)
     rating = db.Column(db.Float, nullable=False) # Використовуємо 'rating' замість 'score'
     created_at = db.Column(db.DateTime, default=datetime.utcnow) # Змінено з 'timestamp'
     # Унікальне обмеження
@@ -261,4 +264,39 @@ def update_list_movie_count_stats(mapper, connection, target):
         update_stmt = movie_list_table.update().\
             where(movie_list_table.c.id == list_id).\
             values(movie_count=count_val if count_val is not None else 0)
-        _execute_update(connection, update_stmt)
\ No newline at end of file
+        _execute_update(connection, update_stmt)
+
+@event.listens_for(Rating, 'after_insert')
+@event.listens_for(Rating, 'after_update')
+@event.listens_for(Rating, 'after_delete')
+def update_movie_rating_stats(mapper, connection, target):
+    """Оновлює rating_count та rating_mean у Movie."""
+    movie_id = target.movie_id
+    if movie_id:
+        movie_table = Movie.__table__
+        rating_table = Rating.__table__
+        select_stmt = select(
+            func.avg(rating_table.c.rating).label('avg_r'),
+            func.count(rating_table.c.id).label('count_r')
+        ).where(rating_table.c.movie_id == movie_id)
+        result = connection.execute(select_stmt).fetchone()
+        update_stmt = movie_table.update().\
+            where(movie_table.c.movie_id == movie_id).\
+            values(
+                rating_mean=result.avg_r if result and result.count_r > 0 else None,
+                rating_count=result.count_r if result else 0
+            )
+        _execute_update(connection, update_stmt)
+
+def recompute_movie_rating_stats(connection):
+    """
+    Перераховує rating_count / rating_mean для всіх фільмів одним UPDATE.
+    Потрібно після масового завантаження (bulk_insert_mappings не викликає слухачів).
+    """
+    movie_table = Movie.__table__
+    rating_table = Rating.__table__
+    count_q = select(func.count(rating_table.c.id)).\
+        where(rating_table.c.movie_id == movie_table.c.movie_id).scalar_subquery()
+    avg_q = select(func.avg(rating_table.c.rating)).\
+        where(rating_table.c.movie_id == movie_table.c.movie_id).scalar_subquery()
+    connection.execute(movie_table.update().values(rating_count=count_q, rating_mean=avg_q))
@@ -0,0 +1,103 @@
+# server/models/precomputed.py
+#
+# Таблица заранее посчитанных top-N рекомендаций по каждому алгоритму
+# (строит precompute_recommendations.py). Файлы .npy открываются через
+# mmap, поиск фильма — бинарный по отсортированным movie_ids: O(1) чтение строки.
+# Строка отдаётся, только если совпадает с тем, что посчитал бы живой путь: svd/hybrid —
+# при том же nprobe, hybrid — при том же решении «KNN включён» по rating_count.
+
+import os
+import json
+from functools import cached_property
+
+import numpy as np
+
+from models.hybrid_engine import MIN_KNN_RATINGS
+from models.id_map import IdMap
+
+META_FILE = 'meta.json'
+NPROBE_ALGORITHMS = ('svd', 'hybrid')   # зависят от ?nprobe
+
+
+def save_table(out_dir: str, movie_ids, results: dict, meta: dict, hybrid_knn=None):
+    """
+    movie_ids — отсортированные movieId (n,), results — {alg: (ids (n, k) int32, scores (n, k) float32)}.
+    Пустые ячейки: id = -1. hybrid_knn — (n,) bool: участвовал ли KNN в гибриде фильма
+    (rating_count >= MIN_KNN_RATINGS на момент расчёта). meta['nprobe'] — nprobe svd/hybrid.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 'movie_ids.npy'), np.asarray(movie_ids, dtype=np.int32))
+    if hybrid_knn is not None:
+        np.save(os.path.join(out_dir, 'hybrid_knn.npy'), np.asarray(hybrid_knn, dtype=bool))
+    for alg, (ids, scores) in results.items():
+        np.save(os.path.join(out_dir, f'{alg}_ids.npy'), ids.astype(np.int32))
+        np.save(os.path.join(out_dir, f'{alg}_scores.npy'), scores.astype(np.float32))
+    with open(os.path.join(out_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({**meta, 'algorithms': sorted(results)}, f, indent=2)
+
+
+class PrecomputedRecs:
+    def __init__(self, movie_ids, tables: dict, meta: dict, hybrid_knn=None):
+        self.movie_ids = movie_ids
+        self.tables = tables
+        self.meta = meta
+        self.hybrid_knn = hybrid_knn
+
+    @classmethod
+    def load(cls, path: str):
+        """None, если таблицы нет."""
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        movie_ids = np.load(os.path.join(path, 'movie_ids.npy'), mmap_mode='r')
+        tables = {
+            alg: (
+                np.load(os.path.join(path, f'{alg}_ids.npy'), mmap_mode='r'),
+                np.load(os.path.join(path, f'{alg}_scores.npy'), mmap_mode='r'),
+            )
+            for alg in meta['algorithms']
+        }
+        knn_path = os.path.join(path, 'hybrid_knn.npy')
+        hybrid_knn = np.load(knn_path, mmap_mode='r') if os.path.exists(knn_path) else None
+        return cls(movie_ids, tables, meta, hybrid_knn)
+
+    @cached_property
+    def ids(self) -> IdMap:
+        """movie_ids для векторной проверки принадлежности — строится один раз на таблицу."""
+        return IdMap(self.movie_ids)
+
+    @property
+    def width(self) -> int:
+        return int(self.meta.get('top_n', 0))
+
+    @property
+    def nprobe(self) -> int:
+        # таблицы без этого поля считались точным поиском
+        return int(self.meta.get('nprobe', 0))
+
+    def lookup(self, alg: str, movie_id: int, n: int, nprobe=None, rating_count=None):
+        """
+        Готовый список [{"movieId", "score"}] или None, если фильма нет в таблице
+        (добавлен после сборки), запрошено больше, чем посчитано, или живой путь дал бы
+        другое: svd/hybrid с другим nprobe; hybrid, когда rating_count сейчас по другую
+        сторону MIN_KNN_RATINGS, чем при расчёте (None — не проверять).
+        """
+        table = self.tables.get(alg)
+        if table is None or n > self.width:
+            return None
+        if alg in NPROBE_ALGORITHMS and nprobe is not None and nprobe != self.nprobe:
+            return None
+        pos = int(np.searchsorted(self.movie_ids, movie_id))
+        if pos >= len(self.movie_ids) or self.movie_ids[pos] != movie_id:
+            return None
+        if alg == 'hybrid' and rating_count is not None and self.hybrid_knn is not None:
+            if bool(self.hybrid_knn[pos]) != (rating_count >= MIN_KNN_RATINGS):
+                return None
+        ids, scores = table[0][pos, :n], table[1][pos, :n]
+        return [
+            {"movieId": int(mid), "score": float(sc)}
+            for mid, sc in zip(ids, scores)
+            if mid >= 0
+        ]
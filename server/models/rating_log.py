@@ -0,0 +1,89 @@
+# server/models/rating_log.py
+#
+# Append-only журнал оценок из приложения (create / update / delete через API).
+# Формат — записи фиксированной ширины (20 байт: ts, user_id, movie_id, rating) подряд
+# в одном файле: запись одним os.write в O_APPEND атомарна между воркерами gunicorn,
+# а при чтении файл открывается как np.memmap со структурным dtype — каждая колонка
+# доступна как массив без парсинга. Удаление оценки — rating = NaN.
+#
+# Позиция чтения — смещение в байтах: обучение запоминает, до какого места журнал
+# уже учтён (models/incremental.py), и при следующем запуске читает только хвост.
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+LOG_FILE = 'rating_events.bin'
+EVENT_DTYPE = np.dtype([
+    ('ts', '<i8'),          # миллисекунды unix time
+    ('user_id', '<i4'),
+    ('movie_id', '<i4'),
+    ('rating', '<f4'),      # NaN — оценка удалена
+])
+
+
+class RatingLog:
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, user_id: int, movie_id: int, rating=None):
+        """Одна запись; rating=None — удаление оценки."""
+        event = np.zeros(1, dtype=EVENT_DTYPE)
+        event['ts'] = int(time.time() * 1000)
+        event['user_id'] = user_id
+        event['movie_id'] = movie_id
+        event['rating'] = np.nan if rating is None else rating
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, event.tobytes())
+        finally:
+            os.close(fd)
+
+    def size(self) -> int:
+        """Текущий конец журнала в байтах (только целые записи)."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+        return size - size % EVENT_DTYPE.itemsize
+
+    def read(self, start: int = 0, stop=None):
+        """События в байтах [start, stop) → (структурный массив, смещение конца)."""
+        stop = self.size() if stop is None else stop
+        count = (stop - start) // EVENT_DTYPE.itemsize
+        if count <= 0:
+            return np.zeros(0, dtype=EVENT_DTYPE), start
+        events = np.memmap(self.path, dtype=EVENT_DTYPE, mode='r', offset=start, shape=(count,))
+        return events, start + count * EVENT_DTYPE.itemsize
+
+
+def latest_events(events) -> pd.DataFrame:
+    """Последнее событие на пару (user, movie) → DataFrame userId, movieId, rating (NaN — удалено)."""
+    if len(events) == 0:
+        return pd.DataFrame({'userId': np.zeros(0, np.int32), 'movieId': np.zeros(0, np.int32),
+                             'rating': np.zeros(0, np.float32)})
+    order = np.argsort(events['ts'], kind='stable')
+    users = events['user_id'][order]
+    movies = events['movie_id'][order]
+    keys = (users.astype(np.int64) << 32) | movies.astype(np.int64)
+    # np.unique берёт первое вхождение — идём с конца, чтобы это было последнее событие
+    _, last = np.unique(keys[::-1], return_index=True)
+    pick = order[len(order) - 1 - last]
+    return pd.DataFrame({
+        'userId': events['user_id'][pick],
+        'movieId': events['movie_id'][pick],
+        'rating': events['rating'][pick],
+    })
+
+
+def apply_events(ratings: pd.DataFrame, latest: pd.DataFrame) -> pd.DataFrame:
+    """ratings (userId, movieId, rating) + latest_events → оценки после событий журнала."""
+    if latest.empty:
+        return ratings
+    key = lambda df: (df['userId'].to_numpy(np.int64) << 32) | df['movieId'].to_numpy(np.int64)
+    kept = ratings[~np.isin(key(ratings), key(latest))]
+    added = latest[latest['rating'].notna()]
+    cols = ['userId', 'movieId', 'rating']
+    return pd.concat([kept[cols], added[cols]], ignore_index=True)
@@ -0,0 +1,121 @@
+# server/models/rec_cache.py
+#
+# Кэш готовых ответов рекомендательных эндпоинтов.
+# Локально — LRU с TTL в памяти процесса; если задан REDIS_URL и установлен
+# пакет redis — вторым уровнем общий Redis (или совместимый сервер).
+# В ключ входит версия моделей, поэтому после выкладки новых артефактов
+# старые ответы просто перестают находиться. Так же с каталогом: generation — поколение
+# каталога, общее для воркеров (размер журнала models/catalog_log.py); после CRUD фильма
+# ключи со старым поколением больше не строятся ни в одном процессе.
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # redis — необязательная зависимость
+    redis = None
+
+ARTIFACT_EXTENSIONS = ('.pkl', '.npz', '.npy')
+
+
+def model_version(models_dir: str) -> str:
+    """Короткий хэш по именам, размерам и mtime артефактов моделей в models_dir."""
+    h = hashlib.sha1()
+    for name in sorted(os.listdir(models_dir)):
+        if not name.endswith(ARTIFACT_EXTENSIONS):
+            continue
+        st = os.stat(os.path.join(models_dir, name))
+        h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+
+class RecommendationCache:
+    def __init__(self, maxsize: int = 4096, ttl: float = 600, redis_url=None, prefix: str = 'rec',
+                 generation=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prefix = prefix
+        self._data = OrderedDict()  # key → (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = generation  # () → поколение каталога; None — только версия моделей
+        self._redis = None
+        if redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def make_key(self, version: str, *parts) -> str:
+        head = [self.prefix, version]
+        if self.generation is not None:
+            head.append(f"g{self.generation()}")
+        return ":".join([*head, *map(str, parts)])
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(key)
+            except redis.RedisError:
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._store_local(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store_local(key, value)
+        if self._redis is not None:
+            try:
+                self._redis.setex(key, int(self.ttl), json.dumps(value))
+            except redis.RedisError:
+                pass
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Чистит локальный уровень. Записи в Redis и в LRU других воркеров недостижимы,
+        если перед этим выросло поколение каталога, и доживают свой TTL.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'redis': self._redis is not None,
+                'generation': self.generation() if self.generation is not None else None,
+            }
@@ -0,0 +1,158 @@
+# server/models/recommender.py
+#
+# Item-to-item рекомендации без Flask и БД: все артефакты моделей в одном объекте.
+# Используется и сервером (app.py), и офлайн-джобами (precompute_recommendations.py).
+
+import os
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+
+from models.knn_index import SparseItemKNN
+from models.ann_index import FactorIndex, DEFAULT_NPROBE
+from models.content_index import ContentIndex
+from models.hybrid_engine import HybridEngine, MIN_KNN_RATINGS
+from models.mf import MFModel, load_mf
+from models.artifacts import read_bundle, bundle_dir, current_bundle
+from models.rec_cache import model_version
+
+W_KNN     = 0.2
+W_CONTENT = 0.4
+W_SVD     = 0.4  # сумма = 1.0
+
+ALGORITHMS = ('knn', 'svd', 'content', 'hybrid')
+
+
+def normalize(recs):
+    """Скоры списка рекомендаций → {movieId: score в [0,1]}."""
+    if not recs:
+        return {}
+    scores = [r['score'] for r in recs]
+    lo, hi = min(scores), max(scores)
+    if hi == lo:
+        return {r['movieId']: 0.0 for r in recs}  # Все оценки одинаковы, нормализуем к 0
+    return {r['movieId']: (r['score'] - lo) / (hi - lo) for r in recs}
+
+
+class Recommender:
+    def __init__(self, knn_index, svd_index, content_index, version: str, mf=None):
+        self.knn_index = knn_index
+        self.svd_index = svd_index
+        self.content_index = content_index
+        self.mf = mf  # MFModel: факторы пользователей для персональных рекомендаций
+        self.version = version
+        self.valid_ids = set(int(rid) for rid in knn_index.raw_ids)
+        self.valid_id_map = knn_index.ids  # те же id для векторной проверки (поиск по названиям)
+
+        # Батчевый гибрид для рекомендаций по целому списку фильмов
+        self.engine = HybridEngine(
+            knn_index, svd_index, content_index,
+            w_knn=W_KNN, w_content=W_CONTENT, w_svd=W_SVD,
+        )
+
+    @classmethod
+    def load(cls, models_dir: str, version=None):
+        """
+        version — бандл из <models_dir>/bundles (models/artifacts.py), по умолчанию текущий
+        (bundles/CURRENT); открывается через mmap.
+        Если бандлов нет — старый путь: npz/pickle-артефакты; разреженный KNN и SVD-индекс,
+        если их ещё нет, один раз собираются из pickle (см. build_indexes.py).
+        """
+        version = version or current_bundle(models_dir)
+        if version:
+            return cls.from_bundle(bundle_dir(models_dir, version))
+
+        from build_indexes import build_knn, build_svd_ann
+
+        knn_path = os.path.join(models_dir, 'knn_sparse.npz')
+        if not os.path.exists(knn_path):
+            build_knn(models_dir)
+        svd_path = os.path.join(models_dir, 'svd_ann.npz')
+        if not os.path.exists(svd_path):
+            build_svd_ann(models_dir)
+
+        content_features = sp.load_npz(os.path.join(models_dir, 'content_features.npz'))
+        idx_to_id = joblib.load(os.path.join(models_dir, 'index_to_movie_id.pkl'))
+        return cls(
+            knn_index=SparseItemKNN.load(knn_path),
+            svd_index=FactorIndex.load(svd_path),
+            content_index=ContentIndex(
+                content_features, [idx_to_id[i] for i in range(content_features.shape[0])]
+            ),
+            version=model_version(models_dir),
+            mf=load_mf(models_dir),
+        )
+
+    @classmethod
+    def from_bundle(cls, bundle_dir: str):
+        """Все массивы — read-only memmap, общие для воркеров через page cache."""
+        manifest, arrays = read_bundle(bundle_dir)
+        return cls(
+            knn_index=SparseItemKNN.from_arrays(arrays, manifest['knn_shape']),
+            svd_index=FactorIndex.from_arrays(arrays),
+            content_index=ContentIndex.from_arrays(arrays, manifest),
+            version=manifest['version'],
+            mf=MFModel.from_arrays(arrays, manifest),
+        )
+
+    # ── отдельные модели ──────────────────────────────────────────────
+    def knn(self, movie_id: int, n: int):
+        """Item-KNN: соседи из разреженного артефакта (top-K по косинусу)."""
+        return self.knn_index.neighbors(movie_id, n)
+
+    def svd(self, movie_id: int, n: int, nprobe: int = DEFAULT_NPROBE):
+        """
+        SVD: косинусная близость между qi-факторами.
+        nprobe — сколько IVF-кластеров смотреть (0 — точный поиск по всему каталогу).
+        """
+        return self.svd_index.similar(movie_id, n, nprobe=nprobe)
+
+    def content(self, movie_id: int, n: int):
+        """Контентные рекомендации по косинусному сходству (см. ContentIndex)."""
+        return self.content_index.similar(movie_id, n)
+
+    def for_user(self, user_id: int, n: int, seen_movie_ids=(), vector=None):
+        """
+        Персональные top-n по факторам SVD: весь каталог одним qi @ pu[u] + bi + bu[u],
+        без уже оценённых фильмов. vector — (p_u, b_u) из онлайн fold-in (models/fold_in.py)
+        вместо обученного. Пользователь вне модели и без vector → [].
+        """
+        if vector is not None:
+            return self.mf.top_n(vector[0], vector[1], n, exclude=seen_movie_ids)
+        return self.mf.recommend_for_user(user_id, n, exclude=seen_movie_ids)
+
+    # ── гибрид ────────────────────────────────────────────────────────
+    def hybrid(self, movie_id: int, n: int, rating_count: int, nprobe: int = DEFAULT_NPROBE):
+        """
+        Взвешенная смесь нормализованных KNN/content/SVD скоров.
+        KNN отключается, если у фильма меньше MIN_KNN_RATINGS оценок.
+        Возвращает [{"movieId", "score"}] по убыванию (без названий).
+        """
+        recs_knn     = self.knn(movie_id, n*2) if rating_count >= MIN_KNN_RATINGS else []
+        recs_content = self.content(movie_id, n*2)
+        recs_svd     = self.svd(movie_id, n*2, nprobe)
+
+        norm_knn     = normalize(recs_knn)
+        norm_content = normalize(recs_content)
+        norm_svd     = normalize(recs_svd)
+
+        combined = {}
+        for mid in set(norm_knn) | set(norm_content) | set(norm_svd):
+            combined[mid] = (norm_knn.get(mid, 0) * W_KNN +
+                             norm_content.get(mid, 0) * W_CONTENT +
+                             norm_svd.get(mid, 0) * W_SVD)
+
+        top = sorted(combined.items(), key=lambda x: -x[1])[:n]
+        return [{"movieId": mid, "score": sc} for mid, sc in top]
+
+    def recommend(self, alg: str, movie_id: int, n: int, rating_count: int = 0,
+                  nprobe: int = DEFAULT_NPROBE):
+        """Диспетчер по имени алгоритма (неизвестный → hybrid)."""
+        if alg == 'knn':
+            return self.knn(movie_id, n)
+        if alg == 'content':
+            return self.content(movie_id, n)
+        if alg == 'svd':
+            return self.svd(movie_id, n, nprobe)
+        return self.hybrid(movie_id, n, rating_count, nprobe)
@@ -0,0 +1,195 @@
+# server/models/registry.py
+#
+# Реестр моделей сервера: тяжёлые артефакты грузятся в фоновом потоке, чтобы импорт
+# app.py (и любые `flask db ...`) не ждал их загрузки. Пока Recommender не готов,
+# эндпоинты работают в деградированном режиме: заранее посчитанная таблица
+# (mmap, открывается мгновенно) или популярные фильмы из каталога.
+#
+# Перезагрузка (новый бандл из models/bundles/<version>) идёт тоже в фоне: запросы
+# продолжают обслуживаться старыми моделями, а по готовности активный набор
+# подменяется одним присваиванием ссылки — без пауз и блокировок на чтении.
+
+import os
+import time
+import logging
+import threading
+from collections import namedtuple
+
+from models.artifacts import current_bundle
+from models.precomputed import PrecomputedRecs
+from models.rec_cache import model_version
+from models.recommender import Recommender
+
+log = logging.getLogger(__name__)
+
+IDLE = 'idle'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+# Всё, что относится к одной версии моделей, — один неизменяемый объект
+ModelSet = namedtuple('ModelSet', ['recommender', 'precomputed', 'version'])
+EMPTY = ModelSet(None, None, None)
+
+
+def artifacts_version(models_dir: str) -> str:
+    """Версия моделей без их загрузки: текущий бандл или хэш файлов (как в Recommender.load)."""
+    return current_bundle(models_dir) or model_version(models_dir)
+
+
+class ModelRegistry:
+    def __init__(self, models_dir: str, precomputed_dir=None):
+        self.models_dir = models_dir
+        self.precomputed_dir = precomputed_dir or os.path.join(models_dir, 'precomputed')
+        self.active = EMPTY
+        self.loading = False
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self._started = False
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    # ── доступ к активному набору ────────────────────────────────────
+    # Читатели берут self.active один раз и дальше работают с ним: если посреди
+    # запроса произойдёт подмена, запрос доработает на старой версии целиком.
+    @property
+    def recommender(self):
+        return self.active.recommender
+
+    @property
+    def precomputed(self):
+        return self.active.precomputed
+
+    @property
+    def version(self):
+        return self.active.version
+
+    # ── загрузка ─────────────────────────────────────────────────────
+    def start(self):
+        """Запускает первую фоновую загрузку (повторные вызовы ничего не делают)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._spawn(None)
+
+    def reload(self, version=None) -> bool:
+        """
+        Фоновая загрузка version (по умолчанию — bundles/CURRENT) с подменой по готовности.
+        False — загрузка уже идёт, новая не запущена.
+        """
+        with self._lock:
+            if self.loading:
+                return False
+            self._started = True
+            self._spawn(version)
+        return True
+
+    def _spawn(self, version):
+        self.loading = True
+        threading.Thread(target=self._load, args=(version,), name='model-loader', daemon=True).start()
+
+    def _load(self, version):
+        started = time.monotonic()
+        try:
+            target = version or artifacts_version(self.models_dir)
+            self._last_attempt = target
+            if self.active.recommender is None:
+                # Первая загрузка: версия + mmap-таблица дешёвые — её хватает,
+                # чтобы сразу отвечать по известным фильмам, пока грузятся модели
+                self.active = ModelSet(None, self._open_precomputed(target), target)
+
+            recommender = Recommender.load(self.models_dir, version=version)
+            # Recommender.load мог дособрать недостающие индексы → версию берём у него
+            self.active = ModelSet(
+                recommender, self._open_precomputed(recommender.version), recommender.version
+            )
+            self.error = None
+            self.loaded_at = time.time()
+            log.info("Models %s loaded in %.1fs", recommender.version, time.monotonic() - started)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            log.exception("Model loading failed, keeping version %s", self.active.version)
+        finally:
+            self.load_seconds = round(time.monotonic() - started, 3)
+            self.loading = False
+            self._ready.set()
+
+    def _open_precomputed(self, version: str):
+        table = PrecomputedRecs.load(self.precomputed_dir)
+        if table is not None and table.meta.get('model_version') != version:
+            log.warning("Precomputed recommendations are stale, ignoring them")
+            return None
+        return table
+
+    # ── слежение за артефактами ──────────────────────────────────────
+    def watch(self, interval: float):
+        """
+        Фоновый опрос bundles/CURRENT (или файлов моделей, если бандлов нет) раз в interval
+        секунд; при смене версии — reload. Так новую версию подхватывают все воркеры gunicorn.
+        """
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    version = artifacts_version(self.models_dir)
+                except OSError:
+                    continue
+                # _last_attempt — чтобы не перезагружать по кругу битую версию
+                if version not in (self.version, self._last_attempt) and not self.loading:
+                    log.info("Model artifacts changed (%s → %s), reloading", self.version, version)
+                    self.reload()
+
+        threading.Thread(target=loop, name='model-watcher', daemon=True).start()
+
+    # ── состояние ────────────────────────────────────────────────────
+    @property
+    def ready(self) -> bool:
+        return self.active.recommender is not None
+
+    @property
+    def state(self) -> str:
+        if self.ready:
+            return READY
+        if self.loading:
+            return LOADING
+        return FAILED if self.error else IDLE
+
+    def wait(self, timeout=None) -> bool:
+        """Блокирует до окончания первой загрузки (для скриптов и тестов). True — модели готовы."""
+        self.start()
+        self._ready.wait(timeout)
+        return self.ready
+
+    def valid_ids(self):
+        """
+        IdMap movieId, известных моделям; None — пока не знаем (фильтр не применяем).
+        Строится один раз на ModelSet, а не на каждый запрос.
+        """
+        active = self.active
+        if active.recommender is not None:
+            return active.recommender.valid_id_map
+        if active.precomputed is not None:
+            return active.precomputed.ids
+        return None
+
+    def status(self) -> dict:
+        active = self.active
+        loaded = active.recommender is not None
+        return {
+            'state': self.state,
+            'version': active.version,
+            'loading': self.loading,
+            'load_seconds': self.load_seconds,
+            'loaded_at': self.loaded_at,
+            'error': self.error,
+            'models': {
+                'knn': loaded,
+                'svd': loaded,
+                'content': loaded,
+                'hybrid': loaded,
+                'precomputed': active.precomputed is not None,
+            },
+        }
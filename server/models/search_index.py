@@ -0,0 +1,233 @@
+# server/models/search_index.py
+#
+# Поиск фильмов по названию в памяти процесса вместо ILIKE '%q%' по всей таблице.
+# Названия (EN и UK) нормализуются в одну латинскую «свёртку»: нижний регистр, без
+# диакритики, кириллица транслитерируется, похожие написания склеиваются (y/i, kh/h,
+# удвоенные буквы) — так «Гаррі Поттер», «harry potter» и «hari poter» совпадают.
+# Индекс — триграммы в стиле pg_trgm: инвертированные списки в CSR-массивах,
+# оценка кандидатов — одним np.bincount по спискам триграмм запроса.
+# Изменения каталога (create/update/delete фильма) идут в небольшую дельту поверх
+# статических массивов; при её росте индекс пересобирается. Изменения из других
+# воркеров приходят через журнал каталога (models/catalog_log.py) → refresh.
+
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+from models.catalog import display_title
+from models.models import Movie
+
+REFRESH_CHUNK = 1000   # movie_id в одном IN (...)
+MIN_SCORE = 0.3        # доля триграмм запроса, найденных в названии
+MAX_CANDIDATES = 200   # сколько лучших по триграммам ранжировать точнее
+MAX_TIED = 5000        # до скольких кандидатов расширять отсечку при равенстве оценок
+REBUILD_AFTER = 5000   # названий в дельте до пересборки
+
+_TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e', 'є': 'ie',
+    'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i', 'к': 'k', 'л': 'l',
+    'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu',
+    'я': 'ia', 'ъ': '', 'ы': 'y', 'э': 'e', 'ё': 'e', "'": '', '’': '', 'ʼ': '', '`': '',
+})
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_REPEATS = re.compile(r'(.)\1+')
+
+
+def normalize(text) -> str:
+    """Название или запрос → свёртка для сравнения (латиница, цифры, одиночные пробелы)."""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_ALNUM.sub(' ', text.translate(_TRANSLIT)).strip()
+    # разные схемы транслитерации и английские написания сводятся к одной
+    text = text.replace('kh', 'h').replace('y', 'i').replace('w', 'v')
+    return _REPEATS.sub(r'\1', text)
+
+
+def trigrams(text: str, prefix: bool = False):
+    """
+    Триграммы слов с отступами, как в pg_trgm: '  ma', ' mat', ..., 'ix '.
+    prefix=True — у последнего слова нет хвостового отступа (запрос ещё набирается).
+    """
+    words = text.split()
+    out = []
+    for i, word in enumerate(words):
+        tail = '' if prefix and i == len(words) - 1 else ' '
+        padded = '  ' + word + tail
+        out.extend(padded[j:j + 3] for j in range(len(padded) - 2))
+    return list(dict.fromkeys(out))
+
+
+class TitleSearchIndex:
+    """
+    movie_id → названия (EN, UK). Каждое название — отдельный «документ» индекса;
+    фильм в выдаче один раз, с лучшей оценкой из своих названий.
+    """
+
+    def __init__(self, movies=()):
+        self._lock = threading.RLock()
+        self._build(list(movies))
+
+    @classmethod
+    def load(cls, session):
+        rows = session.query(Movie.movie_id, Movie.title_en, Movie.title_uk, Movie.popularity).all()
+        return cls((r.movie_id, r.title_en, r.title_uk, r.popularity) for r in rows)
+
+    # ── построение ────────────────────────────────────────────────────
+    def _build(self, movies):
+        """movies — [(movie_id, title_en, title_uk, popularity)]."""
+        self._titles = {}       # movie_id → отображаемое название
+        self._popularity = {}
+        docs = []
+        for movie_id, title_en, title_uk, popularity in movies:
+            self._remember(movie_id, title_en, title_uk, popularity)
+            docs.extend((movie_id, text) for text in self._texts(title_en, title_uk))
+        self._index(docs)
+
+    def _index(self, docs):
+        """docs — [(movie_id, свёртка названия)] → CSR «триграмма → документы», пустая дельта."""
+        self._doc_mid = np.asarray([mid for mid, _ in docs], dtype=np.int64)
+        self._doc_pop = np.asarray([self._popularity.get(mid, -np.inf) for mid, _ in docs], dtype=np.float64)
+        self._doc_text = [text for _, text in docs]
+        self._alive = np.ones(len(docs), dtype=bool)
+        self._docs_of = {}      # movie_id → [doc]
+        vocab, rows, postings = {}, [], []
+        for doc, (movie_id, text) in enumerate(docs):
+            self._docs_of.setdefault(movie_id, []).append(doc)
+            for tri in trigrams(text):
+                rows.append(vocab.setdefault(tri, len(vocab)))
+                postings.append(doc)
+        rows = np.asarray(rows, dtype=np.int64)
+        self._vocab = vocab
+        self._indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(vocab)))])
+        self._postings = np.asarray(postings, dtype=np.int32)[np.argsort(rows, kind='stable')]
+        self._delta = {}        # триграмма → [doc] для названий, добавленных после сборки
+        self._delta_docs = 0
+
+    def _remember(self, movie_id, title_en, title_uk, popularity):
+        self._titles[movie_id] = display_title(title_uk, title_en)
+        self._popularity[movie_id] = popularity if popularity is not None else float('-inf')
+
+    @staticmethod
+    def _texts(title_en, title_uk):
+        return list(dict.fromkeys(t for t in (normalize(title_en), normalize(title_uk)) if t))
+
+    def __len__(self):
+        return len(self._titles)
+
+    # ── инкрементальные обновления ────────────────────────────────────
+    def upsert(self, movie):
+        """Добавляет или обновляет фильм по ORM-объекту Movie."""
+        with self._lock:
+            self._drop_docs(movie.movie_id)
+            self._remember(movie.movie_id, movie.title_en, movie.title_uk, movie.popularity)
+            texts = self._texts(movie.title_en, movie.title_uk)
+            start = len(self._doc_text)
+            self._docs_of[movie.movie_id] = list(range(start, start + len(texts)))
+            self._doc_mid = np.append(self._doc_mid, [movie.movie_id] * len(texts))
+            self._doc_pop = np.append(self._doc_pop, [self._popularity[movie.movie_id]] * len(texts))
+            self._alive = np.append(self._alive, np.ones(len(texts), dtype=bool))
+            for doc, text in enumerate(texts, start):
+                self._doc_text.append(text)
+                for tri in trigrams(text):
+                    self._delta.setdefault(tri, []).append(doc)
+            self._delta_docs += len(texts)
+            if self._delta_docs > REBUILD_AFTER:
+                live = np.flatnonzero(self._alive)
+                self._index([(int(self._doc_mid[d]), self._doc_text[d]) for d in live])
+
+    def refresh(self, session, movie_ids):
+        """Перечитывает названия фильмов movie_ids из БД: есть — upsert, удалён — remove."""
+        movie_ids = [int(mid) for mid in movie_ids]
+        found = set()
+        for start in range(0, len(movie_ids), REFRESH_CHUNK):
+            chunk = movie_ids[start:start + REFRESH_CHUNK]
+            rows = (
+                session.query(Movie.movie_id, Movie.title_en, Movie.title_uk, Movie.popularity)
+                .filter(Movie.movie_id.in_(chunk)).all()
+            )
+            for row in rows:
+                self.upsert(row)
+                found.add(row.movie_id)
+        for movie_id in movie_ids:
+            if movie_id not in found:
+                self.remove(movie_id)
+
+    def remove(self, movie_id):
+        with self._lock:
+            self._drop_docs(movie_id)
+            self._titles.pop(movie_id, None)
+            self._popularity.pop(movie_id, None)
+
+    def _drop_docs(self, movie_id):
+        for doc in self._docs_of.pop(movie_id, ()):
+            self._alive[doc] = False
+
+    # ── поиск ─────────────────────────────────────────────────────────
+    def search(self, query: str, n: int = 10, valid_ids=None):
+        """
+        [{"movieId", "title"}] по убыванию релевантности: точное совпадение, начало
+        названия, начало слова, подстрока, затем доля общих триграмм; при равенстве —
+        популярность. valid_ids — IdMap допустимых фильмов (None — без фильтра).
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        grams = trigrams(q, prefix=True)
+        with self._lock:
+            lists = []
+            for tri in grams:
+                row = self._vocab.get(tri)
+                if row is not None:
+                    lists.append(self._postings[self._indptr[row]:self._indptr[row + 1]])
+                if tri in self._delta:
+                    lists.append(np.asarray(self._delta[tri], dtype=np.int32))
+            if not lists:
+                return []
+            hits = np.bincount(np.concatenate(lists), minlength=len(self._alive))
+            scores = np.where(self._alive, hits / len(grams), 0.0)
+            candidates = np.flatnonzero(scores >= MIN_SCORE)
+            # valid_ids — до отсечки: иначе её могут занять фильмы, которые всё равно отбросим
+            if valid_ids is not None:
+                candidates = candidates[valid_ids.to_inner_many(self._doc_mid[candidates]) >= 0]
+            if len(candidates) > MAX_CANDIDATES:
+                candidates = self._truncate(candidates, scores)
+
+            best = {}
+            for doc in candidates:
+                movie_id = int(self._doc_mid[doc])
+                key = (self._match_rank(self._doc_text[doc], q), -float(scores[doc]),
+                       -self._popularity.get(movie_id, float('-inf')))
+                if movie_id not in best or key < best[movie_id]:
+                    best[movie_id] = key
+            ranked = sorted(best, key=lambda mid: best[mid] + (self._titles[mid],))
+            return [{'movieId': mid, 'title': self._titles[mid]} for mid in ranked[:n]]
+
+    def _truncate(self, candidates, scores):
+        """
+        MAX_CANDIDATES лучших по триграммам, но вместе со всеми, кто делит оценку
+        последнего из них: у коротких запросов таких сотни, и точное совпадение
+        не должно выпадать из-за порядка документов. Если равных больше MAX_TIED —
+        среди них берутся самые популярные.
+        """
+        cand_scores = scores[candidates]
+        threshold = np.partition(cand_scores, len(cand_scores) - MAX_CANDIDATES)[len(cand_scores) - MAX_CANDIDATES]
+        candidates = candidates[cand_scores >= threshold]
+        if len(candidates) > MAX_TIED:
+            order = np.lexsort((-self._doc_pop[candidates], -scores[candidates]))
+            candidates = candidates[order[:MAX_TIED]]
+        return candidates
+
+    @staticmethod
+    def _match_rank(text: str, q: str) -> int:
+        if text == q:
+            return 0
+        if text.startswith(q):
+            return 1
+        if (' ' + text).find(' ' + q) >= 0:
+            return 2
+        return 3 if q in text else 4
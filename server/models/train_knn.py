@@ -1,10 +1,15 @@
 # server/models/train_knn.py
+#
+# Запуск из server/: python -m models.train_knn [tune --grid k=20,40,60]
 
 import os
-import pandas as pd
+import argparse
 from surprise import Dataset, Reader, KNNWithMeans, accuracy
 import joblib
 
+from models.data_loader import load_ratings
+from models.tuning import add_tune_arguments, run_tune
+
 def train_knn_model(
     ratings_path="data/ml-latest/ratings.csv",
     model_path="models/knn_model.pkl",
@@ -13,7 +18,7 @@ def train_knn_model(
     user_based=False
 ):
     print(f"Loading ratings from {ratings_path}...")
-    df = pd.read_csv(ratings_path)
+    df = load_ratings(ratings_path)
 
     reader = Reader(rating_scale=(df.rating.min(), df.rating.max()))
     data = Dataset.load_from_df(df[['userId','movieId','rating']], reader)
@@ -35,4 +40,15 @@ def train_knn_model(
     print(f"KNN model saved to {model_path}")
 
 if __name__ == "__main__":
-    train_knn_model()
+    parser = argparse.ArgumentParser(description="Обучение KNNWithMeans (Surprise)")
+    parser.add_argument("--ratings", default="data/ml-latest/ratings.csv")
+    commands = parser.add_subparsers(dest="command")
+    add_tune_arguments(commands.add_parser(
+        "tune", help="перебор сетки параметров: held-out RMSE/MAE и время (models/tuning.py)"
+    ))
+    args = parser.parse_args()
+
+    if args.command == "tune":
+        run_tune(args, "knn", args.ratings)
+    else:
+        train_knn_model(args.ratings)
@@ -1,10 +1,17 @@
 # server/models/train_svd.py
+#
+# Запуск из server/: python -m models.train_svd [--als]
+# Подбор гиперпараметров на отложенной выборке: python -m models.train_svd [--als] tune --grid ...
 
 import os
-import pandas as pd
+import argparse
 from surprise import Dataset, Reader, SVD, accuracy
 import joblib
 
+from models.mf import train_als, FACTORS_FILE
+from models.data_loader import load_ratings
+from models.tuning import add_tune_arguments, run_tune
+
 def train_svd_model(
     ratings_path="data/ml-latest/ratings.csv",
     model_path="models/svd_model.pkl",
@@ -14,7 +21,7 @@ def train_svd_model(
     reg_all=0.02
 ):
     print(f"Loading ratings from {ratings_path}...")
-    df = pd.read_csv(ratings_path)
+    df = load_ratings(ratings_path)
 
     reader = Reader(rating_scale=(df.rating.min(), df.rating.max()))
     data = Dataset.load_from_df(df[['userId','movieId','rating']], reader)
@@ -39,5 +46,39 @@ def train_svd_model(
     joblib.dump(algo, model_path)
     print(f"SVD model saved to {model_path}")
 
+def train_als_model(
+    ratings_path="data/ml-latest/ratings.csv",
+    model_path=os.path.join("models", FACTORS_FILE),
+    n_factors=50,
+    n_iters=15,
+    reg=0.05,
+    n_jobs=None
+):
+    """То же без Surprise: CSR + ALS из models/mf.py → svd_factors.npz."""
+    print(f"Loading ratings from {ratings_path}...")
+    df = load_ratings(ratings_path)
+
+    print("Training ALS...")
+    model = train_als(df, n_factors=n_factors, n_iters=n_iters, reg=reg, n_jobs=n_jobs)
+
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    model.save(model_path)
+    print(f"ALS factors saved to {model_path}")
+
 if __name__ == "__main__":
-    train_svd_model()
+    parser = argparse.ArgumentParser(description="Обучение SVD (Surprise) или ALS (models/mf.py)")
+    parser.add_argument("--als", action="store_true", help="обучить ALS вместо Surprise SVD")
+    parser.add_argument("--ratings", default="data/ml-latest/ratings.csv")
+    parser.add_argument("--jobs", type=int, default=None, help="потоков для ALS")
+    commands = parser.add_subparsers(dest="command")
+    add_tune_arguments(commands.add_parser(
+        "tune", help="перебор сетки параметров: held-out RMSE/MAE и время (models/tuning.py)"
+    ))
+    args = parser.parse_args()
+
+    if args.command == "tune":
+        run_tune(args, "als" if args.als else "svd", args.ratings)
+    elif args.als:
+        train_als_model(args.ratings, n_jobs=args.jobs)
+    else:
+        train_svd_model(args.ratings)
@@ -0,0 +1,229 @@
+# server/models/tuning.py
+#
+# Подбор гиперпараметров SVD / ALS / KNN по отложенной выборке вместо оценки на trainset.
+# Разбиение — train_test_split_df (models/splitter.py) или k-fold; каждая пара
+# (конфигурация, фолд) — отдельная задача в пуле процессов. Оценки кладутся в
+# shared memory один раз: воркеры видят те же страницы (userId/movieId/rating и номер
+# фолда каждой строки), а не получают копию DataFrame через pickle на каждую задачу.
+#
+#   python -m models.train_svd tune --grid n_factors=50,100 reg_all=0.02,0.05
+#   python -m models.train_svd --als tune --folds 5
+#   python -m models.train_knn tune --grid k=20,40,60
+
+import os
+import time
+import itertools
+from datetime import datetime
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+
+from models.splitter import train_test_split_df
+
+# сетки по умолчанию — вокруг значений, зашитых в тренерах
+DEFAULT_GRIDS = {
+    'svd': {'n_factors': [50, 100], 'n_epochs': [20], 'lr_all': [0.005], 'reg_all': [0.02, 0.05]},
+    'als': {'n_factors': [50, 100], 'n_iters': [15], 'reg': [0.02, 0.05]},
+    'knn': {'k': [20, 40, 60], 'sim_name': ['cosine'], 'user_based': [False]},
+}
+COLUMNS = ('userId', 'movieId', 'rating')
+
+_shared = None   # воркер: {имя колонки: массив поверх shared memory} + fold
+
+
+# ── модели: fit на train, прогноз для test ─────────────────────────────
+def _surprise_trainset(train):
+    from surprise import Dataset, Reader
+    reader = Reader(rating_scale=(float(train.rating.min()), float(train.rating.max())))
+    return Dataset.load_from_df(train[list(COLUMNS)], reader).build_full_trainset()
+
+
+def _predict_surprise(algo, test):
+    return np.fromiter(
+        (algo.predict(u, i).est for u, i in zip(test.userId.to_numpy(), test.movieId.to_numpy())),
+        dtype=np.float32, count=len(test),
+    )
+
+
+def _fit_predict_svd(train, test, params):
+    from surprise import SVD
+    algo = SVD(**params)
+    algo.fit(_surprise_trainset(train))
+    return _predict_surprise(algo, test)
+
+
+def _fit_predict_als(train, test, params):
+    from models.mf import train_als
+    # параллелизм — по задачам пула, внутри задачи ALS в один поток
+    mf = train_als(train, n_jobs=1, verbose=False, **params)
+    return mf.predict_many(test.userId.to_numpy(), test.movieId.to_numpy())
+
+
+def _fit_predict_knn(train, test, params):
+    from surprise import KNNWithMeans
+    params = dict(params)
+    sim_options = {'name': params.pop('sim_name', 'cosine'), 'user_based': params.pop('user_based', False)}
+    algo = KNNWithMeans(sim_options=sim_options, verbose=False, **params)
+    algo.fit(_surprise_trainset(train))
+    return _predict_surprise(algo, test)
+
+
+ESTIMATORS = {'svd': _fit_predict_svd, 'als': _fit_predict_als, 'knn': _fit_predict_knn}
+
+
+# ── shared memory ─────────────────────────────────────────────────────
+def _share(arrays: dict):
+    """{имя: массив} → (блоки SharedMemory, описание для воркеров)."""
+    blocks, spec = [], {}
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+        blocks.append(shm)
+        spec[name] = (shm.name, values.dtype.str, values.shape)
+    return blocks, spec
+
+
+def _init_worker(spec):
+    global _shared
+    _shared = {'_blocks': []}
+    for name, (shm_name, dtype, shape) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared['_blocks'].append(shm)   # держим ссылку, иначе буфер закроется
+        _shared[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _run_job(job):
+    estimator, params, fold = job
+    test_mask = _shared['fold'] == fold
+    df = pd.DataFrame({c: _shared[c] for c in COLUMNS}, copy=False)
+    train, test = df[~test_mask], df[test_mask]
+
+    started = time.perf_counter()
+    est = np.asarray(ESTIMATORS[estimator](train, test, params), dtype=np.float64)
+    seconds = time.perf_counter() - started
+    err = est - test.rating.to_numpy(dtype=np.float64)
+    return {
+        'params': params, 'fold': fold, 'seconds': seconds,
+        'rmse': float(np.sqrt(np.mean(err ** 2))), 'mae': float(np.mean(np.abs(err))),
+    }
+
+
+# ── разбиение и сетка ─────────────────────────────────────────────────
+def assign_folds(df, folds: int = 1, test_size: float = 0.2, random_state: int = 42):
+    """
+    Номер тестового фолда для каждой строки (int8). folds=1 — одна отложенная выборка
+    train_test_split_df: test → 0, train → -1; folds > 1 — KFold с перемешиванием.
+    """
+    fold = np.full(len(df), -1, dtype=np.int8)
+    positions = pd.DataFrame({'pos': np.arange(len(df))})
+    if folds <= 1:
+        _, test = train_test_split_df(positions, test_size=test_size, random_state=random_state)
+        fold[test['pos'].to_numpy()] = 0
+        return fold, 1
+    for f, (_, test_idx) in enumerate(KFold(folds, shuffle=True, random_state=random_state).split(positions)):
+        fold[test_idx] = f
+    return fold, folds
+
+
+def _parse_value(text: str):
+    lowered = text.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(items, estimator: str):
+    """['n_factors=50,100', 'reg_all=0.02'] поверх сетки по умолчанию → {параметр: [значения]}."""
+    grid = {name: list(values) for name, values in DEFAULT_GRIDS[estimator].items()}
+    for item in items or ():
+        name, _, values = item.partition('=')
+        if not values:
+            raise ValueError(f"bad grid item {item!r}, expected name=v1,v2")
+        grid[name.strip()] = [_parse_value(v.strip()) for v in values.split(',')]
+    return grid
+
+
+def expand_grid(grid: dict):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def summarize(results):
+    """Результаты по фолдам → DataFrame по конфигурациям (среднее и разброс), лучшие сверху."""
+    rows = pd.DataFrame([{**r['params'], **{k: r[k] for k in ('fold', 'rmse', 'mae', 'seconds')}} for r in results])
+    keys = [c for c in rows.columns if c not in ('fold', 'rmse', 'mae', 'seconds')]
+    table = rows.groupby(keys, dropna=False, sort=False).agg(
+        rmse=('rmse', 'mean'), rmse_std=('rmse', 'std'), mae=('mae', 'mean'), seconds=('seconds', 'mean'),
+    ).reset_index()
+    return table.sort_values('rmse', kind='stable').reset_index(drop=True)
+
+
+def tune(df, estimator: str, grid: dict, folds: int = 1, test_size: float = 0.2,
+         workers=None, random_state: int = 42):
+    """
+    Перебор сетки: (конфигурация × фолд) → пул процессов. df — userId, movieId, rating.
+    Возвращает таблицу summarize: held-out RMSE/MAE и время обучения на конфигурацию.
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"unknown estimator {estimator!r}, expected one of {sorted(ESTIMATORS)}")
+    configs = expand_grid(grid)
+    fold, n_folds = assign_folds(df, folds, test_size, random_state)
+    jobs = [(estimator, params, f) for params in configs for f in range(n_folds)]
+    workers = min(workers or os.cpu_count(), len(jobs))
+    print(f"[{datetime.now()}] Tuning {estimator}: {len(configs)} configs × {n_folds} folds, "
+          f"{len(df)} ratings, {workers} workers")
+
+    blocks, spec = _share({
+        'userId': df['userId'].to_numpy(dtype=np.int32),
+        'movieId': df['movieId'].to_numpy(dtype=np.int32),
+        'rating': df['rating'].to_numpy(dtype=np.float32),
+        'fold': fold,
+    })
+    results = []
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec,)) as pool:
+            for i, r in enumerate(pool.map(_run_job, jobs), 1):
+                results.append(r)
+                print(f"[{datetime.now()}]   {i}/{len(jobs)} {r['params']} fold {r['fold']}: "
+                      f"RMSE {r['rmse']:.4f}, MAE {r['mae']:.4f} ({r['seconds']:.1f}s)")
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    table = summarize(results)
+    print(f"[{datetime.now()}] Done in {time.perf_counter() - started:.1f}s")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    return table
+
+
+def add_tune_arguments(parser):
+    """Аргументы подкоманды tune — общие для train_svd.py и train_knn.py."""
+    parser.add_argument("--grid", nargs="*", default=None, metavar="NAME=V1,V2",
+                        help="значения параметров поверх сетки по умолчанию")
+    parser.add_argument("--folds", type=int, default=1,
+                        help="1 — отложенная выборка train_test_split_df, >1 — k-fold")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=None, help="процессов (по умолчанию — все ядра)")
+    parser.add_argument("--out", default=None, help="сохранить таблицу результатов в CSV")
+
+
+def run_tune(args, estimator: str, ratings_path: str):
+    from models.data_loader import load_ratings
+    df = load_ratings(ratings_path)
+    table = tune(df, estimator, parse_grid(args.grid, estimator), folds=args.folds,
+                 test_size=args.test_size, workers=args.workers)
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"Results saved to {args.out}")
+    return table
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# precompute_recommendations.py
+#
+# Офлайн-расчёт top-N item-to-item рекомендаций для каждого фильма из VALID_IDS
+# по всем алгоритмам (knn, svd, content, hybrid). Рекомендации по фильму не зависят
+# от пользователя, поэтому сервер может отдавать их из готовой таблицы.
+# Запускать после train_ml_latest_small.py / build_indexes.py.
+#
+# Таблица должна совпадать с живым путём /api/recommend/movie: гибрид включает KNN по
+# Movie.rating_count из БД (как каталог сервера) — берём его снимок, а svd/hybrid
+# считаются с тем же nprobe, что сервер использует по умолчанию (--nprobe).
+
+import os
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from models.ann_index import DEFAULT_NPROBE
+from models.hybrid_engine import MIN_KNN_RATINGS
+from models.recommender import Recommender, ALGORITHMS
+from models.precomputed import save_table
+
+# ── ПУТИ ─────────────────────────────────────────────────────────────
+BASE_DIR   = os.path.dirname(__file__)
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+OUT_DIR    = os.path.join(MODELS_DIR, "precomputed")
+
+TOP_N = 50
+CHUNK_SIZE = 500
+
+_recommender = None
+_rating_counts = None
+
+
+def load_rating_counts(db_uri: str) -> dict:
+    """Снимок Movie.rating_count — источник, по которому гибрид сервера включает KNN."""
+    engine = create_engine(db_uri)
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT movie_id, rating_count FROM movies")).all()
+    finally:
+        engine.dispose()
+    return {int(mid): int(count or 0) for mid, count in rows}
+
+
+def _init_worker(models_dir, rating_counts):
+    global _recommender, _rating_counts
+    _recommender = Recommender.load(models_dir)
+    _rating_counts = rating_counts
+
+
+def _compute_chunk(args):
+    """Считает строки таблицы для куска movieId во воркере."""
+    movie_ids, top_n, nprobe = args
+    rec = _recommender
+    counts = _rating_counts
+    out = {}
+    for alg in ALGORITHMS:
+        ids = np.full((len(movie_ids), top_n), -1, dtype=np.int32)
+        scores = np.zeros((len(movie_ids), top_n), dtype=np.float32)
+        for row, mid in enumerate(movie_ids):
+            recs = rec.recommend(alg, int(mid), top_n, rating_count=counts.get(int(mid), 0), nprobe=nprobe)
+            recs = [r for r in recs if r['movieId'] != mid][:top_n]
+            ids[row, :len(recs)] = [r['movieId'] for r in recs]
+            scores[row, :len(recs)] = [r['score'] for r in recs]
+        out[alg] = (ids, scores)
+    return out
+
+
+def precompute(models_dir: str = MODELS_DIR, out_dir: str = OUT_DIR,
+               top_n: int = TOP_N, workers=None, chunk_size: int = CHUNK_SIZE,
+               rating_counts=None, nprobe: int = DEFAULT_NPROBE):
+    """rating_counts — {movieId: Movie.rating_count} (load_rating_counts), nprobe — как у сервера."""
+    rating_counts = rating_counts or {}
+    rec = Recommender.load(models_dir)
+    version = rec.version  # та же версия, что у сервера (бандл или хэш артефактов)
+    movie_ids = np.array(sorted(rec.valid_ids), dtype=np.int32)
+    del rec
+    print(f"[{datetime.now()}] Precomputing top-{top_n} for {len(movie_ids)} movies "
+          f"(models {version}, {workers or os.cpu_count()} workers)…")
+
+    chunks = [movie_ids[i:i + chunk_size] for i in range(0, len(movie_ids), chunk_size)]
+    parts = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(models_dir, rating_counts)) as pool:
+        # map сохраняет порядок кусков — строки таблицы идут в порядке movie_ids
+        for i, part in enumerate(pool.map(_compute_chunk, [(c, top_n, nprobe) for c in chunks]), 1):
+            parts.append(part)
+            print(f"[{datetime.now()}]   {i}/{len(chunks)} chunks done")
+
+    results = {
+        alg: (
+            np.concatenate([p[alg][0] for p in parts]),
+            np.concatenate([p[alg][1] for p in parts]),
+        )
+        for alg in ALGORITHMS
+    }
+    hybrid_knn = np.array([rating_counts.get(int(mid), 0) >= MIN_KNN_RATINGS for mid in movie_ids])
+    save_table(out_dir, movie_ids, results, {
+        'model_version': version,
+        'top_n': top_n,
+        'nprobe': nprobe,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+    }, hybrid_knn=hybrid_knn)
+    print(f"[{datetime.now()}] ✔ precomputed recommendations saved to {out_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Офлайн-расчёт top-N рекомендаций по всем фильмам")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--out-dir", default=None, help="по умолчанию <models-dir>/precomputed")
+    parser.add_argument("--top-n", type=int, default=TOP_N)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE,
+                        help="nprobe для svd/hybrid (0 — точный поиск); запросы с другим ?nprobe идут мимо таблицы")
+    parser.add_argument("--db-uri", default=None, help="БД для снимка Movie.rating_count (по умолчанию из config.py)")
+    args = parser.parse_args()
+
+    if args.db_uri is None:
+        from config import Config
+        args.db_uri = Config.SQLALCHEMY_DATABASE_URI
+
+    precompute(
+        args.models_dir,
+        args.out_dir or os.path.join(args.models_dir, "precomputed"),
+        top_n=args.top_n, workers=args.workers, chunk_size=args.chunk_size,
+        rating_counts=load_rating_counts(args.db_uri), nprobe=args.nprobe,
+    )
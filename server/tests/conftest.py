@@ -0,0 +1,9 @@
+# server/tests/conftest.py
+#
+# Тесты запускаются из server/: python -m pytest -q tests
+# Модули сервера импортируются как в приложении (from models.… import …).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
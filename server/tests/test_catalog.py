@@ -0,0 +1,70 @@
+# server/tests/test_catalog.py
+
+import pytest
+from flask import Flask
+
+from extensions import db
+from models.catalog import MovieCatalog
+from models.catalog_log import CatalogLog, LogTail
+from models.models import Movie, Genre, Rating, User
+from models.rating_log import RatingLog
+
+
+@pytest.fixture
+def session():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        drama = Genre(name_en='Drama', name_uk='Драма')
+        db.session.add_all([
+            User(id=1, name='u', email='u@example.com', password='x'),
+            Movie(movie_id=1, title_en='Alien', popularity=5.0, genres=[drama]),
+            Movie(movie_id=2, title_en='Heat', popularity=9.0),
+        ])
+        db.session.commit()
+        yield db.session
+        db.session.remove()
+
+
+def test_catalog_catches_up_with_other_workers(session, tmp_path):
+    catalog_log = CatalogLog(str(tmp_path / 'catalog_events.bin'))
+    rating_log = RatingLog(str(tmp_path / 'rating_events.bin'))
+    tail = LogTail(catalog_log, rating_log)
+    catalog = MovieCatalog.load(session)
+    assert not tail.pending()
+
+    # другой воркер: переименовал фильм 1, добавил 3, удалил 2, оценил 1
+    session.get(Movie, 1).title_uk = 'Чужий'
+    session.add(Movie(movie_id=3, title_en='Ran', popularity=20.0))
+    session.delete(session.get(Movie, 2))
+    session.add(Rating(user_id=1, movie_id=1, rating=4.0))
+    session.commit()
+    for mid in (1, 3, 2):
+        catalog_log.append(mid)
+    rating_log.append(1, 1, 4.0)
+
+    assert tail.pending()
+    changed = tail.advance()
+    assert changed.tolist() == [1, 2, 3]
+    catalog.refresh(session, changed)
+    assert not tail.pending()
+
+    assert catalog.get(1)['title'] == 'Чужий'
+    assert catalog.get(1)['genres'] == 'Драма'
+    assert catalog.rating_count(1) == 1
+    assert 2 not in catalog
+    assert [m['movieId'] for m in catalog.top_popular(5)] == [3, 1]
+
+
+def test_log_tail_reports_recreated_log(tmp_path):
+    log = CatalogLog(str(tmp_path / 'catalog_events.bin'))
+    log.append(1)
+    log.append(2)
+    tail = LogTail(log)
+    (tmp_path / 'catalog_events.bin').unlink()
+    log.append(3)
+    assert tail.pending()
+    assert tail.advance() is None
+    assert not tail.pending()
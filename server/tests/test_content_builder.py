@@ -0,0 +1,49 @@
+# server/tests/test_content_builder.py
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+
+from models.content_builder import build_content_features, HASH_FEATURES
+
+MOVIES = pd.DataFrame({
+    'movieId': [1, 2, 3, 4, 5],
+    'title': ['Alien (1979)', 'Heat (1995)', 'Up (2009)', 'Her (2013)', 'Fargo (1996)'],
+    'genres': ['Horror|Sci-Fi', 'Action|Crime', 'Animation', 'Drama|Romance', 'Crime|Drama'],
+})
+TAGS = pd.DataFrame({
+    'userId': [1] * 12,
+    'movieId': [1, 1, 1, 2, 2, 3, 3, 3, 5, 5, 5, 1],
+    'tag': ['space horror', 'dark', 'Space', 'heist', 'crime drama', 'pixar', 'balloons',
+            'sad', 'crime', 'dark comedy', 'snow', 'classic sci-fi'],
+    'timestamp': [0] * 12,
+})
+
+
+def _reference(max_features):
+    """Старый путь train_ml_latest_small.py: теги фильма склеиваются в строку → TfidfVectorizer."""
+    docs = (TAGS.groupby('movieId')['tag'].agg(lambda tags: ' '.join(tags.astype(str)))
+            .reindex(MOVIES['movieId'], fill_value='').values)
+    tfidf = TfidfVectorizer(max_features=max_features)
+    return tfidf.fit_transform(docs).toarray(), tfidf.get_feature_names_out()
+
+
+@pytest.mark.parametrize('max_features', [2000, 3])   # 3: space, dark, crime — без ничьих на границе
+def test_streamed_tfidf_matches_tfidf_vectorizer(tmp_path, max_features):
+    MOVIES.to_csv(os.path.join(tmp_path, 'movies.csv'), index=False)
+    TAGS.to_csv(os.path.join(tmp_path, 'tags.csv'), index=False)
+    features, movie_ids, timer = build_content_features(
+        str(tmp_path), max_tag_features=max_features, chunk_size=5)
+    expected, terms = _reference(max_features)
+
+    assert movie_ids.tolist() == MOVIES['movieId'].tolist()
+    tags = features.toarray()[:, -expected.shape[1]:]
+    # столбцы потокового TF-IDF — хэш-корзины по возрастанию, у TfidfVectorizer — словарь
+    buckets = HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False, norm=None) \
+        .transform(terms).indices
+    assert len(np.unique(buckets)) == len(terms)           # без коллизий на фикстуре
+    assert np.allclose(tags, expected[:, np.argsort(buckets)], atol=1e-6)
+    assert [name for name, *_ in timer.stages][-2:] == ['tf-idf', 'hstack']
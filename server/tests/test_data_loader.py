@@ -0,0 +1,51 @@
+# server/tests/test_data_loader.py
+
+import os
+
+import numpy as np
+
+from models.data_loader import load_ratings, read_table, _cache_path
+
+
+def _write_ratings(path, rows):
+    with open(path, 'w') as f:
+        f.write('userId,movieId,rating,timestamp\n')
+        for user, movie, rating in rows:
+            f.write(f'{user},{movie},{rating},0\n')
+
+
+def test_cached_columns_are_writable_and_cache_stays_intact(tmp_path):
+    path = str(tmp_path / 'ratings.csv')
+    _write_ratings(path, [(1, 10, 4.0), (1, 20, 3.5), (2, 10, 5.0)])
+    load_ratings(path)                      # первый вызов собирает кэш
+
+    df = load_ratings(path)
+    assert df['rating'].dtype == np.float32
+    df.loc[0, 'rating'] = 1.0               # как после pd.read_csv — без "read-only"
+    df['rating'] *= 2
+    assert df['rating'].tolist() == [2.0, 7.0, 10.0]
+    # изменения — только в памяти процесса
+    assert load_ratings(path)['rating'].tolist() == [4.0, 3.5, 5.0]
+
+
+def test_changed_csv_rebuilds_into_new_dir_and_drops_old_one(tmp_path):
+    path = str(tmp_path / 'ratings.csv')
+    _write_ratings(path, [(1, 10, 4.0)])
+    load_ratings(path)
+    cache = _cache_path(path, None)
+    first = set(os.listdir(cache)) - {'meta.json'}
+
+    _write_ratings(path, [(1, 10, 4.0), (3, 30, 2.0)])
+    assert load_ratings(path)['movieId'].tolist() == [10, 30]
+    second = set(os.listdir(cache)) - {'meta.json'}
+    assert len(second) == 1 and not (first & second)
+
+
+def test_string_columns_roundtrip(tmp_path):
+    path = str(tmp_path / 'movies.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('movieId,title,genres\n1,Alien,Horror\n2,"Heat, The",\n')
+    df = read_table(path)
+    df = read_table(path)
+    assert df['title'].tolist() == ['Alien', 'Heat, The']
+    assert df['genres'].isna().tolist() == [False, True]
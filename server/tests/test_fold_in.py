@@ -0,0 +1,34 @@
+# server/tests/test_fold_in.py
+
+import os
+
+import numpy as np
+
+from models.fold_in import UserFactorStore, STORE_FILE, STATE_DIR
+from models.rec_cache import model_version
+
+
+def test_saving_user_factors_keeps_model_version(tmp_path):
+    models_dir = str(tmp_path)
+    np.savez(os.path.join(models_dir, 'knn_sparse.npz'), data=np.arange(3))
+    before = model_version(models_dir)
+
+    store = UserFactorStore(os.path.join(models_dir, STATE_DIR, STORE_FILE))
+    store.put(1, 'v1', np.ones(4, dtype=np.float32), 0.5, (3.0, 100.0))
+    store.save()
+
+    assert os.path.exists(os.path.join(models_dir, STATE_DIR, STORE_FILE))
+    assert model_version(models_dir) == before
+
+
+def test_user_factors_roundtrip(tmp_path):
+    path = os.path.join(str(tmp_path), STATE_DIR, STORE_FILE)
+    store = UserFactorStore(path)
+    store.put(7, 'v1', np.arange(4, dtype=np.float32), 1.5, (2.0, 10.0))
+    store.save()
+
+    loaded = UserFactorStore(path).load()
+    p, b, stamp = loaded.get(7, 'v1')
+    assert np.allclose(p, np.arange(4))
+    assert b == 1.5 and stamp == (2.0, 10.0)
+    assert loaded.get(7, 'v2') is None
@@ -0,0 +1,52 @@
+# server/tests/test_hybrid_engine.py
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from models.ann_index import FactorIndex
+from models.content_index import ContentIndex
+from models.knn_index import SparseItemKNN, prune_dense_sim
+from models.recommender import Recommender, normalize, W_KNN, W_CONTENT, W_SVD
+
+
+@pytest.fixture(scope='module')
+def recommender():
+    rng = np.random.default_rng(0)
+    ids = rng.permutation(np.arange(100, 160)).astype(np.int32)   # 60 фильмов, не по порядку
+    sim = rng.uniform(-0.2, 1.0, (50, 50)).astype(np.float32)
+    knn = SparseItemKNN(prune_dense_sim((sim + sim.T) / 2, k=12), ids[:50])
+    svd = FactorIndex.build(rng.normal(0, 1, (55, 6)).astype(np.float32), ids[5:], n_lists=8)
+    # положительные признаки: все косинусы > 0, и ContentIndex.similar не отбрасывает кандидатов
+    content = ContentIndex(sp.csr_matrix(rng.random((52, 10)).astype(np.float32)), ids[:52])
+    return Recommender(knn, svd, content, version='test')
+
+
+def _per_seed(rec, seeds, per_seed, rating_counts, nprobe):
+    """Прежний путь recommend_by_list: гибрид по каждому фильму отдельно, скоры суммируются."""
+    total = {}
+    for mid in seeds:
+        knn = rec.knn(mid, per_seed) if rating_counts.get(mid, 0) >= 5 else []
+        parts = ((normalize(knn), W_KNN), (normalize(rec.content(mid, per_seed)), W_CONTENT),
+                 (normalize(rec.svd(mid, per_seed, nprobe)), W_SVD))
+        for scores, weight in parts:
+            for cand, score in scores.items():
+                total[cand] = total.get(cand, 0.0) + weight * score
+    return {mid: score for mid, score in total.items() if mid not in seeds}
+
+
+@pytest.mark.parametrize('nprobe', [0, 2, 8])
+def test_recommend_many_matches_per_seed_path(recommender, nprobe):
+    ids = recommender.engine.universe
+    seeds = [int(ids[3]), int(ids[17]), int(ids[40]), int(ids[58]), 999]   # 999 — нет ни в одной модели
+    rating_counts = {seeds[0]: 10, seeds[1]: 2, seeds[2]: 5}
+    expected = _per_seed(recommender, seeds, 9, rating_counts, nprobe)
+
+    got = dict(recommender.engine.recommend_many(seeds, len(ids), per_seed=9,
+                                                 rating_counts=rating_counts, nprobe=nprobe))
+    assert set(got) == set(expected)
+    # ContentIndex.similar округляет скоры до 3 знаков — отсюда допуск
+    assert max(abs(got[mid] - expected[mid]) for mid in got) < 0.02
+
+    top = recommender.engine.recommend_many(seeds, 5, per_seed=9, rating_counts=rating_counts, nprobe=nprobe)
+    assert [mid for mid, _ in top] == sorted(got, key=lambda mid: -got[mid])[:5]
@@ -0,0 +1,124 @@
+# server/tests/test_incremental.py
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from models import incremental
+from models.incremental import _append_ids, apply_events, save_state, retrain
+from models.mf import als_update, ratings_matrix, train_als, rmse
+
+
+def _latest(rows):
+    users, movies, ratings = zip(*rows)
+    return pd.DataFrame({
+        'userId': np.array(users, dtype=np.int32),
+        'movieId': np.array(movies, dtype=np.int32),
+        'rating': np.array([np.nan if r is None else r for r in ratings], dtype=np.float32),
+    })
+
+
+def test_append_ids_keeps_known_and_appends_new_sorted():
+    ids = np.array([30, 10, 20], dtype=np.int32)
+    inner, out = _append_ids(ids, np.array([20, 50, 10, 40, 50]))
+    assert inner.tolist() == [2, 4, 1, 3, 4]
+    assert out.tolist() == [30, 10, 20, 40, 50]
+
+    inner, out = _append_ids(np.zeros(0, dtype=np.int32), np.array([7, 5]))
+    assert inner.tolist() == [1, 0] and out.tolist() == [5, 7]
+
+
+def test_apply_events_upserts_deletes_and_appends():
+    R = sp.csr_matrix(np.array([[4.0, 0.0], [3.0, 5.0]], dtype=np.float32))
+    user_ids = np.array([1, 2], dtype=np.int32)
+    item_ids = np.array([10, 20], dtype=np.int32)
+    latest = _latest([
+        (1, 10, 2.5),    # изменение
+        (2, 20, None),   # удаление
+        (3, 30, 1.0),    # новый пользователь и фильм
+        (9, 10, None),   # удаление неизвестной пары — игнорируется
+    ])
+    R, user_ids, item_ids, rows, cols = apply_events(R, user_ids, item_ids, latest)
+
+    assert user_ids.tolist() == [1, 2, 3] and item_ids.tolist() == [10, 20, 30]
+    assert R.toarray().tolist() == [[2.5, 0, 0], [3.0, 0, 0], [0, 0, 1.0]]
+    assert R.nnz == 3                     # удалённая оценка не осталась явным нулём
+    assert rows.tolist() == [0, 1, 2] and cols.tolist() == [0, 1, 2]
+
+
+def _low_rank_ratings(n_users=60, n_items=40, rank=3, seed=0):
+    rng = np.random.default_rng(seed)
+    full = 3.0 + rng.normal(0, 0.6, (n_users, rank)) @ rng.normal(0, 0.6, (rank, n_items))
+    users, items = np.nonzero(rng.random((n_users, n_items)) < 0.5)
+    return pd.DataFrame({'userId': users + 1, 'movieId': items + 100,
+                         'rating': full[users, items].astype(np.float32)})
+
+
+def test_als_update_warm_start_touches_only_affected_rows():
+    df = _low_rank_ratings()
+    mf = train_als(df, n_factors=3, n_iters=10, reg=0.01, n_jobs=1, verbose=False)
+    R, user_ids, item_ids = ratings_matrix(df)
+
+    # новый пользователь ставит оценки как пользователь 1
+    like = df[df['userId'] == 1]
+    latest = _latest([(999, m, r) for m, r in zip(like['movieId'], like['rating'])])
+    R, user_ids, item_ids, users, items = apply_events(R, user_ids, item_ids, latest)
+    updated = als_update(mf, R, user_ids, item_ids, users, items, n_iters=2, reg=0.01, n_jobs=1)
+
+    assert updated.user_ids.tolist() == user_ids.tolist()
+    untouched = np.setdiff1d(np.arange(len(mf.user_ids)), users)
+    assert np.array_equal(updated.pu[untouched], mf.pu[untouched])
+    assert not np.array_equal(updated.qi[items], mf.qi[items])
+
+    u_map = updated.users.to_inner_many(user_ids)
+    i_map = updated.items.to_inner_many(item_ids)
+    rows = R.tocoo()
+    new = rows.row == len(user_ids) - 1
+    est = (updated.global_mean + updated.bu[u_map[rows.row[new]]] + updated.bi[i_map[rows.col[new]]]
+           + np.einsum('ij,ij->i', updated.pu[u_map[rows.row[new]]], updated.qi[i_map[rows.col[new]]]))
+    assert np.sqrt(np.mean((est - rows.data[new]) ** 2)) < 0.3
+    assert rmse(R, updated.pu[u_map], updated.bu[u_map], updated.qi[i_map], updated.bi[i_map],
+                updated.global_mean) < 0.3
+
+
+def test_failed_publish_leaves_content_artifacts_untouched(tmp_path, monkeypatch):
+    models_dir, data_dir = str(tmp_path / 'models'), str(tmp_path / 'data')
+    os.makedirs(models_dir)
+    os.makedirs(data_dir)
+    save_state(models_dir, sp.csr_matrix((1, 1), dtype=np.float32), [1], [10], 0)
+    features = sp.csr_matrix(np.ones((1, 2), dtype=np.float32))
+    sp.save_npz(os.path.join(models_dir, 'content_features.npz'), features)
+    joblib.dump({0: 10}, os.path.join(models_dir, 'index_to_movie_id.pkl'))
+    joblib.dump({10: 0}, os.path.join(models_dir, 'movie_id_to_index.pkl'))
+    joblib.dump({'genres': []}, os.path.join(models_dir, 'tag_vectorizer.pkl'))
+    pd.DataFrame({'movieId': [10, 20], 'title': ['A (2000)', 'B (2001)'], 'genres': ['Drama', 'Comedy']}) \
+        .to_csv(os.path.join(data_dir, 'movies.csv'), index=False)
+    monkeypatch.setattr(incremental, 'content_rows',
+                        lambda data_dir, ids, meta: sp.csr_matrix(np.full((len(ids), 2), 2, np.float32)))
+
+    def failing_publish(models_dir, **kwargs):
+        raise RuntimeError('publish failed')
+
+    monkeypatch.setattr(incremental, 'publish_bundle', failing_publish)
+    with pytest.raises(RuntimeError):
+        retrain(models_dir, data_dir)
+    assert sp.load_npz(os.path.join(models_dir, 'content_features.npz')).shape == (1, 2)
+    assert joblib.load(os.path.join(models_dir, 'index_to_movie_id.pkl')) == {0: 10}
+
+    published = {}
+
+    def publish(models_dir, content=None, **kwargs):
+        published['content'] = content
+        return {'version': 'v2'}
+
+    monkeypatch.setattr(incremental, 'publish_bundle', publish)
+    retrain(models_dir, data_dir)
+    assert published['content'][0].shape == (2, 2)
+    assert sp.load_npz(os.path.join(models_dir, 'content_features.npz')).shape == (2, 2)
+    assert joblib.load(os.path.join(models_dir, 'index_to_movie_id.pkl')) == {0: 10, 1: 20}
+    assert joblib.load(os.path.join(models_dir, 'movie_id_to_index.pkl')) == {10: 0, 20: 1}
+    assert not [name for name in os.listdir(models_dir) if name.startswith('.')]
@@ -0,0 +1,47 @@
+# server/tests/test_item_sim.py
+
+import numpy as np
+import scipy.sparse as sp
+
+from models.item_sim import item_similarity
+from models.knn_index import prune_dense_sim
+
+
+def _ratings(n_users=30, n_items=12, density=0.4, seed=0):
+    rng = np.random.default_rng(seed)
+    mask = rng.random((n_users, n_items)) < density
+    values = rng.integers(1, 11, (n_users, n_items)) / 2
+    return sp.csr_matrix(np.where(mask, values, 0).astype(np.float32))
+
+
+def _dense_cosine(R, min_support):
+    """Эталон по определению Surprise: суммы только по общим пользователям."""
+    D = R.toarray().astype(np.float64)
+    n_items = D.shape[1]
+    sim = np.zeros((n_items, n_items))
+    for i in range(n_items):
+        for j in range(n_items):
+            common = (D[:, i] > 0) & (D[:, j] > 0)
+            if common.sum() < min_support:
+                continue
+            a, b = D[common, i], D[common, j]
+            sim[i, j] = a @ b / np.sqrt((a @ a) * (b @ b))
+    return sim
+
+
+def test_blockwise_cosine_matches_dense_with_min_support():
+    R = _ratings()
+    for min_support, block_size, workers in [(1, 5, 1), (5, 3, 1), (8, None, 2)]:
+        expected = prune_dense_sim(_dense_cosine(R, min_support), k=4)
+        got = item_similarity(R, k=4, min_support=min_support, workers=workers,
+                              block_size=block_size, verbose=False)
+        assert got.indptr.tolist() == expected.indptr.tolist()
+        assert got.indices.tolist() == expected.indices.tolist()
+        assert np.allclose(got.data, expected.data, atol=1e-5)
+
+
+def test_min_support_drops_pairs_with_few_common_users():
+    R = _ratings(seed=1)
+    support = (R > 0).astype(np.int32).T @ (R > 0).astype(np.int32)
+    got = item_similarity(R, k=11, min_support=6, workers=1, verbose=False).tocoo()
+    assert (support.toarray()[got.row, got.col] >= 6).all()
@@ -0,0 +1,61 @@
+# server/tests/test_knn_index.py
+
+import numpy as np
+
+from models.knn_index import prune_dense_sim, topk_coo, SparseItemKNN
+
+
+def _random_sim(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    sim = rng.uniform(-0.5, 1.0, (n, n)).astype(np.float32)   # без равных значений
+    return (sim + sim.T) / 2
+
+
+def _dense_topk(sim, k):
+    """Эталон: по каждой строке argsort по убыванию, без самого фильма и непозитивных."""
+    rows = []
+    for i, row in enumerate(sim):
+        order = [j for j in np.argsort(-row, kind='stable') if j != i and row[j] > 0][:k]
+        rows.append((order, row[order]))
+    return rows
+
+
+def _assert_rows(csr, expected):
+    for i, (cols, scores) in enumerate(expected):
+        lo, hi = csr.indptr[i], csr.indptr[i + 1]
+        assert csr.indices[lo:hi].tolist() == list(cols)
+        assert np.allclose(csr.data[lo:hi], scores)
+
+
+def test_prune_dense_sim_matches_dense_argsort():
+    sim = _random_sim()
+    for k, block_size in [(5, 7), (39, 16), (100, 1024)]:
+        _assert_rows(prune_dense_sim(sim, k=k, block_size=block_size), _dense_topk(sim, min(k, 39)))
+
+
+def test_topk_coo_matches_dense_argsort():
+    sim = _random_sim(seed=1)
+    rows, cols = np.nonzero(np.ones_like(sim))
+    rng = np.random.default_rng(2)
+    shuffle = rng.permutation(len(rows))                      # порядок троек не важен
+    for k in (1, 5, 60):
+        csr = topk_coo(len(sim), rows[shuffle], cols[shuffle], sim[rows, cols][shuffle], k=k)
+        _assert_rows(csr, _dense_topk(sim, k))
+
+
+def test_sparse_knn_roundtrip_and_neighbors(tmp_path):
+    sim = _random_sim(n=6, seed=3)
+    raw_ids = np.array([60, 10, 50, 20, 40, 30], dtype=np.int32)  # не отсортированы
+    knn = SparseItemKNN(prune_dense_sim(sim, k=3), raw_ids, np.arange(6))
+    path = str(tmp_path / 'knn_sparse.npz')
+    knn.save(path)
+    loaded = SparseItemKNN.load(path)
+
+    assert (loaded.neighbors_csr != knn.neighbors_csr).nnz == 0
+    assert loaded.item_counts.tolist() == list(range(6))
+    cols, scores = _dense_topk(sim, 3)[2]
+    assert loaded.neighbors(50, 2) == [
+        {'movieId': int(raw_ids[c]), 'score': float(s)} for c, s in zip(cols[:2], scores[:2])
+    ]
+    assert 50 in loaded and 99 not in loaded
+    assert loaded.neighbors(99, 2) == []
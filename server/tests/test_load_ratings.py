@@ -0,0 +1,37 @@
+# server/tests/test_load_ratings.py
+
+import numpy as np
+
+from load_movielens_uk import ImportedRatings, plan_ratings, _lookup, _rating_keys
+
+
+def test_plan_keeps_app_edits_and_deletes():
+    # пари: нова | не змінилась | CSV виправив | змінено в застосунку | видалено в застосунку | оцінка застосунку
+    csv = np.array([4.0, 3.0, 2.5, 5.0, 4.0, 1.0], dtype=np.float32)
+    db_found = np.array([False, True, True, True, False, True])
+    db = np.array([0.0, 3.0, 2.0, 1.5, 0.0, 4.5], dtype=np.float32)
+    prev_found = np.array([False, True, True, True, True, False])
+    prev = np.array([0.0, 3.0, 2.0, 5.0, 4.0, 0.0], dtype=np.float32)
+
+    insert, update, kept, imported = plan_ratings(csv, db_found, db, prev_found, prev)
+    assert insert.tolist() == [True, False, False, False, False, False]
+    assert update.tolist() == [False, False, True, False, False, False]
+    assert kept.tolist() == [False, False, False, True, True, True]
+    # змінена / видалена в застосунку пара лишається в знімку зі старим значенням
+    np.testing.assert_array_equal(imported, [4.0, 3.0, 2.5, 5.0, 4.0, np.nan])
+
+
+def test_imported_ratings_roundtrip_sorts_unsorted_chunks(tmp_path):
+    snapshot = ImportedRatings(str(tmp_path / 'ratings_imported'))
+    assert len(snapshot.open()[0]) == 0
+
+    writer = snapshot.writer()
+    writer.add(_rating_keys([2, 2], [5, 1]), [3.0, 4.0])
+    writer.add(_rating_keys([1], [7]), [2.5])        # шматок «назад» — CSV не відсортований
+    writer.commit()
+
+    keys, values = snapshot.open()
+    assert np.all(np.diff(keys) > 0)
+    found, got = _lookup(keys, values, _rating_keys([2, 1, 3], [1, 7, 1]))
+    assert found.tolist() == [True, True, False]
+    assert got[:2].tolist() == [4.0, 2.5]
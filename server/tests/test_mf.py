@@ -0,0 +1,42 @@
+# server/tests/test_mf.py
+
+import numpy as np
+import pandas as pd
+
+from models.mf import MFModel, train_als
+
+
+def _rank5_ratings(n_users=300, n_items=200, density=0.3, seed=0):
+    rng = np.random.default_rng(seed)
+    full = 3.0 + rng.normal(0, 0.5, (n_users, 5)) @ rng.normal(0, 0.5, (5, n_items))
+    full += rng.normal(0, 0.1, full.shape)
+    users, items = np.nonzero(rng.random((n_users, n_items)) < density)
+    df = pd.DataFrame({'userId': users + 1, 'movieId': items + 1,
+                       'rating': full[users, items].astype(np.float32)})
+    test = rng.random(len(df)) < 0.2
+    return df[~test], df[test]
+
+
+def test_als_beats_global_mean_on_low_rank_data():
+    train, test = _rank5_ratings()
+    mf = train_als(train, n_factors=5, n_iters=10, n_jobs=1, verbose=False)
+
+    test = test[test['userId'].isin(mf.user_ids) & test['movieId'].isin(mf.item_ids)]
+    est = mf.predict_many(test['userId'].to_numpy(), test['movieId'].to_numpy())
+    rmse = np.sqrt(np.mean((est - test['rating'].to_numpy()) ** 2))
+    baseline = np.sqrt(np.mean((train['rating'].mean() - test['rating'].to_numpy()) ** 2))
+    assert rmse < 0.5 * baseline
+
+
+def test_factors_roundtrip(tmp_path):
+    train, _ = _rank5_ratings(n_users=20, n_items=15, density=0.5)
+    mf = train_als(train, n_factors=3, n_iters=2, n_jobs=1, verbose=False)
+    path = str(tmp_path / 'svd_factors.npz')
+    mf.save(path)
+    loaded = MFModel.load(path)
+
+    users, items = train['userId'].to_numpy(), train['movieId'].to_numpy()
+    assert np.allclose(loaded.predict_many(users, items), mf.predict_many(users, items))
+    assert loaded.rating_scale == mf.rating_scale
+    # неизвестные пользователь и фильм — только μ, обрезанное по шкале
+    assert np.allclose(loaded.predict_many([999], [999]), np.clip(mf.global_mean, *mf.rating_scale))
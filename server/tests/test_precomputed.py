@@ -0,0 +1,34 @@
+# server/tests/test_precomputed.py
+
+import numpy as np
+
+from models.hybrid_engine import MIN_KNN_RATINGS
+from models.precomputed import PrecomputedRecs, save_table
+
+
+def _table(tmp_path, nprobe=32):
+    movie_ids = np.array([1, 2], dtype=np.int32)
+    ids = np.array([[2, -1], [1, -1]], dtype=np.int32)
+    scores = np.array([[0.9, 0], [0.8, 0]], dtype=np.float32)
+    results = {alg: (ids, scores) for alg in ('knn', 'svd', 'hybrid')}
+    save_table(str(tmp_path), movie_ids, results, {'model_version': 'v', 'top_n': 2, 'nprobe': nprobe},
+               hybrid_knn=[True, False])
+    return PrecomputedRecs.load(str(tmp_path))
+
+
+def test_lookup_skips_rows_for_another_nprobe(tmp_path):
+    table = _table(tmp_path, nprobe=32)
+    assert table.lookup('svd', 1, 2, nprobe=32) == [{'movieId': 2, 'score': np.float32(0.9)}]
+    assert table.lookup('svd', 1, 2, nprobe=0) is None
+    assert table.lookup('hybrid', 1, 2, nprobe=8) is None
+    # knn от nprobe не зависит
+    assert table.lookup('knn', 1, 2, nprobe=0) is not None
+
+
+def test_hybrid_lookup_follows_knn_threshold(tmp_path):
+    table = _table(tmp_path)
+    # фильм 1 считался с KNN, фильм 2 — без
+    assert table.lookup('hybrid', 1, 2, rating_count=MIN_KNN_RATINGS) is not None
+    assert table.lookup('hybrid', 1, 2, rating_count=MIN_KNN_RATINGS - 1) is None
+    assert table.lookup('hybrid', 2, 2, rating_count=0) is not None
+    assert table.lookup('hybrid', 2, 2, rating_count=MIN_KNN_RATINGS) is None
@@ -0,0 +1,43 @@
+from models.catalog_log import CatalogLog
+from models.rec_cache import RecommendationCache
+
+
+def test_clear_invalidates_local_entries():
+    cache = RecommendationCache()
+    key = cache.make_key('v1', 1, 10, 'knn')
+    cache.set(key, [1, 2, 3])
+    assert cache.get(cache.make_key('v1', 1, 10, 'knn')) == [1, 2, 3]
+
+    cache.clear()
+    assert cache.get(cache.make_key('v1', 1, 10, 'knn')) is None
+
+
+def test_catalog_change_in_one_worker_invalidates_all(tmp_path):
+    # два воркера: свои LRU, общий журнал каталога (без Redis)
+    log = CatalogLog(str(tmp_path / 'catalog_events.bin'))
+    workers = [RecommendationCache(generation=log.size), RecommendationCache(generation=log.size)]
+    for cache in workers:
+        cache.set(cache.make_key('v1', 1, 10, 'knn'), [1, 2, 3])
+
+    # CRUD фильма в первом воркере; второй clear() не звал
+    log.append(2)
+    workers[0].clear()
+    for cache in workers:
+        assert cache.get(cache.make_key('v1', 1, 10, 'knn')) is None
+
+    cache = workers[1]
+    cache.set(cache.make_key('v1', 1, 10, 'knn'), [1, 3])
+    assert cache.get(cache.make_key('v1', 1, 10, 'knn')) == [1, 3]
+
+
+def test_catalog_log_read_tail(tmp_path):
+    log = CatalogLog(str(tmp_path / 'catalog_events.bin'))
+    assert log.size() == 0
+    log.append(5)
+    offset = log.size()
+    log.append(7)
+    log.append(9)
+    events, end = log.read(offset)
+    assert events['movie_id'].tolist() == [7, 9]
+    assert end == log.size()
+    assert len(log.read(end)[0]) == 0
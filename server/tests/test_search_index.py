@@ -0,0 +1,61 @@
+# server/tests/test_search_index.py
+
+from types import SimpleNamespace
+
+from flask import Flask
+
+from extensions import db
+
+from models.id_map import IdMap
+from models.models import Movie
+from models.search_index import TitleSearchIndex, MAX_CANDIDATES
+
+N_TIED = MAX_CANDIDATES * 3
+
+
+def _tied_index():
+    """N_TIED непопулярных названий с тем же набором триграмм запроса 'star', популярный фильм — последним."""
+    movies = [(i, f'Star Trek {i}', None, 0.0) for i in range(1, N_TIED + 1)]
+    movies.append((10_000, 'Star Wars', 'Зоряні війни', 100.0))
+    return TitleSearchIndex(movies)
+
+
+def test_tied_candidates_do_not_push_out_popular_match():
+    results = _tied_index().search('star', n=5)
+    assert results[0]['movieId'] == 10_000
+    assert len(results) == 5
+
+
+def test_valid_ids_filter_applies_before_truncation():
+    index = _tied_index()
+    results = index.search('star', n=5, valid_ids=IdMap([10_000, N_TIED]))
+    assert [r['movieId'] for r in results] == [10_000, N_TIED]
+
+
+def test_exact_title_ranks_first_and_upsert_is_searchable():
+    index = _tied_index()
+    index.upsert(SimpleNamespace(movie_id=20_000, title_en='Star', title_uk=None, popularity=None))
+    assert index.search('star', n=1)[0]['movieId'] == 20_000
+    index.remove(20_000)
+    assert index.search('star', n=1)[0]['movieId'] == 10_000
+
+
+def test_refresh_picks_up_changes_from_other_workers():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Movie(movie_id=1, title_en='Alien'), Movie(movie_id=2, title_en='Heat')])
+        db.session.commit()
+        index = TitleSearchIndex.load(db.session)
+
+        db.session.get(Movie, 1).title_en = 'Aliens'
+        db.session.delete(db.session.get(Movie, 2))
+        db.session.add(Movie(movie_id=3, title_en='Heathers'))
+        db.session.commit()
+        index.refresh(db.session, [1, 2, 3])
+
+        assert index.search('aliens')[0] == {'movieId': 1, 'title': 'Aliens'}
+        assert [r['movieId'] for r in index.search('heat')] == [3]
+        db.session.remove()
@@ -2,11 +2,13 @@
 
 import os
 import pickle
-import pandas as pd
 import scipy.sparse
 from surprise import Dataset, Reader, SVD, KNNBasic
 from sklearn.neighbors import NearestNeighbors
 
+from build_indexes import build_knn, build_svd_ann
+from models.data_loader import load_ratings
+
 # ── Пути ────────────────────────────────────────────────────────────────
 BASE_DIR   = os.path.dirname(__file__)
 DATA_DIR   = os.path.join(BASE_DIR, "data", "ml-latest")
@@ -15,7 +17,7 @@ os.makedirs(MODELS_DIR, exist_ok=True)
 
 # ── 1) Загружаем все рейтинги ─────────────────────────────────────────
 ratings_csv = os.path.join(DATA_DIR, "ratings.csv")
-ratings_df  = pd.read_csv(ratings_csv, usecols=["userId","movieId","rating"])
+ratings_df  = load_ratings(ratings_csv)
 print(f"Loaded {len(ratings_df)} ratings")
 
 # ── 2) Собираем full_trainset с любыми рейтингами ───────────────────────
@@ -31,6 +33,7 @@ svd.fit(full_trainset)
 with open(os.path.join(MODELS_DIR, "svd_model.pkl"), "wb") as f:
     pickle.dump(svd, f)
 print("✔ svd_model.pkl saved")
+build_svd_ann(MODELS_DIR, svd=svd)
 
 # ── 3b) Обучаем KNNBasic на полном наборе ──────────────────────────────
 print("Training KNNBasic on full_trainset...")
@@ -40,6 +43,7 @@ knn.fit(full_trainset)
 with open(os.path.join(MODELS_DIR, "knn_model.pkl"), "wb") as f:
     pickle.dump(knn, f)
 print("✔ knn_model.pkl saved")
+build_knn(MODELS_DIR, knn=knn)
 
 # ── 4) Контентная модель (оставляем без изменений) ──────────────────────
 tfidf_path    = os.path.join(MODELS_DIR, "tag_tfidf.pkl")